@@ -53,6 +53,31 @@ class NormalUserAdmin(admin.ModelAdmin):
     search_fields = ['user__email', 'user__name', 'role']
 
 
+class QueryJobAdmin(admin.ModelAdmin):
+    """Admin for background query jobs"""
+    list_display = ['uuid', 'user', 'cell', 'status', 'created_at', 'execution_time']
+    list_filter = ['status']
+    search_fields = ['uuid', 'user__email']
+    readonly_fields = ['uuid', 'created_at', 'started_at', 'finished_at', 'worker_pid']
+
+
+class SchemaSnapshotAdmin(admin.ModelAdmin):
+    """Admin for cached connection schema snapshots"""
+    list_display = ['connection', 'version', 'captured_at', 'checked_at']
+    search_fields = ['connection__name']
+    readonly_fields = ['captured_at', 'fingerprint', 'connection_fingerprint']
+
+
+class TableProfileAdmin(admin.ModelAdmin):
+    """Admin for sampled column profiles"""
+    list_display = ['connection', 'schema_name', 'table_name', 'sample_rows', 'profiled_at']
+    search_fields = ['connection__name', 'schema_name', 'table_name']
+    readonly_fields = ['profiled_at', 'table_digest']
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.AdminUser, AdminUserAdmin)
 admin.site.register(models.NormalUser, NormalUserAdmin)
+admin.site.register(models.QueryJob, QueryJobAdmin)
+admin.site.register(models.SchemaSnapshot, SchemaSnapshotAdmin)
+admin.site.register(models.TableProfile, TableProfileAdmin)
@@ -0,0 +1,289 @@
+"""
+Sampled column statistics per DatabaseConnection
+
+The agent and the schema explorer get per-column null rates, approximate distinct
+counts, min/max and the most frequent values without querying the database:
+tables of a connection's schema snapshot are sampled by a background thread
+(TABLESAMPLE SYSTEM on PostgreSQL, a bounded LIMIT scan on MySQL) and their
+statistics are computed with NumPy, one column at a time, then stored as
+TableProfile rows next to the snapshot.
+
+A table is profiled again when its snapshot digest changes (its definition was
+altered) or its profile is older than column_profile_ttl, so refreshes only cover
+the tables that need them. Sampling runs queries against the customer database,
+so it is off by default: set column_profiling in a connection's additional
+params, or column_profiling_enabled for every connection.
+"""
+import logging
+import math
+from datetime import timedelta
+from threading import Lock, Thread
+
+from django.db import connections
+from django.utils import timezone
+
+# Optional: vectorized column statistics
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from .db_config import get_config
+from .db_handlers import execute_query
+from .models import TableProfile
+from .row_counts import _quote_identifier
+
+logger = logging.getLogger(__name__)
+
+# Columnar result dtypes by how their statistics are computed
+_NUMERIC_DTYPES = {'int', 'float', 'decimal', 'interval'}
+_ORDERED_TEXT_DTYPES = {'string', 'datetime', 'date', 'time'}
+_UNORDERED_DTYPES = {'bool', 'uuid'}
+
+# Longest text value kept in min/max and top values
+MAX_VALUE_LENGTH = 64
+
+# Smallest share of the sample a value needs to be reported as a top value
+MIN_TOP_SHARE = 0.01
+
+# Connections with a profiling thread running in this worker
+_profiling = set()
+_profiling_lock = Lock()
+
+
+def _sample_query(connection_type, schema_name, table, sample_rows):
+    """Return (sql, sampled) reading at most sample_rows rows of a table's columns"""
+    def quote(name):
+        return _quote_identifier(name, connection_type)
+
+    columns = ', '.join(quote(column['name']) for column in table['columns'])
+    source = f"{quote(schema_name)}.{quote(table['name'])}"
+    rows = table.get('rows') or 0
+    sampled = connection_type == 'postgresql' and rows > sample_rows
+    if sampled:
+        # SYSTEM samples whole pages; asking for twice the rows keeps the sample
+        # near sample_rows when pages are unevenly filled
+        source += f" TABLESAMPLE SYSTEM ({min(100.0, 200.0 * sample_rows / rows):.6f})"
+    return f"SELECT {columns} FROM {source} LIMIT {int(sample_rows)}", sampled
+
+
+def _clip(value):
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + '...'
+    return value
+
+
+def estimate_distinct(counts, sample_size, population):
+    """
+    Distinct values in a population of non-null values, from the value counts of
+    a sample of it (GEE estimator: values seen once are scaled up by
+    sqrt(population / sample size), repeated ones are counted as is); a sample
+    without repeats is taken to be unique
+    """
+    distinct = len(counts)
+    if not sample_size or population <= sample_size:
+        return distinct
+    singletons = int(np.count_nonzero(counts == 1))
+    if singletons == sample_size:
+        # No value repeats in the sample: most likely a key
+        return int(round(population))
+    estimate = math.sqrt(population / sample_size) * singletons + (distinct - singletons)
+    return int(round(min(max(estimate, distinct), population)))
+
+
+def profile_column(values, dtype, table_rows, complete, top_k):
+    """
+    Statistics of one sampled column: null_rate, distinct (approximate unless the
+    sample is the whole table), min/max for ordered types and top_values
+    """
+    array = np.array(values, dtype=object)
+    sample_size = len(array)
+    stats = {'null_rate': 0.0, 'distinct': 0}
+    if not sample_size:
+        return stats
+
+    nulls = np.equal(array, None)
+    null_count = int(np.count_nonzero(nulls))
+    stats['null_rate'] = round(null_count / sample_size, 4)
+    present = array[~nulls]
+    if not len(present):
+        return stats
+
+    if dtype in _NUMERIC_DTYPES:
+        present = present.astype(np.float64)
+    elif dtype == 'bool':
+        present = present.astype(bool)
+    else:
+        present = present.astype(str)
+    unique, counts = np.unique(present, return_counts=True)
+
+    population = len(present) if complete else max(table_rows, sample_size) * (len(present) / sample_size)
+    stats['distinct'] = estimate_distinct(counts, len(present), population)
+    if complete:
+        stats['distinct_exact'] = True
+
+    # np.unique sorts, so the extremes are its first and last values
+    if dtype in _NUMERIC_DTYPES:
+        low, high = unique[0].item(), unique[-1].item()
+        if dtype == 'int':
+            low, high = int(low), int(high)
+        stats['min'], stats['max'] = low, high
+    elif dtype in _ORDERED_TEXT_DTYPES:
+        stats['min'], stats['max'] = _clip(str(unique[0])), _clip(str(unique[-1]))
+
+    # Most frequent values that make up at least MIN_TOP_SHARE of the sample
+    if dtype in _NUMERIC_DTYPES or dtype in _ORDERED_TEXT_DTYPES or dtype in _UNORDERED_DTYPES:
+        order = np.argsort(-counts, kind='stable')[:top_k]
+        frequent = [i for i in order if counts[i] > 1 and counts[i] >= MIN_TOP_SHARE * sample_size]
+        if frequent:
+            stats['top_values'] = [{
+                'value': _clip(unique[i].item() if dtype != 'int' else int(unique[i])),
+                'share': round(int(counts[i]) / sample_size, 4)
+            } for i in frequent]
+    return stats
+
+
+def profile_table(connection_info, schema_name, table, config=None):
+    """Sample a table and return (sample rows, {column: statistics}), or None when sampling failed"""
+    config = config or get_config()
+    connection_type = connection_info.get('type', 'mysql').lower()
+    sample_rows = config['column_profile_sample_rows']
+    query, sampled = _sample_query(connection_type, schema_name, table, sample_rows)
+    success, result = execute_query(connection_info, query, config['column_profile_timeout'], 'columnar')
+    if not success:
+        logger.warning(f"Column profiling failed for {schema_name}.{table['name']}: {result}")
+        return None
+
+    sample_size = result['rowCount']
+    # A LIMIT scan that came back short read the whole table
+    complete = not sampled and sample_size < sample_rows
+    columns = {}
+    for name, dtype, values in zip(result['columns'], result['dtypes'], result['data']):
+        columns[name] = profile_column(values, dtype, table.get('rows') or 0, complete,
+                                       config['column_profile_top_k'])
+    return sample_size, columns
+
+
+def _table_digest(digests, schema_name, table_name):
+    return str((digests or {}).get(schema_name, {}).get(table_name, ''))
+
+
+def is_profiling_enabled(connection_info):
+    """Whether a connection's tables may be sampled; off unless enabled for the connection or globally"""
+    # Per-connection switches come from DatabaseConnection.additional_params
+    if connection_info.get('column_profiling') is not None:
+        return str(connection_info['column_profiling']).lower() in ('1', 'true', 'yes', 'on')
+    return bool(get_config()['column_profiling_enabled'])
+
+
+def apply_column_profiles(db_connection, snapshot, schemas):
+    """
+    Attach stored column statistics to schemas as each column's 'profile', and
+    schedule profiling for tables without a current profile; returns schemas
+    """
+    config = get_config()
+    if not NUMPY_AVAILABLE:
+        return schemas
+    connection_info = db_connection.get_connection_config()
+    if not is_profiling_enabled(connection_info):
+        return schemas
+
+    profiles = {
+        (profile.schema_name, profile.table_name): profile
+        for profile in TableProfile.objects.filter(connection=db_connection)
+    }
+    cutoff = timezone.now() - timedelta(seconds=config['column_profile_ttl'])
+    stale = []
+    current = set()
+    for schema in schemas:
+        for table in schema['tables']:
+            if table['type'] != 'table' or not table.get('columns'):
+                continue
+            position = (schema['name'], table['name'])
+            current.add(position)
+            digest = _table_digest(snapshot.table_digests, *position)
+            profile = profiles.get(position)
+            if profile is not None:
+                for column in table['columns']:
+                    stats = profile.columns.get(column['name'])
+                    if stats is not None:
+                        column['profile'] = stats
+            if profile is None or profile.table_digest != digest or profile.profiled_at < cutoff:
+                stale.append((schema['name'], table, digest))
+
+    # Profiles of tables dropped since they were profiled are removed by the background run
+    dropped = [profile.pk for position, profile in profiles.items() if position not in current]
+
+    if stale or dropped:
+        schedule_column_profiles(db_connection, stale[:config['column_profile_max_tables']], dropped, connection_info)
+    return schemas
+
+
+def schedule_column_profiles(db_connection, tables, dropped=(), connection_info=None):
+    """
+    Profile (schema name, table, digest) tables and delete the dropped TableProfile
+    ids in a background thread, at most one per connection per worker
+    """
+    with _profiling_lock:
+        if db_connection.id in _profiling:
+            return False
+        _profiling.add(db_connection.id)
+    # Only what sampling needs, so the thread doesn't share the snapshot's objects
+    tables = [(schema_name, {
+        'name': table['name'],
+        'type': table['type'],
+        'rows': table.get('rows') or 0,
+        'columns': [{'name': column['name']} for column in table['columns']],
+    }, digest) for schema_name, table, digest in tables]
+    Thread(
+        target=_profile_tables,
+        args=(db_connection.id, connection_info or db_connection.get_connection_config(), tables, list(dropped)),
+        name='column-profiles', daemon=True
+    ).start()
+    return True
+
+
+def _profile_tables(connection_id, connection_info, tables, dropped=()):
+    config = get_config()
+    profiled_tables = 0
+    try:
+        if dropped:
+            TableProfile.objects.filter(connection_id=connection_id, pk__in=dropped).delete()
+        for schema_name, table, digest in tables:
+            # One table's unexpected values must not leave the rest unprofiled
+            try:
+                profiled = profile_table(connection_info, schema_name, table, config)
+                if profiled is None:
+                    continue
+                sample_rows, columns = profiled
+                TableProfile.objects.update_or_create(
+                    connection_id=connection_id, schema_name=schema_name, table_name=table['name'],
+                    defaults={
+                        'table_digest': digest,
+                        'sample_rows': sample_rows,
+                        'columns': columns,
+                        'profiled_at': timezone.now(),
+                    }
+                )
+                profiled_tables += 1
+            except Exception as e:
+                logger.error(f"Column profiling failed for {schema_name}.{table['name']}: {e}")
+        logger.info(f"Profiled {profiled_tables} of {len(tables)} table(s) for connection {connection_id}")
+    except Exception as e:
+        logger.error(f"Column profiling stopped: {e}")
+    finally:
+        with _profiling_lock:
+            _profiling.discard(connection_id)
+        # This thread's own Django database connections
+        connections.close_all()
+
+
+def get_table_profile(connection_id, schema_name, table_name):
+    """Stored profile of one table as {'columns': {column: statistics}, 'profiled_at', 'sample_rows'}, or None"""
+    profile = TableProfile.objects.filter(
+        connection_id=connection_id, schema_name=schema_name, table_name=table_name
+    ).first()
+    if profile is None:
+        return None
+    return {'columns': profile.columns, 'profiled_at': profile.profiled_at, 'sample_rows': profile.sample_rows}
@@ -14,6 +14,70 @@ DEFAULT_CONFIG = {
     'pool_maxsize': 10,
     'pool_recycle': 3600,
     'max_execution_time': 120,    # seconds (was 30)
+    'pool_idle_timeout': 300,     # seconds before an idle pooled connection is closed
+    'pool_acquire_timeout': 30,   # seconds to wait for a free pooled connection
+    'pool_health_check_interval': 30,  # ping connections idle longer than this on checkout
+    'pool_max_pools': 32,         # pools kept per worker before the least recently used is closed
+    'cursor_page_size': 1000,     # rows per page for paged cell execution
+    'cursor_max_page_size': 10000,
+    'cursor_idle_timeout': 120,   # seconds before an unread server-side cursor is closed
+    'max_open_cursors': 8,        # open server-side cursors per worker, and at most pool_maxsize - 1 per pool
+    'cursor_sticky_routing': False,  # set when every user's requests reach the same worker; paging is off otherwise with several workers
+    'engine_pool_size': 5,        # SQLAlchemy pool size per engine
+    'engine_max_overflow': 10,
+    'engine_max_engines': 16,     # SQLAlchemy engines kept per worker
+    'query_cache_enabled': False, # opt-in; connections may also set query_cache_ttl
+    'query_cache_ttl': 300,       # seconds a cached read-only result stays valid
+    'query_cache_max_bytes': 64 * 1024 * 1024,  # total cached result size per worker
+    'query_cache_max_entry_bytes': 8 * 1024 * 1024,
+    'max_result_rows': 100000,    # rows kept per result before it is truncated
+    'max_result_bytes': 64 * 1024 * 1024,  # estimated serialized bytes kept per result
+    'fetch_batch_size': 1000,     # rows read per fetchmany while enforcing the budget
+    'preview_row_limit': 1000,    # LIMIT added to the outermost SELECT in preview mode
+    'user_result_limits': {},     # per-user overrides keyed by user id or email
+    'job_worker_processes': 4,    # processes started by run_query_workers
+    'job_poll_interval': 1.0,     # seconds an idle worker waits before polling the queue again
+    'job_max_running_per_user': 2,  # background jobs running at once for one user
+    'job_max_pending_per_user': 20, # queued + running jobs accepted per user
+    'job_result_ttl': 3600,       # seconds a finished job's result is kept
+    'job_long_poll_timeout': 25,  # longest wait allowed on the job wait endpoint
+    'job_sync_long_poll_timeout': 1,  # longest wait under sync workers, each waiting client holds one
+    'result_store_enabled': False,  # opt-in; keeps each cell's latest result on local disk
+    'result_store_encrypt': True,   # Fernet-encrypt stored results with ENCRYPTION_KEY
+    'result_store_ttl': 3600,     # seconds a stored cell result stays readable
+    'result_store_max_bytes': 1024 * 1024 * 1024,  # oldest results are evicted beyond this
+    'exact_row_counts_enabled': False,  # opt-in background COUNT(*) behind catalog estimates
+    'exact_row_count_ttl': 86400, # seconds an exact count is reported before it is recounted
+    'exact_row_count_max_tables': 50,  # tables counted per background run
+    'exact_row_count_timeout': 60,  # statement timeout for one COUNT(*)
+    'schema_cache_max_age': 300,  # seconds a schema snapshot is served without checking the catalog
+    'schema_snapshot_versions': 5,  # snapshots kept per connection
+    'schema_catalog_max_catalogs': 16,  # indexed schema catalogs kept in memory per worker
+    'schema_page_size': 200,      # tables per page in the schema explorer
+    'schema_max_page_size': 1000,
+    'llm_schema_token_budget': 24000,  # tokens of schema context sent to the agent's model
+    'schema_introspection_concurrency': 4,  # schemas introspected at once, capped at pool_maxsize
+    'schema_mysql_all_databases': False,  # introspect every accessible MySQL database, not just the connected one
+    'column_profiling_enabled': False,  # sample every connection's tables for column statistics; connections opt in with column_profiling
+    'column_profile_sample_rows': 1000,  # rows sampled per table
+    'column_profile_ttl': 86400,  # seconds before an unchanged table is profiled again
+    'column_profile_max_tables': 50,  # tables profiled per background run
+    'column_profile_timeout': 30,  # statement timeout for one sample query
+    'column_profile_top_k': 5,  # most frequent values kept per column
+    'single_flight_enabled': True,  # identical concurrent schema fetches and read-only queries share one execution
+    'single_flight_wait_timeout': 150,  # seconds a caller waits on a shared execution before running its own
+    'single_flight_max_shared_bytes': 8 * 1024 * 1024,  # largest result handed to other workers through a file
+    'schema_retrieval_min_tables': 30,  # larger schemas are pruned to the tables relevant to the request
+    'schema_retrieval_top_k': 15,  # best matching tables sent to the agent's model
+    'schema_retrieval_max_neighbors': 10,  # foreign-key neighbours of those tables added on top
+    'schema_retrieval_embedding_model': '',  # local sentence-transformers model fused with BM25 ranking; '' for lexical only
+    'agent_llm_backend': 'anthropic',  # 'anthropic' or the dotted path of an LLMBackend subclass, e.g. a stub for benchmarks
+    'agent_llm_base_url': '',  # API server of the anthropic backend; '' for the provider's default
+    'agent_llm_max_concurrency': 8,  # LLM calls running at once per worker
+    'agent_llm_acquire_timeout': 30,  # seconds a call waits for a free slot
+    'agent_llm_max_connections': 10,  # keep-alive HTTP connections to the LLM API per worker
+    'agent_llm_keepalive_expiry': 60,  # seconds an idle LLM API connection is kept open
+    'agent_prompt_caching': True,  # mark the agent's stable prompt blocks for provider-side prompt caching
 }
 
 def load_config():
@@ -2,22 +2,38 @@
 
 import mysql.connector
 import psycopg2
+from psycopg2.extras import RealDictCursor
 import asyncpg
+import os
 import json
 import time
+import atexit
+import hashlib
+import secrets
 import datetime
 import asyncio
 import aiomysql
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Any, Dict, List, Union, Optional
-from threading import Lock
+from threading import Lock, Condition, Thread, Timer
 import logging
+from .result_format import to_columnar
+from .query_cache import query_cache, get_cache_ttl, is_cacheable_query, is_read_only_query, normalize_sql
+from .running_queries import running_queries, get_query_owner
+from .result_limits import ResultBudget, get_result_limits
+from .row_counts import apply_exact_row_counts
+from .schema_prompt import render_schema_for_llm
+from .single_flight import SingleFlight
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 # SQLAlchemy-based execution (alternative approach)
 try:
-    from sqlalchemy import create_engine, text, MetaData, inspect
+    from sqlalchemy import create_engine, text, MetaData, inspect, event
+    from sqlalchemy.engine import URL
     from sqlalchemy.orm import sessionmaker
     from sqlalchemy.pool import QueuePool
     SQLALCHEMY_AVAILABLE = True
@@ -39,112 +55,728 @@ def serialize_row(row: Dict[str, Any]) -> Dict[str, Any]:
     """Convert all values in a row to serializable format"""
     return {key: serialize_value(value) for key, value in row.items()}
 
-class MySQLConnectionPool:
-    """MySQL connection pool manager using aiomysql"""
+def build_result(columns, rows, start_time, result_format='rows'):
+    """Build a result dict from column names and row tuples in the requested format"""
+    if result_format == 'columnar':
+        result = to_columnar(columns, rows)
+    else:
+        # Convert rows to list of dicts and serialize
+        result = {
+            'columns': columns,
+            'rows': [serialize_row(dict(zip(columns, row))) for row in rows]
+        }
+    result['rowCount'] = len(rows)
+    result['time'] = time.time() - start_time
+    return result
+
+def build_budgeted_result(columns, budget, start_time, result_format='rows'):
+    """Build a result dict from the rows a ResultBudget kept, with truncation metadata"""
+    result = build_result(columns, budget.rows, start_time, result_format)
+    result.update(budget.metadata())
+    return result
+
+def _is_streamable_query(query):
+    """Return True for read-only SELECTs that can run on a server-side cursor"""
+    return query.strip().upper().startswith(('SELECT', 'WITH')) and is_read_only_query(query)
+
+class _AsyncPoolManager:
+    """Base for async connection pool managers
+
+    aiomysql/asyncpg pools are bound to the event loop that created them, so pools
+    are kept per running loop and keyed by connection fingerprint within it.
+    """
+    
+    label = 'async'
     
     def __init__(self):
-        self._pools = {}  # Connection pools keyed by connection string
-        self._lock = Lock()
-        
+        self._pools = {}  # (loop, fingerprint) -> pool
+        self._creation_locks = {}  # (loop, fingerprint) -> asyncio.Lock
+        self._lock = Lock()  # Guards the dicts only; never held across an await
+    
     def _get_pool_key(self, connection_info):
         """Generate a unique key for connection pooling"""
-        return f"{connection_info.get('host')}:{connection_info.get('port')}:{connection_info.get('database')}:{connection_info.get('username')}"
+        return (asyncio.get_running_loop(), get_connection_fingerprint(connection_info))
+    
+    async def _create_pool(self, connection_info, config):
+        raise NotImplementedError
+    
+    async def _close_pool(self, pool):
+        raise NotImplementedError
+    
+    def _prune_closed_loops(self):
+        """Forget pools whose event loop has been closed"""
+        with self._lock:
+            for key in [key for key in self._pools if key[0].is_closed()]:
+                self._pools.pop(key, None)
+                self._creation_locks.pop(key, None)
     
     async def get_pool(self, connection_info):
-        """Get or create a connection pool for the given connection info"""
+        """Get or create a connection pool for the given connection info on the running loop"""
         pool_key = self._get_pool_key(connection_info)
+        pool = self._pools.get(pool_key)
+        if pool is not None:
+            return pool
         
+        self._prune_closed_loops()
         with self._lock:
-            if pool_key not in self._pools:
+            creation_lock = self._creation_locks.setdefault(pool_key, asyncio.Lock())
+        
+        async with creation_lock:
+            pool = self._pools.get(pool_key)
+            if pool is None:
                 try:
                     # Create new connection pool with configurable settings
-                    config = get_db_config()
-                    pool = await aiomysql.create_pool(
-                        host=connection_info.get('host'),
-                        port=connection_info.get('port', 3306),
-                        user=connection_info.get('username'),
-                        password=connection_info.get('password'),
-                        db=connection_info.get('database'),
-                        minsize=config['pool_minsize'],
-                        maxsize=config['pool_maxsize'],
-                        echo=False,
-                        autocommit=True,
-                        pool_recycle=config['pool_recycle'],
-                        connect_timeout=config['connection_timeout'],
-                        charset='utf8mb4'
-                    )
-                    self._pools[pool_key] = pool
-                    logger.info(f"Created new connection pool for {pool_key}")
+                    pool = await self._create_pool(connection_info, get_db_config())
                 except Exception as e:
-                    logger.error(f"Failed to create connection pool: {e}")
+                    logger.error(f"Failed to create {self.label} connection pool: {e}")
                     raise
-                    
-            return self._pools[pool_key]
+                with self._lock:
+                    self._pools[pool_key] = pool
+                logger.info(f"Created new {self.label} connection pool for {connection_info.get('host')}/{connection_info.get('database')}")
+            return pool
     
     async def close_all_pools(self):
-        """Close all connection pools"""
+        """Close all connection pools that belong to the running loop"""
+        loop = asyncio.get_running_loop()
         with self._lock:
-            for pool_key, pool in self._pools.items():
+            keys = [key for key in self._pools if key[0] is loop]
+            pools = [(key, self._pools.pop(key)) for key in keys]
+            for key in keys:
+                self._creation_locks.pop(key, None)
+        for pool_key, pool in pools:
+            try:
+                await self._close_pool(pool)
+                logger.info(f"Closed {self.label} connection pool")
+            except Exception as e:
+                logger.error(f"Error closing {self.label} pool: {e}")
+
+class MySQLConnectionPool(_AsyncPoolManager):
+    """MySQL connection pool manager using aiomysql"""
+    
+    label = 'MySQL'
+    
+    async def _create_pool(self, connection_info, config):
+        return await aiomysql.create_pool(
+            host=connection_info.get('host'),
+            port=connection_info.get('port') or 3306,
+            user=connection_info.get('username'),
+            password=connection_info.get('password'),
+            db=connection_info.get('database'),
+            minsize=config['pool_minsize'],
+            maxsize=config['pool_maxsize'],
+            echo=False,
+            autocommit=True,
+            pool_recycle=config['pool_recycle'],
+            connect_timeout=config['connection_timeout'],
+            charset='utf8mb4'
+        )
+    
+    async def _close_pool(self, pool):
+        pool.close()
+        await pool.wait_closed()
+
+class PostgreSQLConnectionPool(_AsyncPoolManager):
+    """PostgreSQL connection pool manager using asyncpg"""
+    
+    label = 'PostgreSQL'
+    
+    async def _create_pool(self, connection_info, config):
+        return await asyncpg.create_pool(
+            host=connection_info.get('host'),
+            port=connection_info.get('port') or 5432,
+            user=connection_info.get('username'),
+            password=connection_info.get('password'),
+            database=connection_info.get('database'),
+            min_size=config['pool_minsize'],
+            max_size=config['pool_maxsize'],
+            max_inactive_connection_lifetime=config['pool_idle_timeout'],
+            command_timeout=config['connection_timeout'],
+        )
+    
+    async def _close_pool(self, pool):
+        await pool.close()
+
+def get_connection_fingerprint(connection_info):
+    """Return a stable hash identifying a connection's target and credentials"""
+    identity = [
+        connection_info.get('type', 'mysql').lower(),
+        connection_info.get('host'),
+        connection_info.get('port'),
+        connection_info.get('database'),
+        connection_info.get('username'),
+        connection_info.get('password'),
+        connection_info.get('ssl_ca'),
+        connection_info.get('ssl_cert'),
+        connection_info.get('ssl_key'),
+    ]
+    return hashlib.sha256(json.dumps(identity, default=str).encode('utf-8')).hexdigest()
+
+def _connect_mysql(connection_info):
+    """Open a new mysql.connector connection for the given connection info"""
+    connection_config = {
+        'host': connection_info.get('host'),
+        'port': connection_info.get('port') or 3306,
+        'database': connection_info.get('database'),
+        'user': connection_info.get('username'),
+        'password': connection_info.get('password'),
+        'connection_timeout': get_db_config()['connection_timeout'],
+        'autocommit': True,
+        'charset': 'utf8mb4',
+        'use_unicode': True
+    }
+    
+    # Add SSL config if present
+    if connection_info.get('ssl_ca'):
+        connection_config.update({
+            'ssl_ca': connection_info.get('ssl_ca'),
+            'ssl_cert': connection_info.get('ssl_cert'),
+            'ssl_key': connection_info.get('ssl_key'),
+            'ssl_verify_cert': True
+        })
+    
+    logger.debug(f"Connecting to MySQL with host: {connection_config['host']}")
+    return mysql.connector.connect(**connection_config)
+
+def _connect_postgresql(connection_info):
+    """Open a new psycopg2 connection for the given connection info"""
+    conn = psycopg2.connect(
+        host=connection_info.get('host'),
+        port=connection_info.get('port') or 5432,
+        database=connection_info.get('database'),
+        user=connection_info.get('username'),
+        password=connection_info.get('password'),
+        connect_timeout=get_db_config()['connection_timeout']
+    )
+    conn.autocommit = True
+    return conn
+
+def _ping_mysql(conn):
+    """Check that a pooled MySQL connection is still usable"""
+    conn.ping(reconnect=False, attempts=1, delay=0)
+
+def _ping_postgresql(conn):
+    """Check that a pooled PostgreSQL connection is still usable"""
+    if conn.closed:
+        raise psycopg2.InterfaceError("connection already closed")
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+# Seconds a killed statement gets to return its error before the connection is given up on
+QUERY_CANCEL_GRACE = 2
+
+def _get_backend_id(conn, connection_type):
+    """Return the server-side session id of a DB-API connection"""
+    if connection_type == 'postgresql':
+        return conn.get_backend_pid()
+    return conn.connection_id
+
+def cancel_backend_query(connection_info, backend_id):
+    """Stop the statement running in a database session, from a separate connection"""
+    connection_type = connection_info.get('type', 'mysql').lower()
+    if connection_type == 'postgresql':
+        conn = _connect_postgresql(connection_info)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_cancel_backend(%s)", (int(backend_id),))
+                return bool(cursor.fetchone()[0])
+        finally:
+            conn.close()
+    
+    conn = _connect_mysql(connection_info)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"KILL QUERY {int(backend_id)}")
+        return True
+    except mysql.connector.Error as e:
+        if e.errno == 1094:  # Unknown thread id: the statement already finished
+            return False
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def _cancel_running_query(connection_info, entry, timed_out=False):
+    """Kill a tracked statement unless it already finished, logging rather than raising"""
+    with entry.lock:
+        if entry.finished:
+            return False
+        entry.timed_out = entry.timed_out or timed_out
+        entry.abandoned = True
+        try:
+            cancelled = cancel_backend_query(connection_info, entry.backend_id)
+            logger.info(f"Cancelled query {entry.query_id} on backend {entry.backend_id}")
+            return cancelled
+        except Exception as e:
+            logger.warning(f"Failed to cancel query {entry.query_id} on backend {entry.backend_id}: {e}")
+            return False
+
+@contextmanager
+def _track_running_query(connection_info, backend_id, query, query_timeout=None):
+    """Record a statement as in flight and kill it server-side if it outlives its timeout"""
+    owner = get_query_owner()
+    entry = running_queries.register(
+        get_connection_fingerprint(connection_info),
+        connection_info.get('type', 'mysql').lower(),
+        backend_id, query, owner
+    )
+    timer = None
+    if query_timeout:
+        # Backstop for statements the session timeout settings don't cover (e.g. DML on MySQL)
+        timer = Timer(query_timeout + QUERY_CANCEL_GRACE, _cancel_running_query,
+                      args=(connection_info, entry), kwargs={'timed_out': True})
+        timer.daemon = True
+        timer.start()
+    try:
+        yield entry
+    except Exception as e:
+        if entry.timed_out:
+            if query_timeout:
+                raise Exception(f"Query timeout after {query_timeout} seconds") from e
+            raise
+        if owner is not None and running_queries.is_cancelled(owner):
+            raise Exception("Query cancelled") from e
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        # Wait out a kill in progress so it cannot hit the connection's next statement
+        with entry.lock:
+            entry.finished = True
+        running_queries.unregister(entry)
+
+async def _await_statement(awaitable, connection_info, entry, query_timeout):
+    """Await a statement, stopping it on the server rather than just abandoning the await"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=query_timeout)
+    except asyncio.CancelledError:
+        # The request went away; don't leave the statement running on the warehouse
+        await asyncio.shield(asyncio.to_thread(_cancel_running_query, connection_info, entry))
+        task.cancel()
+        raise
+    if not done:
+        await asyncio.to_thread(_cancel_running_query, connection_info, entry, True)
+        try:
+            await asyncio.wait_for(task, timeout=QUERY_CANCEL_GRACE)
+        except Exception:
+            pass
+        raise Exception(f"Query timeout after {query_timeout} seconds")
+    return task.result()
+
+def cancel_running_queries(connection_info, owner):
+    """Cancel every in-flight query of an owner on any worker; returns how many were stopped"""
+    running_queries.mark_cancelled(owner)
+    cancelled = 0
+    for record in running_queries.find(owner):
+        # Only kill sessions opened with the caller's own connection settings
+        target = dict(connection_info, type=record['type'])
+        if record['fingerprint'] != get_connection_fingerprint(target):
+            continue
+        try:
+            if cancel_backend_query(target, record['backend_id']):
+                cancelled += 1
+        except Exception as e:
+            logger.warning(f"Failed to cancel query {record['query_id']}: {e}")
+    return cancelled
+
+def get_running_queries(owner_prefix=None):
+    """Return in-flight queries across workers, optionally only those whose owner starts with a prefix"""
+    queries = running_queries.find_all()
+    if owner_prefix is not None:
+        prefix = [str(part) for part in owner_prefix]
+        queries = [query for query in queries if query['owner'] and query['owner'][:len(prefix)] == prefix]
+    return queries
+
+class SyncConnectionPool:
+    """Thread-safe pool of DB-API connections for a single connection identity"""
+    
+    def __init__(self, pool_key, connect, ping, min_size=1, max_size=10,
+                 idle_timeout=300, recycle=3600, acquire_timeout=30, health_check_interval=30):
+        self.pool_key = pool_key
+        self._connect = connect
+        self._ping = ping
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.idle_timeout = idle_timeout
+        self.recycle = recycle
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []  # (connection, created_at, last_used) tuples, most recently used last
+        self._created_at = {}  # id(connection) -> creation time for checked-out connections
+        self._in_use = 0
+        self._closed = False
+        self._cond = Condition(Lock())
+        self.last_used = time.time()
+        self.stats = {'created': 0, 'reused': 0, 'discarded': 0, 'waits': 0}
+        self._discard_on_release = set()  # ids of checked-out connections that must not be reused
+    
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection for {self.pool_key}: {e}")
+    
+    def _evict_idle_locked(self, now):
+        """Close idle connections past idle_timeout or recycle age, keeping min_size warm"""
+        keep = []
+        expired = []
+        for entry in self._idle:
+            conn, created_at, last_used = entry
+            too_old = self.recycle and now - created_at > self.recycle
+            too_idle = now - last_used > self.idle_timeout
+            if too_old or (too_idle and len(self._idle) - len(expired) > self.min_size):
+                expired.append(conn)
+            else:
+                keep.append(entry)
+        self._idle = keep
+        return expired
+    
+    def acquire(self):
+        """Check out a healthy connection, opening a new one if below max_size"""
+        deadline = time.time() + self.acquire_timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise Exception(f"Connection pool {self.pool_key} is closed")
+                now = time.time()
+                self.last_used = now
+                expired = self._evict_idle_locked(now)
+                entry = None
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._in_use += 1
+                elif self._in_use < self.max_size:
+                    self._in_use += 1
+                else:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise Exception(
+                            f"Timed out after {self.acquire_timeout} seconds waiting for a connection from pool {self.pool_key}"
+                        )
+                    self.stats['waits'] += 1
+                    self._cond.wait(remaining)
+                    continue
+            
+            for conn in expired:
+                self._close_quietly(conn)
+            
+            if entry is None:
+                # Open the connection outside the lock so slow handshakes don't block other threads
                 try:
-                    pool.close()
-                    await pool.wait_closed()
-                    logger.info(f"Closed connection pool for {pool_key}")
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created_at[id(conn)] = time.time()
+                    self.stats['created'] += 1
+                return conn
+            
+            conn, created_at, last_used = entry
+            # Health check connections that have been idle long enough to have been dropped server-side
+            if time.time() - last_used >= self.health_check_interval:
+                try:
+                    self._ping(conn)
                 except Exception as e:
-                    logger.error(f"Error closing pool {pool_key}: {e}")
+                    logger.info(f"Discarding dead pooled connection for {self.pool_key}: {e}")
+                    self._close_quietly(conn)
+                    with self._cond:
+                        self._in_use -= 1
+                        self.stats['discarded'] += 1
+                        self._cond.notify()
+                    continue
+            with self._cond:
+                self._created_at[id(conn)] = created_at
+                self.stats['reused'] += 1
+            return conn
+    
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if discarded or the pool is closed"""
+        with self._cond:
+            self._in_use -= 1
+            created_at = self._created_at.pop(id(conn), time.time())
+            now = time.time()
+            self.last_used = now
+            if id(conn) in self._discard_on_release:
+                self._discard_on_release.discard(id(conn))
+                discard = True
+            if discard or self._closed or (self.recycle and now - created_at > self.recycle):
+                self.stats['discarded'] += 1
+                close_conn = True
+            else:
+                self._idle.append((conn, created_at, now))
+                close_conn = False
+            self._cond.notify()
+        if close_conn:
+            self._close_quietly(conn)
+    
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and returns it to the pool"""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            # A failed statement may leave unread results or a broken socket behind
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+    
+    def discard_on_release(self, conn):
+        """Close a checked-out connection when it is released instead of pooling it"""
+        with self._cond:
+            self._discard_on_release.add(id(conn))
+    
+    def evict_idle(self):
+        """Close idle connections past their idle timeout"""
+        with self._cond:
+            expired = self._evict_idle_locked(time.time())
+        for conn in expired:
+            self._close_quietly(conn)
+    
+    def close(self):
+        """Close idle connections now; checked-out connections are closed on release"""
+        with self._cond:
+            self._closed = True
+            idle = [entry[0] for entry in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+    
+    def get_stats(self):
+        """Return a snapshot of pool usage counters"""
+        with self._cond:
+            return dict(self.stats, idle=len(self._idle), in_use=self._in_use, max_size=self.max_size)
+
+class SyncPoolRegistry:
+    """Per-worker registry of SyncConnectionPool objects with LRU eviction of cold pools"""
+    
+    _CONNECTORS = {
+        'mysql': (_connect_mysql, _ping_mysql),
+        'postgresql': (_connect_postgresql, _ping_postgresql),
+    }
+    
+    def __init__(self):
+        self._pools = OrderedDict()  # Pools keyed by connection fingerprint, least recently used first
+        self._lock = Lock()
+        self._pid = os.getpid()
+    
+    def get_pool(self, connection_info):
+        """Get or create the pool for the given connection info"""
+        connection_type = connection_info.get('type', 'mysql').lower()
+        if connection_type not in self._CONNECTORS:
+            raise Exception(f"Connection pooling not supported for {connection_type}")
+        pool_key = get_connection_fingerprint(connection_info)
+        
+        cold_pools = []
+        with self._lock:
+            if self._pid != os.getpid():
+                # Connections inherited across fork must not be shared with the parent
+                self._pools = OrderedDict()
+                self._pid = os.getpid()
+            
+            config = get_db_config()
+            pool = self._pools.get(pool_key)
+            if pool is None:
+                connect, ping = self._CONNECTORS[connection_type]
+                info = dict(connection_info)
+                pool = SyncConnectionPool(
+                    pool_key=f"{connection_type}://{info.get('host')}:{info.get('port')}/{info.get('database')}",
+                    connect=lambda: connect(info),
+                    ping=ping,
+                    min_size=config['pool_minsize'],
+                    max_size=config['pool_maxsize'],
+                    idle_timeout=config['pool_idle_timeout'],
+                    recycle=config['pool_recycle'],
+                    acquire_timeout=config['pool_acquire_timeout'],
+                    health_check_interval=config['pool_health_check_interval'],
+                )
+                self._pools[pool_key] = pool
+                logger.info(f"Created new sync connection pool for {pool.pool_key}")
+            self._pools.move_to_end(pool_key)
+            
+            # Close whole pools that went cold or overflow the per-worker budget
+            now = time.time()
+            for key, candidate in list(self._pools.items()):
+                if key == pool_key:
+                    continue
+                if (len(self._pools) > config['pool_max_pools']
+                        or now - candidate.last_used > config['pool_idle_timeout']):
+                    cold_pools.append(self._pools.pop(key))
+        
+        for cold_pool in cold_pools:
+            logger.info(f"Closing cold sync connection pool for {cold_pool.pool_key}")
+            cold_pool.close()
+        return pool
+    
+    def invalidate(self, connection_info):
+        """Close the pool for a connection, e.g. after its credentials change"""
+        with self._lock:
+            pool = self._pools.pop(get_connection_fingerprint(connection_info), None)
+        if pool:
+            pool.close()
+    
+    def close_all_pools(self):
+        """Close all pools"""
+        with self._lock:
+            pools = list(self._pools.values())
             self._pools.clear()
+        for pool in pools:
+            pool.close()
+    
+    def get_stats(self):
+        """Return usage counters for every live pool"""
+        with self._lock:
+            pools = list(self._pools.values())
+        return {pool.pool_key: pool.get_stats() for pool in pools}
 
-class PostgreSQLConnectionPool:
-    """PostgreSQL connection pool manager using asyncpg"""
+class SQLAlchemyEngineRegistry:
+    """Per-worker registry of SQLAlchemy engines keyed by connection identity"""
+    
+    _DRIVERS = {
+        'mysql': ('mysql+mysqlconnector', 3306),
+        'postgresql': ('postgresql+psycopg2', 5432),
+    }
     
     def __init__(self):
-        self._pools = {}  # Connection pools keyed by connection string
+        self._engines = OrderedDict()  # fingerprint -> engine, least recently used first
+        self._last_used = {}
+        self._counters = {}  # fingerprint -> checkout/connect counters fed by pool events
         self._lock = Lock()
+        self._pid = os.getpid()
+    
+    def _create_engine(self, fingerprint, connection_info):
+        connection_type = connection_info.get('type', 'mysql').lower()
+        driver, default_port = self._DRIVERS[connection_type]
+        config = get_db_config()
         
-    def _get_pool_key(self, connection_info):
-        """Generate a unique key for connection pooling"""
-        return f"{connection_info.get('host')}:{connection_info.get('port')}:{connection_info.get('database')}:{connection_info.get('username')}"
+        # URL.create escapes credentials that contain URL-special characters
+        connection_url = URL.create(
+            driver,
+            username=connection_info.get('username') or None,
+            password=connection_info.get('password') or None,
+            host=connection_info.get('host'),
+            port=connection_info.get('port') or default_port,
+            database=connection_info.get('database'),
+        )
+        
+        connect_args = {'connect_timeout': config['connection_timeout']}
+        if connection_type == 'mysql':
+            # The mysqlconnector dialect buffers whole results by default; fetch them as they are read
+            connect_args['buffered'] = False
+        
+        # Create engine with connection pooling
+        engine = create_engine(
+            connection_url,
+            poolclass=QueuePool,
+            pool_size=config['engine_pool_size'],
+            max_overflow=config['engine_max_overflow'],
+            pool_timeout=config['pool_acquire_timeout'],
+            pool_recycle=config['pool_recycle'],
+            pool_pre_ping=True,  # Health check connections on checkout
+            connect_args=connect_args
+        )
+        
+        counters = {'checkouts': 0, 'connects': 0}
+        self._counters[fingerprint] = counters
+        
+        @event.listens_for(engine, 'checkout')
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            counters['checkouts'] += 1
+        
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            counters['connects'] += 1
+        
+        logger.info(f"Created SQLAlchemy engine for {connection_type}://{connection_info.get('host')}/{connection_info.get('database')}")
+        return engine
     
-    async def get_pool(self, connection_info):
-        """Get or create a connection pool for the given connection info"""
-        pool_key = self._get_pool_key(connection_info)
+    def get_engine(self, connection_info):
+        """Get or create the engine for the given connection info"""
+        fingerprint = get_connection_fingerprint(connection_info)
+        cold_engines = []
+        with self._lock:
+            if self._pid != os.getpid():
+                # Pooled connections inherited across fork must not be shared with the parent
+                self._engines = OrderedDict()
+                self._last_used = {}
+                self._counters = {}
+                self._pid = os.getpid()
+            
+            engine = self._engines.get(fingerprint)
+            if engine is None:
+                engine = self._create_engine(fingerprint, connection_info)
+                self._engines[fingerprint] = engine
+            self._engines.move_to_end(fingerprint)
+            now = time.time()
+            self._last_used[fingerprint] = now
+            
+            # Dispose engines that went idle or overflow the per-worker budget
+            config = get_db_config()
+            for key in list(self._engines):
+                if key == fingerprint:
+                    continue
+                if (len(self._engines) > config['engine_max_engines']
+                        or now - self._last_used.get(key, 0) > config['pool_idle_timeout']):
+                    cold_engines.append(self._pop_locked(key))
         
+        for cold_engine in cold_engines:
+            cold_engine.dispose()
+        return engine
+    
+    def _pop_locked(self, fingerprint):
+        self._last_used.pop(fingerprint, None)
+        self._counters.pop(fingerprint, None)
+        return self._engines.pop(fingerprint)
+    
+    def dispose(self, connection_info):
+        """Dispose the engine for a connection, e.g. after its settings change"""
         with self._lock:
-            if pool_key not in self._pools:
-                try:
-                    # Create new connection pool with configurable settings
-                    config = get_db_config()
-                    pool = await asyncpg.create_pool(
-                        host=connection_info.get('host'),
-                        port=connection_info.get('port', 5432),
-                        user=connection_info.get('username'),
-                        password=connection_info.get('password'),
-                        database=connection_info.get('database'),
-                        min_size=config['pool_minsize'],
-                        max_size=config['pool_maxsize'],
-                        command_timeout=config['connection_timeout'],
-                    )
-                    self._pools[pool_key] = pool
-                    logger.info(f"Created new PostgreSQL connection pool for {pool_key}")
-                except Exception as e:
-                    logger.error(f"Failed to create PostgreSQL connection pool: {e}")
-                    raise
-                    
-            return self._pools[pool_key]
+            fingerprint = get_connection_fingerprint(connection_info)
+            engine = self._pop_locked(fingerprint) if fingerprint in self._engines else None
+        if engine is not None:
+            engine.dispose()
     
-    async def close_all_pools(self):
-        """Close all connection pools"""
+    def dispose_all(self):
+        """Dispose every engine, closing their pooled connections"""
         with self._lock:
-            for pool_key, pool in self._pools.items():
-                try:
-                    await pool.close()
-                    logger.info(f"Closed PostgreSQL connection pool for {pool_key}")
-                except Exception as e:
-                    logger.error(f"Error closing PostgreSQL pool {pool_key}: {e}")
-            self._pools.clear()
+            engines = list(self._engines.values())
+            self._engines.clear()
+            self._last_used.clear()
+            self._counters.clear()
+        for engine in engines:
+            engine.dispose()
+    
+    def get_stats(self):
+        """Return checkout/overflow statistics for every live engine"""
+        with self._lock:
+            items = [(engine, dict(self._counters.get(key, {}))) for key, engine in self._engines.items()]
+        stats = {}
+        for engine, counters in items:
+            pool = engine.pool
+            stats[engine.url.render_as_string(hide_password=True)] = dict(
+                counters,
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        return stats
 
 # Global connection pool managers
 _connection_pool = MySQLConnectionPool()
 _postgresql_pool = PostgreSQLConnectionPool()
+_sync_pool_registry = SyncPoolRegistry()
+atexit.register(_sync_pool_registry.close_all_pools)
+_engine_registry = SQLAlchemyEngineRegistry() if SQLALCHEMY_AVAILABLE else None
+if _engine_registry is not None:
+    atexit.register(_engine_registry.dispose_all)
 
 # Import persistent configuration
 from .db_config import get_config, update_config
@@ -164,163 +796,173 @@ async def close_connection_pools():
     await _connection_pool.close_all_pools()
     await _postgresql_pool.close_all_pools()
 
-async def execute_mysql_query_async(connection_info, query, query_timeout=None):
-    """Execute query using connection pool with timeout"""
+def close_sync_connection_pools():
+    """Close all synchronous connection pools held by this worker"""
+    _sync_pool_registry.close_all_pools()
+
+def invalidate_connection_pools(connection_info):
+    """Drop pooled connections for a connection whose settings changed"""
+    _sync_pool_registry.invalidate(connection_info)
+
+def get_connection_pool_stats():
+    """Return usage counters for the synchronous connection pools, SQLAlchemy engines and coalesced executions in this worker"""
+    return {
+        'pools': _sync_pool_registry.get_stats(),
+        'engines': _engine_registry.get_stats() if _engine_registry is not None else {},
+        'single_flight': single_flight.get_stats(),
+    }
+
+def dispose_sqlalchemy_engines():
+    """Dispose all SQLAlchemy engines held by this worker"""
+    if _engine_registry is not None:
+        _engine_registry.dispose_all()
+
+def release_connection_resources(connection_info):
+    """Drop pooled connections, engines and cached results for a connection that changed or was deleted"""
+    _sync_pool_registry.invalidate(connection_info)
+    if _engine_registry is not None:
+        _engine_registry.dispose(connection_info)
+    query_cache.invalidate_connection(get_connection_fingerprint(connection_info))
+
+async def execute_mysql_query_async(connection_info, query, query_timeout=None, result_format='rows'):
+    """Execute query using the per-loop connection pool with timeout"""
     try:
         if query_timeout is None:
             query_timeout = get_db_config()['query_timeout']
             
         pool = await _connection_pool.get_pool(connection_info)
         
+        target = dict(connection_info, type='mysql')
         async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
+            # Read queries stream rows from the socket so the result budget bounds memory
+            cursor = await conn.cursor(aiomysql.SSCursor if _is_read_query(query) else aiomysql.Cursor)
+            reusable = True
+            try:
                 start_time = time.time()
+                deadline = start_time + query_timeout
                 
-                # Execute query with timeout
-                try:
-                    await asyncio.wait_for(cursor.execute(query), timeout=query_timeout)
-                except asyncio.TimeoutError:
-                    raise Exception(f"Query timeout after {query_timeout} seconds")
-                
-                # Handle different query types
-                if query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN')):
-                    rows = await cursor.fetchall()
-                    # Convert rows to list of dicts and serialize
-                    serialized_rows = [serialize_row(dict(row)) for row in rows]
-                    
-                    # Get column names
-                    columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                # Execute query with timeout; the statement is killed server-side if abandoned
+                with _track_running_query(target, conn.thread_id(), query) as entry:
+                    await _await_statement(cursor.execute(query), target, entry, query_timeout)
                     
-                    result = {
-                        'columns': columns,
-                        'rows': serialized_rows,
-                        'rowCount': len(rows),
-                        'time': time.time() - start_time
-                    }
-                else:
-                    # For INSERT, UPDATE, DELETE, etc.
-                    # Note: autocommit is enabled in pool, so no need to commit
-                    result = {
-                        'rowCount': cursor.rowcount,
-                        'time': time.time() - start_time
-                    }
+                    # Handle different query types
+                    if cursor.description is not None:
+                        # Get column names
+                        columns = [desc[0] for desc in cursor.description]
+                        
+                        # Fetch in batches until the result is exhausted or over its row/byte budget
+                        budget = ResultBudget.for_connection(target, columns)
+                        while budget.add(await _await_statement(
+                                cursor.fetchmany(budget.next_batch_size()), target, entry,
+                                max(deadline - time.time(), 0.001))):
+                            pass
+                        reusable = not budget.truncated
+                        
+                        result = build_budgeted_result(columns, budget, start_time, result_format)
+                    else:
+                        # For INSERT, UPDATE, DELETE, etc.
+                        # Note: autocommit is enabled in pool, so no need to commit
+                        result = {
+                            'rowCount': cursor.rowcount,
+                            'time': time.time() - start_time
+                        }
                 
                 return result
+            except BaseException:
+                reusable = False
+                raise
+            finally:
+                if reusable:
+                    await cursor.close()
+                else:
+                    # Unread or killed results would have to be drained first; drop the socket instead
+                    conn.close()
                 
     except Exception as e:
         logger.error(f"MySQL query execution error: {e}")
         raise Exception(f"MySQL Error: {e}")
 
-def execute_mysql_query(connection_info, query, query_timeout=None):
+def execute_mysql_query(connection_info, query, query_timeout=None, result_format='rows'):
     """Synchronous MySQL query execution with improved timeout handling"""
     try:
         if query_timeout is None:
             query_timeout = get_db_config()['query_timeout']
         
-        # Always use the synchronous execution to avoid async loop issues in Django
-        return execute_mysql_query_fallback(connection_info, query, query_timeout)
+        # Always use the synchronous execution to avoid async loop issues in Django;
+        # connections come from the per-worker sync pool so repeated cells skip the handshake
+        return execute_mysql_query_fallback(connection_info, query, query_timeout, result_format)
     except Exception as e:
         logger.error(f"MySQL query execution failed: {e}")
         raise
 
-def execute_mysql_query_fallback(connection_info, query, query_timeout=None):
-    """Synchronous MySQL query execution with improved timeout and error handling"""
+def execute_mysql_query_fallback(connection_info, query, query_timeout=None, result_format='rows'):
+    """Synchronous MySQL query execution on a pooled connection with timeout and error handling"""
     try:
         if query_timeout is None:
             query_timeout = get_db_config()['query_timeout']
         
-        # Configure connection with proper timeout handling
-        connection_config = {
-            'host': connection_info.get('host'),
-            'port': connection_info.get('port', 3306),
-            'database': connection_info.get('database'),
-            'user': connection_info.get('username'),
-            'password': connection_info.get('password'),
-            'connection_timeout': get_db_config()['connection_timeout'],
-            'autocommit': True,
-            'charset': 'utf8mb4',
-            'use_unicode': True
-        }
-        
-        # Add SSL config if present
-        if connection_info.get('ssl_ca'):
-            connection_config.update({
-                'ssl_ca': connection_info.get('ssl_ca'),
-                'ssl_cert': connection_info.get('ssl_cert'),
-                'ssl_key': connection_info.get('ssl_key'),
-                'ssl_verify_cert': True
-            })
-        
-        logger.debug(f"Connecting to MySQL with host: {connection_config['host']}")
-        conn = mysql.connector.connect(**connection_config)
-        cursor = conn.cursor()
-        
-        # Set timeouts with improved error handling
-        timeout_queries = []
-        
-        # Try modern MySQL timeout setting first
-        try:
-            timeout_queries.append(f"SET SESSION max_execution_time = {int(query_timeout * 1000)}")
-        except Exception as e:
-            logger.debug(f"max_execution_time not supported: {e}")
-        
-        # Try wait_timeout as fallback
-        try:
-            timeout_queries.append(f"SET SESSION wait_timeout = {int(query_timeout)}")
-        except Exception as e:
-            logger.debug(f"wait_timeout not supported: {e}")
+        connection_info = dict(connection_info, type='mysql')
+        pool = _sync_pool_registry.get_pool(connection_info)
         
-        # Try interactive_timeout as additional fallback
-        try:
-            timeout_queries.append(f"SET SESSION interactive_timeout = {int(query_timeout)}")
-        except Exception as e:
-            logger.debug(f"interactive_timeout not supported: {e}")
-        
-        # Execute timeout settings that work
-        for timeout_query in timeout_queries:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
             try:
-                cursor.execute(timeout_query)
-                logger.debug(f"Successfully set: {timeout_query}")
-                break  # Use the first one that works
-            except mysql.connector.Error as e:
-                if e.errno == 1193:  # Unknown system variable
-                    logger.debug(f"Timeout setting not supported: {timeout_query}, error: {e}")
-                    continue
-                else:
-                    # Other errors should be re-raised
-                    raise
-        
-        start_time = time.time()
-        
-        # Execute the main query
-        cursor.execute(query)
-        
-        # Handle different query types
-        if query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN', 'WITH')):
-            rows = cursor.fetchall()
-            
-            # Get column names
-            columns = [desc[0] for desc in cursor.description] if cursor.description else []
-            
-            # Convert rows to list of dicts and serialize
-            row_dicts = [dict(zip(columns, row)) for row in rows]
-            serialized_rows = [serialize_row(row_dict) for row_dict in row_dicts]
-            
-            result = {
-                'columns': columns,
-                'rows': serialized_rows,
-                'rowCount': len(rows),
-                'time': time.time() - start_time
-            }
-        else:
-            # For INSERT, UPDATE, DELETE, etc.
-            result = {
-                'rowCount': cursor.rowcount,
-                'time': time.time() - start_time
-            }
+                # Set timeouts with improved error handling
+                timeout_queries = [
+                    # Try modern MySQL timeout setting first
+                    f"SET SESSION max_execution_time = {int(query_timeout * 1000)}",
+                    # Try wait_timeout as fallback
+                    f"SET SESSION wait_timeout = {int(query_timeout)}",
+                    # Try interactive_timeout as additional fallback
+                    f"SET SESSION interactive_timeout = {int(query_timeout)}",
+                ]
+                
+                # Execute timeout settings that work
+                for timeout_query in timeout_queries:
+                    try:
+                        cursor.execute(timeout_query)
+                        logger.debug(f"Successfully set: {timeout_query}")
+                        break  # Use the first one that works
+                    except mysql.connector.Error as e:
+                        if e.errno == 1193:  # Unknown system variable
+                            logger.debug(f"Timeout setting not supported: {timeout_query}, error: {e}")
+                            continue
+                        else:
+                            # Other errors should be re-raised
+                            raise
+                
+                start_time = time.time()
+                
+                # Execute the main query, tracked so it can be killed on cancel or timeout
+                with _track_running_query(connection_info, conn.connection_id, query, query_timeout):
+                    cursor.execute(query)
+                    
+                    # Handle different query types
+                    if query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN', 'WITH')):
+                        # Get column names
+                        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                        
+                        # Stream rows in batches until the result is exhausted or over its row/byte budget
+                        budget = ResultBudget.for_connection(connection_info, columns)
+                        budget.fetch(cursor)
+                        if budget.truncated:
+                            # Unread rows stay on the socket; drop the connection rather than drain them
+                            pool.discard_on_release(conn)
+                        
+                        result = build_budgeted_result(columns, budget, start_time, result_format)
+                    else:
+                        # For INSERT, UPDATE, DELETE, etc.
+                        result = {
+                            'rowCount': cursor.rowcount,
+                            'time': time.time() - start_time
+                        }
+            finally:
+                try:
+                    cursor.close()
+                except mysql.connector.Error:
+                    # Rows left unread by truncation or an error; the connection is not reused
+                    pool.discard_on_release(conn)
         
-        cursor.close()
-        conn.close()
         return result
         
     except mysql.connector.Error as err:
@@ -330,172 +972,291 @@ def execute_mysql_query_fallback(connection_info, query, query_timeout=None):
         logger.error(f"General MySQL execution error: {e}")
         raise Exception(f"MySQL Error: {e}")
 
-async def get_mysql_schema_info_async(connection_info):
-    """Get schema, tables, and column information from MySQL database using connection pool"""
+# Schema introspection reads each schema's tables, columns and keys in bulk
+# queries and assembles them in Python, instead of one query per table
+_MYSQL_TABLES_SQL = """
+    SELECT table_name AS 'name', 
+           table_rows AS 'rows',
+           CASE WHEN table_type = 'BASE TABLE' THEN 'table' 
+                WHEN table_type = 'VIEW' THEN 'view' 
+                ELSE table_type END AS 'type',
+           CASE WHEN table_type = 'VIEW' THEN '' 
+                ELSE table_comment END AS 'comment'
+    FROM information_schema.tables 
+    WHERE table_schema = %s 
+    ORDER BY table_name
+"""
+
+_MYSQL_COLUMNS_SQL = """
+    SELECT table_name AS 'table_name',
+           column_name AS 'name', 
+           data_type AS 'type',
+           column_key AS 'key',
+           is_nullable AS 'nullable',
+           column_comment AS 'comment'
+    FROM information_schema.columns 
+    WHERE table_schema = %s 
+    ORDER BY table_name, ordinal_position
+"""
+
+# Declared foreign keys, one row per column pair in constraint order
+_MYSQL_FOREIGN_KEYS_SQL = """
+    SELECT k.table_name AS 'table_name',
+           k.constraint_name AS 'name',
+           k.column_name AS 'column_name',
+           k.referenced_table_schema AS 'ref_schema',
+           k.referenced_table_name AS 'ref_table',
+           k.referenced_column_name AS 'ref_column'
+    FROM information_schema.key_column_usage k
+    JOIN information_schema.referential_constraints r
+      ON r.constraint_schema = k.constraint_schema
+     AND r.constraint_name = k.constraint_name
+     AND r.table_name = k.table_name
+    WHERE k.table_schema = %s AND k.referenced_table_name IS NOT NULL
+    ORDER BY k.table_name, k.constraint_name, k.ordinal_position
+"""
+
+# Index definitions, one row per indexed column in index order; functional key
+# parts have no column and are left out
+_MYSQL_INDEXES_SQL = """
+    SELECT table_name AS 'table_name',
+           index_name AS 'name',
+           column_name AS 'column_name',
+           non_unique = 0 AS 'is_unique',
+           index_name = 'PRIMARY' AS 'is_primary'
+    FROM information_schema.statistics
+    WHERE table_schema = %s AND column_name IS NOT NULL
+    ORDER BY table_name, index_name, seq_in_index
+"""
+
+# Strongest key wins when a column is part of several indexes
+_KEY_RANK = {'PRI': 3, 'UNI': 2, 'MUL': 1}
+
+def _index_key_rows(indexes):
+    """Key rows (table_name, column_name, key) for the columns covered by indexes, like MySQL's column_key"""
+    for index in indexes:
+        key = 'PRI' if index['is_primary'] else 'UNI' if index['is_unique'] else 'MUL'
+        yield {'table_name': index['table_name'], 'column_name': index['column_name'], 'key': key}
+
+def _group_constraints(rows, build):
+    """
+    Group per-column constraint rows (ordered by table, name and position) into
+    {table_name: [constraint]}; build(first_row) makes the constraint, whose
+    'columns' list collects the rows' column_name
+    """
+    grouped = {}
+    current = {}
+    for row in rows:
+        position = (row['table_name'], row['name'])
+        constraint = current.get(position)
+        if constraint is None:
+            constraint = current[position] = build(row)
+            grouped.setdefault(row['table_name'], []).append(constraint)
+        constraint['columns'].append(row['column_name'])
+        if 'references' in constraint:
+            constraint['references']['columns'].append(row['ref_column'])
+    return grouped
+
+def _assemble_schema(schema_name, tables, columns, keys=(), indexes=(), foreign_keys=()):
+    """
+    Build a schema entry from bulk-fetched rows: tables (name, type, rows), columns
+    (table_name, name, type, key, nullable), optional keys (table_name, column_name, key),
+    indexes (table_name, name, column_name, is_unique, is_primary) and foreign keys
+    (table_name, name, column_name, ref_schema, ref_table, ref_column).
+    Tables and columns get a comment, indexes and foreign keys only when the catalog has any
+    """
+    table_indexes = _group_constraints(indexes, lambda row: {
+        'name': row['name'], 'columns': [], 'unique': bool(row['is_unique']), 'primary': bool(row['is_primary'])
+    })
+    table_foreign_keys = _group_constraints(foreign_keys, lambda row: {
+        'name': row['name'], 'columns': [],
+        'references': {'schema': row['ref_schema'], 'table': row['ref_table'], 'columns': []}
+    })
+    
+    column_keys = {}
+    for key_row in keys:
+        position = (key_row['table_name'], key_row['column_name'])
+        if _KEY_RANK.get(key_row['key'], 0) > _KEY_RANK.get(column_keys.get(position), 0):
+            column_keys[position] = key_row['key']
+    
+    columns_by_table = {}
+    for column in columns:
+        entry = {
+            'name': column['name'],
+            'type': column['type'],
+            'key': column_keys.get((column['table_name'], column['name']), column.get('key') or ''),
+            'nullable': column['nullable']
+        }
+        if column.get('comment'):
+            entry['comment'] = column['comment']
+        columns_by_table.setdefault(column['table_name'], []).append(entry)
+    
+    assembled = []
+    for table in tables:
+        entry = {
+            'name': table['name'],
+            'type': table['type'],
+            'rows': table['rows'] or 0,
+            'columns': columns_by_table.get(table['name'], [])
+        }
+        if table.get('comment'):
+            entry['comment'] = table['comment']
+        if table['name'] in table_indexes:
+            entry['indexes'] = table_indexes[table['name']]
+        if table['name'] in table_foreign_keys:
+            entry['foreign_keys'] = table_foreign_keys[table['name']]
+        assembled.append(entry)
+    return {'name': schema_name, 'tables': assembled}
+
+# Databases a MySQL user can see, without the server's own
+_MYSQL_DATABASES_SQL = """
+    SELECT schema_name AS 'schema_name'
+    FROM information_schema.schemata 
+    WHERE schema_name NOT IN ('information_schema', 'mysql', 'performance_schema', 'sys')
+    ORDER BY schema_name
+"""
+
+def _schema_concurrency(count):
+    """Schemas introspected at once, bounded by the pool size so introspection can't starve it"""
+    config = get_db_config()
+    return max(1, min(count, config['schema_introspection_concurrency'], config['pool_maxsize']))
+
+def _introspects_all_mysql_databases(connection_info):
+    """Connections without a database, or with schema_mysql_all_databases set, cover every accessible database"""
+    return not connection_info.get('database') or get_db_config()['schema_mysql_all_databases']
+
+def _select_schema_names(names, schema_names):
+    return [name for name in names if schema_names is None or name in schema_names]
+
+async def _iter_schemas_concurrently(names, introspect):
+    """
+    Run introspect(name) for every schema with bounded concurrency, yielding each
+    schema as soon as it is assembled; introspect may return None to skip a schema
+    """
+    semaphore = asyncio.Semaphore(_schema_concurrency(len(names)))
+    
+    async def bounded(name):
+        async with semaphore:
+            return await introspect(name)
+    
+    tasks = [asyncio.ensure_future(bounded(name)) for name in names]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            schema = await next_done
+            if schema is not None:
+                yield schema
+    finally:
+        # The consumer stopped early or a schema failed
+        for task in tasks:
+            task.cancel()
+
+def _introspect_concurrently(pool, names, fetch):
+    """
+    Run fetch(conn, name) for every schema on connections from a sync pool, with
+    bounded concurrency; returns the schemas in name order
+    """
+    def run(name):
+        with pool.connection() as conn:
+            return fetch(conn, name)
+    
+    workers = _schema_concurrency(len(names))
+    if workers == 1:
+        results = [run(name) for name in names]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='schema-introspection') as executor:
+            results = list(executor.map(run, names))
+    return [schema for schema in results if schema is not None]
+
+async def iter_mysql_schema_info_async(connection_info, schema_names=None):
+    """Yield MySQL databases' schema information as each one is introspected"""
     try:
         pool = await _connection_pool.get_pool(connection_info)
         
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                schemas = []
-                
-                # Get all tables in the current database
-                current_db = connection_info.get('database')
-                
-                if current_db:
-                    await cursor.execute(
-                        """SELECT table_schema AS 'schema', 
-                                  table_name AS 'name', 
-                                  table_rows AS 'rows',
-                                  CASE WHEN table_type = 'BASE TABLE' THEN 'table' 
-                                       WHEN table_type = 'VIEW' THEN 'view' 
-                                       ELSE table_type END AS 'type'
-                           FROM information_schema.tables 
-                           WHERE table_schema = %s 
-                           ORDER BY table_name""", 
-                        (current_db,)
-                    )
+        if _introspects_all_mysql_databases(connection_info):
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(_MYSQL_DATABASES_SQL)
+                    names = [row['schema_name'] for row in await cursor.fetchall()]
+        else:
+            names = [connection_info['database']]
+        
+        async def introspect(database):
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(_MYSQL_TABLES_SQL, (database,))
                     tables = await cursor.fetchall()
-                    
-                    # Get table and column information
-                    schema_data = {
-                        'name': current_db,
-                        'tables': []
-                    }
-                    
-                    for table in tables:
-                        # Get column information for each table
-                        await cursor.execute(
-                            """SELECT column_name AS 'name', 
-                                      data_type AS 'type',
-                                      column_key AS 'key',
-                                      is_nullable AS 'nullable'
-                               FROM information_schema.columns 
-                               WHERE table_schema = %s AND table_name = %s 
-                               ORDER BY ordinal_position""", 
-                            (current_db, table['name'])
-                        )
-                        columns = await cursor.fetchall()
-                        
-                        # Convert columns to list of dicts
-                        columns_list = [dict(col) for col in columns]
-                        
-                        # Add table with its columns to the schema
-                        schema_data['tables'].append({
-                            'name': table['name'],
-                            'type': table['type'],
-                            'rows': table['rows'] or 0,
-                            'columns': columns_list
-                        })
-                    
-                    schemas.append(schema_data)
-                
-                return schemas
+                    await cursor.execute(_MYSQL_COLUMNS_SQL, (database,))
+                    columns = await cursor.fetchall()
+                    await cursor.execute(_MYSQL_INDEXES_SQL, (database,))
+                    indexes = await cursor.fetchall()
+                    await cursor.execute(_MYSQL_FOREIGN_KEYS_SQL, (database,))
+                    foreign_keys = await cursor.fetchall()
+            return _assemble_schema(database, tables, columns, indexes=indexes, foreign_keys=foreign_keys)
+        
+        async for schema in _iter_schemas_concurrently(_select_schema_names(names, schema_names), introspect):
+            yield schema
                 
     except Exception as e:
         logger.error(f"MySQL schema info error: {e}")
         raise Exception(f"MySQL Error: {e}")
 
-def get_mysql_schema_info(connection_info):
-    """Synchronous wrapper for async MySQL schema info retrieval"""
-    try:
-        # Get or create event loop
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        # If the loop is already running, run in thread pool
-        if loop.is_running():
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, get_mysql_schema_info_async(connection_info))
-                return future.result()
-        else:
-            return loop.run_until_complete(get_mysql_schema_info_async(connection_info))
-            
-    except Exception as e:
-        # Fallback to synchronous connection if async fails
-        logger.warning(f"Async schema retrieval failed, falling back to sync: {e}")
-        return get_mysql_schema_info_fallback(connection_info)
+async def get_mysql_schema_info_async(connection_info, schema_names=None):
+    """Get schema, tables, and column information from MySQL database using connection pool"""
+    schemas = [schema async for schema in iter_mysql_schema_info_async(connection_info, schema_names)]
+    schemas.sort(key=lambda schema: schema['name'])
+    return apply_exact_row_counts(connection_info, schemas)
 
-def get_mysql_schema_info_fallback(connection_info):
-    """Fallback synchronous MySQL schema info retrieval"""
+def get_mysql_schema_info(connection_info, schema_names=None):
+    """Synchronous MySQL schema info retrieval on the per-worker connection pool"""
     try:
-        config = {
-            'host': connection_info.get('host'),
-            'port': connection_info.get('port'),
-            'database': connection_info.get('database'),
-            'user': connection_info.get('username'),
-            'password': connection_info.get('password'),
-            'connection_timeout': get_db_config()['connection_timeout'],
-            'charset': 'utf8mb4'
-        }
-        
-        conn = mysql.connector.connect(**config)
-        
-        cursor = conn.cursor(dictionary=True)
-        schemas = []
-        
-        # Get all tables in the current database
-        current_db = connection_info.get('database')
-        
-        if current_db:
-            cursor.execute(
-                """SELECT table_schema AS 'schema', 
-                          table_name AS 'name', 
-                          table_rows AS 'rows',
-                          CASE WHEN table_type = 'BASE TABLE' THEN 'table' 
-                               WHEN table_type = 'VIEW' THEN 'view' 
-                               ELSE table_type END AS 'type'
-                   FROM information_schema.tables 
-                   WHERE table_schema = %s 
-                   ORDER BY table_name""", 
-                (current_db,)
-            )
-            tables = cursor.fetchall()
-            
-            # Get table and column information
-            schema_data = {
-                'name': current_db,
-                'tables': []
-            }
-            
-            for table in tables:
-                # Get column information for each table
-                cursor.execute(
-                    """SELECT column_name AS 'name', 
-                              data_type AS 'type',
-                              column_key AS 'key',
-                              is_nullable AS 'nullable'
-                       FROM information_schema.columns 
-                       WHERE table_schema = %s AND table_name = %s 
-                       ORDER BY ordinal_position""", 
-                    (current_db, table['name'])
-                )
-                columns = cursor.fetchall()
-                
-                # Add table with its columns to the schema
-                schema_data['tables'].append({
-                    'name': table['name'],
-                    'type': table['type'],
-                    'rows': table['rows'] or 0,
-                    'columns': columns
-                })
-            
-            schemas.append(schema_data)
-        
-        cursor.close()
-        conn.close()
-        
-        return schemas
+        # Async callers should use get_mysql_schema_info_async on their own loop;
+        # spinning up a loop here would strand the aiomysql pool once it closes
+        return get_mysql_schema_info_fallback(connection_info, schema_names)
+    except Exception as e:
+        logger.error(f"MySQL schema retrieval failed: {e}")
+        raise
+
+def get_mysql_schema_info_fallback(connection_info, schema_names=None):
+    """Fallback synchronous MySQL schema info retrieval"""
+    try:
+        pool = _sync_pool_registry.get_pool(dict(connection_info, type='mysql'))
+        if _introspects_all_mysql_databases(connection_info):
+            with pool.connection() as conn:
+                names = _fetch_mysql_databases(conn)
+        else:
+            names = [connection_info['database']]
+        schemas = _introspect_concurrently(pool, _select_schema_names(names, schema_names), _fetch_mysql_schema)
+        return apply_exact_row_counts(connection_info, schemas)
         
     except mysql.connector.Error as err:
         raise Exception(f"MySQL Error: {err}")
 
-async def execute_postgresql_query_async(connection_info, query, query_timeout=None):
-    """Execute query using PostgreSQL connection pool with timeout"""
+def _fetch_mysql_databases(conn):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(_MYSQL_DATABASES_SQL)
+        return [row['schema_name'] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def _fetch_mysql_schema(conn, database):
+    """Read one MySQL database's tables, columns, indexes and foreign keys over an open connection"""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(_MYSQL_TABLES_SQL, (database,))
+        tables = cursor.fetchall()
+        cursor.execute(_MYSQL_COLUMNS_SQL, (database,))
+        columns = cursor.fetchall()
+        cursor.execute(_MYSQL_INDEXES_SQL, (database,))
+        indexes = cursor.fetchall()
+        cursor.execute(_MYSQL_FOREIGN_KEYS_SQL, (database,))
+        foreign_keys = cursor.fetchall()
+        return _assemble_schema(database, tables, columns, indexes=indexes, foreign_keys=foreign_keys)
+    finally:
+        cursor.close()
+
+async def execute_postgresql_query_async(connection_info, query, query_timeout=None, result_format='rows'):
+    """Execute query using the per-loop PostgreSQL connection pool with timeout"""
     try:
         if query_timeout is None:
             query_timeout = get_db_config()['query_timeout']
@@ -505,28 +1266,32 @@ async def execute_postgresql_query_async(connection_info, query, query_timeout=N
         async with pool.acquire() as conn:
             start_time = time.time()
             
-            # Execute query with timeout
-            try:
+            # Execute query with timeout; the statement is cancelled server-side if abandoned
+            target = dict(connection_info, type='postgresql')
+            deadline = start_time + query_timeout
+            with _track_running_query(target, conn.get_server_pid(), query) as entry:
                 if query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN', 'WITH')):
-                    # For SELECT queries, fetch all rows
-                    result_rows = await asyncio.wait_for(conn.fetch(query), timeout=query_timeout)
-                    
-                    # Convert asyncpg.Record objects to dictionaries
-                    rows = [dict(row) for row in result_rows]
-                    serialized_rows = [serialize_row(row) for row in rows]
+                    # Prepare first so column names are known even when no rows come back
+                    statement = await _await_statement(conn.prepare(query), target, entry, query_timeout)
+                    columns = [attribute.name for attribute in statement.get_attributes()]
+                    budget = ResultBudget.for_connection(target, columns)
                     
-                    # Get column names from the first row if available
-                    columns = list(result_rows[0].keys()) if result_rows else []
+                    if _is_streamable_query(query):
+                        # Fetch through a cursor in batches until exhausted or over the row/byte budget
+                        async with conn.transaction():
+                            cursor = await _await_statement(statement.cursor(), target, entry, query_timeout)
+                            while budget.add(await _await_statement(
+                                    cursor.fetch(budget.next_batch_size()), target, entry,
+                                    max(deadline - time.time(), 0.001))):
+                                pass
+                    else:
+                        budget.add(await _await_statement(statement.fetch(), target, entry, query_timeout))
                     
-                    result = {
-                        'columns': columns,
-                        'rows': serialized_rows,
-                        'rowCount': len(rows),
-                        'time': time.time() - start_time
-                    }
+                    budget.rows = [tuple(record) for record in budget.rows]
+                    result = build_budgeted_result(columns, budget, start_time, result_format)
                 else:
                     # For INSERT, UPDATE, DELETE, etc.
-                    status = await asyncio.wait_for(conn.execute(query), timeout=query_timeout)
+                    status = await _await_statement(conn.execute(query), target, entry, query_timeout)
                     
                     # Extract row count from status string like "INSERT 0 5"
                     row_count = 0
@@ -542,326 +1307,391 @@ async def execute_postgresql_query_async(connection_info, query, query_timeout=N
                 
                 return result
                 
-            except asyncio.TimeoutError:
-                raise Exception(f"Query timeout after {query_timeout} seconds")
-                
     except Exception as e:
         logger.error(f"PostgreSQL query execution error: {e}")
         raise Exception(f"PostgreSQL Error: {e}")
 
-def execute_postgresql_query(connection_info, query, query_timeout=None):
+def execute_postgresql_query(connection_info, query, query_timeout=None, result_format='rows'):
     """Synchronous wrapper for async PostgreSQL query execution"""
     try:
         if query_timeout is None:
             query_timeout = get_db_config()['query_timeout']
         
         # Always use the synchronous fallback to avoid async loop issues
-        # The async version has loop conflicts in Django request context
-        return execute_postgresql_query_fallback(connection_info, query, query_timeout)
+        # The async version has loop conflicts in Django request context;
+        # the fallback reuses connections from the per-worker sync pool
+        return execute_postgresql_query_fallback(connection_info, query, query_timeout, result_format)
     except Exception as e:
         logger.error(f"PostgreSQL query execution failed: {e}")
         raise
 
-def execute_postgresql_query_fallback(connection_info, query, query_timeout=None):
-    """Fallback synchronous PostgreSQL query execution with timeout"""
+def execute_postgresql_query_fallback(connection_info, query, query_timeout=None, result_format='rows'):
+    """Synchronous PostgreSQL query execution on a pooled connection with timeout"""
     try:
         if query_timeout is None:
             query_timeout = get_db_config()['query_timeout']
         
-        # Configure connection
-        conn = psycopg2.connect(
-            host=connection_info.get('host'),
-            port=connection_info.get('port', 5432),
-            database=connection_info.get('database'),
-            user=connection_info.get('username'),
-            password=connection_info.get('password'),
-            connect_timeout=get_db_config()['connection_timeout']
-        )
-        
-        conn.autocommit = True
-        cursor = conn.cursor()
-        start_time = time.time()
-        
-        # Set statement timeout for the query
-        cursor.execute(f"SET statement_timeout = '{query_timeout * 1000}ms'")
+        connection_info = dict(connection_info, type='postgresql')
+        pool = _sync_pool_registry.get_pool(connection_info)
         
-        # Execute the main query
-        cursor.execute(query)
-        
-        # Handle different query types
-        if query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN', 'WITH')):
-            rows = cursor.fetchall()
-            
-            # Get column names
-            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        with pool.connection() as conn:
+            start_time = time.time()
             
-            # Convert rows to list of dicts and serialize
-            row_dicts = [dict(zip(columns, row)) for row in rows]
-            serialized_rows = [serialize_row(row_dict) for row_dict in row_dicts]
+            # Set statement timeout for the query
+            with conn.cursor() as cursor:
+                cursor.execute(f"SET statement_timeout = '{query_timeout * 1000}ms'")
             
-            result = {
-                'columns': columns,
-                'rows': serialized_rows,
-                'rowCount': len(rows),
-                'time': time.time() - start_time
-            }
-        else:
-            # For INSERT, UPDATE, DELETE, etc.
-            result = {
-                'rowCount': cursor.rowcount,
-                'time': time.time() - start_time
-            }
+            # Execute the main query, tracked so it can be cancelled on request
+            with _track_running_query(connection_info, conn.get_backend_pid(), query, query_timeout):
+                if _is_streamable_query(query):
+                    # Plain cursors buffer the whole result client-side; a named cursor lets the
+                    # result budget stop fetching once it is spent
+                    result = _fetch_postgresql_streamed(conn, connection_info, query, start_time, result_format)
+                else:
+                    with conn.cursor() as cursor:
+                        cursor.execute(query)
+                        
+                        # Handle different query types
+                        if cursor.description is not None:
+                            # Get column names
+                            columns = [desc[0] for desc in cursor.description]
+                            
+                            budget = ResultBudget.for_connection(connection_info, columns)
+                            budget.fetch(cursor)
+                            
+                            result = build_budgeted_result(columns, budget, start_time, result_format)
+                        else:
+                            # For INSERT, UPDATE, DELETE, etc.
+                            result = {
+                                'rowCount': cursor.rowcount,
+                                'time': time.time() - start_time
+                            }
         
-        cursor.close()
-        conn.close()
         return result
         
     except psycopg2.Error as err:
         raise Exception(f"PostgreSQL Error: {err}")
 
-async def get_postgresql_schema_info_async(connection_info):
-    """Get schema, tables, and column information from PostgreSQL database using connection pool"""
+def _fetch_postgresql_streamed(conn, connection_info, query, start_time, result_format='rows'):
+    """Run a read-only SELECT on a named cursor, fetching batches until exhausted or over budget"""
+    # Named cursors need a transaction; it is rolled back once the rows are read
+    conn.autocommit = False
+    try:
+        with conn.cursor(name=f"rca_{secrets.token_hex(8)}") as cursor:
+            cursor.execute(query)
+            budget = ResultBudget.for_connection(connection_info)
+            batch = cursor.fetchmany(budget.next_batch_size())
+            
+            # Named cursors only describe their columns after the first fetch
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            budget.set_columns(columns)
+            if budget.add(batch):
+                budget.fetch(cursor)
+        
+        return build_budgeted_result(columns, budget, start_time, result_format)
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+
+_POSTGRESQL_SCHEMAS_SQL = """
+    SELECT schema_name 
+    FROM information_schema.schemata 
+    WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
+    ORDER BY schema_name
+"""
+
+# Row counts are the planner's estimates; reltuples is -1 until a table was analyzed
+_POSTGRESQL_TABLES_SQL = """
+    SELECT 
+        t.tablename as name,
+        'table' as type,
+        CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint
+             ELSE COALESCE(s.n_live_tup, 0) END as rows,
+        obj_description(c.oid, 'pg_class') as comment
+    FROM pg_tables t
+    JOIN pg_namespace n ON n.nspname = t.schemaname
+    JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = t.tablename
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE t.schemaname = %(schema)s
+    UNION ALL
+    SELECT 
+        v.viewname as name,
+        'view' as type,
+        0 as rows,
+        obj_description(vc.oid, 'pg_class') as comment
+    FROM pg_views v
+    JOIN pg_namespace vn ON vn.nspname = v.schemaname
+    JOIN pg_class vc ON vc.relnamespace = vn.oid AND vc.relname = v.viewname
+    WHERE v.schemaname = %(schema)s
+    ORDER BY name
+"""
+
+_POSTGRESQL_COLUMNS_SQL = """
+    SELECT 
+        table_name,
+        column_name as name,
+        data_type as type,
+        is_nullable as nullable,
+        col_description((quote_ident(table_schema) || '.' || quote_ident(table_name))::regclass,
+                        ordinal_position::int) as comment
+    FROM information_schema.columns
+    WHERE table_schema = %(schema)s
+    ORDER BY table_name, ordinal_position
+"""
+
+# Index definitions, one row per indexed column in index order; expression
+# key parts (attnum 0) have no column and are left out
+_POSTGRESQL_INDEXES_SQL = """
+    SELECT 
+        t.relname as table_name,
+        ic.relname as name,
+        a.attname as column_name,
+        i.indisunique as is_unique,
+        i.indisprimary as is_primary
+    FROM pg_index i
+    JOIN pg_class t ON t.oid = i.indrelid
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    CROSS JOIN LATERAL unnest(i.indkey::int2[]) WITH ORDINALITY k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+    WHERE n.nspname = %(schema)s
+    ORDER BY t.relname, ic.relname, k.ord
+"""
+
+# Declared foreign keys, one row per column pair in constraint order
+_POSTGRESQL_FOREIGN_KEYS_SQL = """
+    SELECT 
+        t.relname as table_name,
+        con.conname as name,
+        a.attname as column_name,
+        rn.nspname as ref_schema,
+        rt.relname as ref_table,
+        ra.attname as ref_column
+    FROM pg_constraint con
+    JOIN pg_class t ON t.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_class rt ON rt.oid = con.confrelid
+    JOIN pg_namespace rn ON rn.oid = rt.relnamespace
+    CROSS JOIN LATERAL unnest(con.conkey, con.confkey) WITH ORDINALITY k(attnum, ref_attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+    JOIN pg_attribute ra ON ra.attrelid = con.confrelid AND ra.attnum = k.ref_attnum
+    WHERE con.contype = 'f' AND n.nspname = %(schema)s
+    ORDER BY t.relname, con.conname, k.ord
+"""
+
+def _asyncpg_sql(query):
+    """Use asyncpg's positional placeholder for the schema parameter"""
+    return query.replace('%(schema)s', '$1')
+
+async def iter_postgresql_schema_info_async(connection_info, schema_names=None):
+    """Yield PostgreSQL schemas' information as each one is introspected on its own pooled connection"""
     try:
         pool = await _postgresql_pool.get_pool(connection_info)
         
         async with pool.acquire() as conn:
-            schemas_data = []
-            
-            # Get all schemas
-            schema_query = """
-                SELECT schema_name 
-                FROM information_schema.schemata 
-                WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
-                ORDER BY schema_name
-            """
-            schema_rows = await conn.fetch(schema_query)
-            
-            for schema_row in schema_rows:
-                schema_name = schema_row['schema_name']
-                
-                # Get tables in this schema
-                table_query = """
-                    SELECT 
-                        schemaname as schema,
-                        tablename as name,
-                        'table' as type
-                    FROM pg_tables 
-                    WHERE schemaname = $1
-                    UNION ALL
-                    SELECT 
-                        schemaname as schema,
-                        viewname as name,
-                        'view' as type
-                    FROM pg_views 
-                    WHERE schemaname = $1
-                    ORDER BY name
-                """
-                table_rows = await conn.fetch(table_query, schema_name)
-                
-                tables_list = []
-                for table_row in table_rows:
-                    table_name = table_row['name']
-                    table_type = table_row['type']
-                    
-                    # Get column information for each table
-                    column_query = """
-                        SELECT 
-                            column_name as name,
-                            data_type as type,
-                            CASE 
-                                WHEN column_name IN (
-                                    SELECT column_name 
-                                    FROM information_schema.table_constraints tc
-                                    JOIN information_schema.key_column_usage kcu 
-                                    ON tc.constraint_name = kcu.constraint_name
-                                    WHERE tc.table_schema = $1 
-                                    AND tc.table_name = $2 
-                                    AND tc.constraint_type = 'PRIMARY KEY'
-                                ) THEN 'PRI'
-                                WHEN column_name IN (
-                                    SELECT column_name 
-                                    FROM information_schema.table_constraints tc
-                                    JOIN information_schema.key_column_usage kcu 
-                                    ON tc.constraint_name = kcu.constraint_name
-                                    WHERE tc.table_schema = $1 
-                                    AND tc.table_name = $2 
-                                    AND tc.constraint_type = 'UNIQUE'
-                                ) THEN 'UNI'
-                                ELSE ''
-                            END as key,
-                            is_nullable as nullable
-                        FROM information_schema.columns
-                        WHERE table_schema = $1 AND table_name = $2
-                        ORDER BY ordinal_position
-                    """
-                    column_rows = await conn.fetch(column_query, schema_name, table_name)
-                    
-                    columns_list = [dict(col) for col in column_rows]
-                    
-                    # Get row count for tables (not views)
-                    row_count = 0
-                    if table_type == 'table':
-                        try:
-                            count_query = f'SELECT COUNT(*) as count FROM "{schema_name}"."{table_name}"'
-                            count_result = await conn.fetchrow(count_query)
-                            row_count = count_result['count'] if count_result else 0
-                        except:
-                            row_count = 0  # If count fails, default to 0
-                    
-                    tables_list.append({
-                        'name': table_name,
-                        'type': table_type,
-                        'rows': row_count,
-                        'columns': columns_list
-                    })
-                
-                if tables_list:  # Only include schemas that have tables
-                    schemas_data.append({
-                        'name': schema_name,
-                        'tables': tables_list
-                    })
-            
-            return schemas_data
+            schema_rows = await conn.fetch(_POSTGRESQL_SCHEMAS_SQL)
+        names = [row['schema_name'] for row in schema_rows]
+        
+        async def introspect(schema_name):
+            async with pool.acquire() as conn:
+                table_rows = await conn.fetch(_asyncpg_sql(_POSTGRESQL_TABLES_SQL), schema_name)
+                if not table_rows:  # Only include schemas that have tables
+                    return None
+                column_rows = await conn.fetch(_asyncpg_sql(_POSTGRESQL_COLUMNS_SQL), schema_name)
+                index_rows = await conn.fetch(_asyncpg_sql(_POSTGRESQL_INDEXES_SQL), schema_name)
+                foreign_key_rows = await conn.fetch(_asyncpg_sql(_POSTGRESQL_FOREIGN_KEYS_SQL), schema_name)
+            return _assemble_schema(schema_name, table_rows, column_rows, _index_key_rows(index_rows),
+                                    index_rows, foreign_key_rows)
+        
+        async for schema in _iter_schemas_concurrently(_select_schema_names(names, schema_names), introspect):
+            yield schema
                 
     except Exception as e:
         logger.error(f"PostgreSQL schema info error: {e}")
         raise Exception(f"PostgreSQL Error: {e}")
 
-def get_postgresql_schema_info(connection_info):
+async def get_postgresql_schema_info_async(connection_info, schema_names=None):
+    """Get schema, tables, and column information from PostgreSQL database using connection pool"""
+    schemas = [schema async for schema in iter_postgresql_schema_info_async(connection_info, schema_names)]
+    schemas.sort(key=lambda schema: schema['name'])
+    return apply_exact_row_counts(connection_info, schemas)
+
+def get_postgresql_schema_info(connection_info, schema_names=None):
     """Synchronous wrapper for async PostgreSQL schema info retrieval"""
     try:
         # Always use the synchronous fallback to avoid async loop issues
         # The async version has loop conflicts in Django request context
-        return get_postgresql_schema_info_fallback(connection_info)
+        return get_postgresql_schema_info_fallback(connection_info, schema_names)
     except Exception as e:
         logger.error(f"PostgreSQL schema retrieval failed: {e}")
         raise
 
-def get_postgresql_schema_info_fallback(connection_info):
+def get_postgresql_schema_info_fallback(connection_info, schema_names=None):
     """Fallback synchronous PostgreSQL schema info retrieval"""
     try:
-        conn = psycopg2.connect(
-            host=connection_info.get('host'),
-            port=connection_info.get('port', 5432),
-            database=connection_info.get('database'),
-            user=connection_info.get('username'),
-            password=connection_info.get('password'),
-            connect_timeout=get_db_config()['connection_timeout']
-        )
-        
-        cursor = conn.cursor()
-        schemas_data = []
-        
-        # Get all schemas
-        cursor.execute("""
-            SELECT schema_name 
-            FROM information_schema.schemata 
-            WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
-            ORDER BY schema_name
-        """)
-        schema_rows = cursor.fetchall()
+        pool = _sync_pool_registry.get_pool(dict(connection_info, type='postgresql'))
+        with pool.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(_POSTGRESQL_SCHEMAS_SQL)
+                names = [row['schema_name'] for row in cursor.fetchall()]
+        schemas = _introspect_concurrently(pool, _select_schema_names(names, schema_names), _fetch_postgresql_schema)
+        return apply_exact_row_counts(connection_info, schemas)
         
-        for schema_row in schema_rows:
-            schema_name = schema_row[0]
-            
-            # Get tables in this schema
-            cursor.execute("""
-                SELECT 
-                    schemaname as schema,
-                    tablename as name,
-                    'table' as type
-                FROM pg_tables 
-                WHERE schemaname = %s
-                UNION ALL
-                SELECT 
-                    schemaname as schema,
-                    viewname as name,
-                    'view' as type
-                FROM pg_views 
-                WHERE schemaname = %s
-                ORDER BY name
-            """, (schema_name, schema_name))
-            table_rows = cursor.fetchall()
-            
-            tables_list = []
-            for table_row in table_rows:
-                table_name = table_row[1]
-                table_type = table_row[2]
-                
-                # Get column information for each table
-                cursor.execute("""
-                    SELECT 
-                        column_name as name,
-                        data_type as type,
-                        CASE 
-                            WHEN column_name IN (
-                                SELECT column_name 
-                                FROM information_schema.table_constraints tc
-                                JOIN information_schema.key_column_usage kcu 
-                                ON tc.constraint_name = kcu.constraint_name
-                                WHERE tc.table_schema = %s 
-                                AND tc.table_name = %s 
-                                AND tc.constraint_type = 'PRIMARY KEY'
-                            ) THEN 'PRI'
-                            WHEN column_name IN (
-                                SELECT column_name 
-                                FROM information_schema.table_constraints tc
-                                JOIN information_schema.key_column_usage kcu 
-                                ON tc.constraint_name = kcu.constraint_name
-                                WHERE tc.table_schema = %s 
-                                AND tc.table_name = %s 
-                                AND tc.constraint_type = 'UNIQUE'
-                            ) THEN 'UNI'
-                            ELSE ''
-                        END as key,
-                        is_nullable as nullable
-                    FROM information_schema.columns
-                    WHERE table_schema = %s AND table_name = %s
-                    ORDER BY ordinal_position
-                """, (schema_name, table_name, schema_name, table_name, schema_name, table_name))
-                column_rows = cursor.fetchall()
-                
-                columns_list = []
-                for col_row in column_rows:
-                    columns_list.append({
-                        'name': col_row[0],
-                        'type': col_row[1], 
-                        'key': col_row[2],
-                        'nullable': col_row[3]
-                    })
-                
-                # Get row count for tables (not views)
-                row_count = 0
-                if table_type == 'table':
-                    try:
-                        cursor.execute(f'SELECT COUNT(*) FROM "{schema_name}"."{table_name}"')
-                        count_result = cursor.fetchone()
-                        row_count = count_result[0] if count_result else 0
-                    except:
-                        row_count = 0  # If count fails, default to 0
-                
-                tables_list.append({
-                    'name': table_name,
-                    'type': table_type,
-                    'rows': row_count,
-                    'columns': columns_list
-                })
-            
-            if tables_list:  # Only include schemas that have tables
-                schemas_data.append({
-                    'name': schema_name,
-                    'tables': tables_list
-                })
+    except psycopg2.Error as err:
+        raise Exception(f"PostgreSQL Error: {err}")
+
+def _fetch_postgresql_schema(conn, schema_name):
+    """Read one PostgreSQL schema over an open connection; None when it has no tables"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        params = {'schema': schema_name}
         
-        cursor.close()
-        conn.close()
+        cursor.execute(_POSTGRESQL_TABLES_SQL, params)
+        table_rows = cursor.fetchall()
+        if not table_rows:  # Only include schemas that have tables
+            return None
+        cursor.execute(_POSTGRESQL_COLUMNS_SQL, params)
+        column_rows = cursor.fetchall()
+        cursor.execute(_POSTGRESQL_INDEXES_SQL, params)
+        index_rows = cursor.fetchall()
+        cursor.execute(_POSTGRESQL_FOREIGN_KEYS_SQL, params)
+        foreign_key_rows = cursor.fetchall()
+        return _assemble_schema(schema_name, table_rows, column_rows, _index_key_rows(index_rows),
+                                index_rows, foreign_key_rows)
+
+# Per-table digests of catalog definitions, used to detect schema changes without
+# re-introspecting; data changes (UPDATE_TIME, reltuples) deliberately do not count
+_MYSQL_DIGESTS_SQL = """
+    SELECT t.table_schema AS 'schema_name',
+           t.table_name AS 'table_name',
+           CONCAT_WS('|', t.table_type, t.create_time, CRC32(t.table_comment), COUNT(c.column_name),
+                     SUM(CRC32(CONCAT_WS('|', c.ordinal_position, c.column_name, c.column_type,
+                                         c.column_key, c.is_nullable, c.column_comment))),
+                     (SELECT SUM(CRC32(CONCAT_WS('|', s.index_name, s.seq_in_index, s.column_name, s.non_unique)))
+                      FROM information_schema.statistics s
+                      WHERE s.table_schema = t.table_schema AND s.table_name = t.table_name),
+                     (SELECT SUM(CRC32(CONCAT_WS('|', k.constraint_name, k.ordinal_position, k.column_name,
+                                                 k.referenced_table_schema, k.referenced_table_name,
+                                                 k.referenced_column_name)))
+                      FROM information_schema.key_column_usage k
+                      WHERE k.table_schema = t.table_schema AND k.table_name = t.table_name
+                        AND k.referenced_table_name IS NOT NULL)) AS 'digest'
+    FROM information_schema.tables t
+    LEFT JOIN information_schema.columns c
+      ON c.table_schema = t.table_schema AND c.table_name = t.table_name
+    WHERE {schema_filter}
+    GROUP BY t.table_schema, t.table_name, t.table_type, t.create_time, t.table_comment
+"""
+
+def _mysql_digests_query(connection_info):
+    """Digest query and parameters covering the databases that schema introspection covers"""
+    if _introspects_all_mysql_databases(connection_info):
+        schema_filter = "t.table_schema NOT IN ('information_schema', 'mysql', 'performance_schema', 'sys')"
+        return _MYSQL_DIGESTS_SQL.format(schema_filter=schema_filter), ()
+    return _MYSQL_DIGESTS_SQL.format(schema_filter='t.table_schema = %s'), (connection_info['database'],)
+
+_POSTGRESQL_DIGESTS_SQL = """
+    SELECT 
+        n.nspname as schema_name,
+        c.relname as table_name,
+        md5(c.relkind::text || '|' || COALESCE(obj_description(c.oid, 'pg_class'), '') || '|' ||
+            COALESCE(string_agg(a.attnum::text || ':' || a.attname || ':' ||
+                                format_type(a.atttypid, a.atttypmod) || ':' || a.attnotnull::text || ':' ||
+                                COALESCE(col_description(c.oid, a.attnum), ''),
+                                ',' ORDER BY a.attnum), '') || '|' ||
+            COALESCE((SELECT string_agg(i.indexrelid::regclass::text || ':' || i.indisprimary::text || ':' ||
+                                        i.indisunique::text || ':' || i.indkey::text, ',' ORDER BY i.indexrelid)
+                      FROM pg_index i WHERE i.indrelid = c.oid), '') || '|' ||
+            COALESCE((SELECT string_agg(con.conname || ':' || con.confrelid::regclass::text || ':' ||
+                                        con.conkey::text || ':' || con.confkey::text, ',' ORDER BY con.conname)
+                      FROM pg_constraint con WHERE con.conrelid = c.oid AND con.contype = 'f'), '')) as digest
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE c.relkind IN ('r', 'p', 'v')
+      AND n.nspname NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
+    GROUP BY n.nspname, c.relname, c.relkind, c.oid
+"""
+
+def _digest_map(rows):
+    """Map {schema: {table: digest}}"""
+    digests = {}
+    for row in rows:
+        digest = row['digest']
+        if isinstance(digest, (bytes, bytearray)):
+            digest = digest.decode('utf-8')
+        digests.setdefault(row['schema_name'], {})[row['table_name']] = digest
+    return digests
+
+def get_schema_digests(connection_info):
+    """Return {schema: {table: digest}} for every table and view, in one catalog query"""
+    connection_type = connection_info.get('type', 'mysql').lower()
+    try:
+        if connection_type == 'postgresql':
+            pool = _sync_pool_registry.get_pool(dict(connection_info, type='postgresql'))
+            with pool.connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(_POSTGRESQL_DIGESTS_SQL)
+                    return _digest_map(cursor.fetchall())
         
-        return schemas_data
+        pool = _sync_pool_registry.get_pool(dict(connection_info, type='mysql'))
+        with pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(*_mysql_digests_query(connection_info))
+                return _digest_map(cursor.fetchall())
+            finally:
+                cursor.close()
+    except (mysql.connector.Error, psycopg2.Error) as err:
+        raise Exception(f"Schema digest error: {err}")
+
+async def get_schema_digests_async(connection_info):
+    """Async counterpart of get_schema_digests on the per-loop pools"""
+    connection_type = connection_info.get('type', 'mysql').lower()
+    try:
+        if connection_type == 'postgresql':
+            pool = await _postgresql_pool.get_pool(connection_info)
+            async with pool.acquire() as conn:
+                return _digest_map(await conn.fetch(_POSTGRESQL_DIGESTS_SQL))
         
-    except psycopg2.Error as err:
-        raise Exception(f"PostgreSQL Error: {err}")
+        pool = await _connection_pool.get_pool(connection_info)
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(*_mysql_digests_query(connection_info))
+                return _digest_map(await cursor.fetchall())
+    except Exception as e:
+        raise Exception(f"Schema digest error: {e}")
+
+# Identical concurrent schema fetches and read-only queries share one execution
+single_flight = SingleFlight()
+
+def _schema_flight_key(connection_info, schema_names):
+    names = None if schema_names is None else tuple(sorted(schema_names))
+    return ('schema', get_connection_fingerprint(connection_info), names)
 
-def execute_query(connection_info, query, query_timeout=None):
+def get_database_schema_info(connection_info, schema_names=None):
+    """Fetch schema, sharing one introspection among identical concurrent calls"""
+    config = get_db_config()
+    if not config['single_flight_enabled']:
+        return _fetch_database_schema_info(connection_info, schema_names)
+    return single_flight.do(
+        _schema_flight_key(connection_info, schema_names),
+        lambda: _fetch_database_schema_info(connection_info, schema_names),
+        config['single_flight_wait_timeout']
+    )
+
+def _fetch_database_schema_info(connection_info, schema_names=None):
+    """Fetch schema based on database type, optionally only for some schemas"""
+    connection_type = connection_info.get('type', '').lower()
+    
+    if connection_type == 'postgresql':
+        return get_postgresql_schema_info(connection_info, schema_names)
+    elif connection_type == 'redshift':
+        raise Exception("Redshift schema retrieval not yet implemented.")
+    else:
+        # Default to MySQL for now
+        return get_mysql_schema_info(connection_info, schema_names)
+
+def execute_query(connection_info, query, query_timeout=None, result_format='rows'):
     """
     Generic query execution function that routes to appropriate database handler
     Returns (success: bool, result: Any)
@@ -872,10 +1702,35 @@ def execute_query(connection_info, query, query_timeout=None):
         connection_type = connection_info.get('type', 'mysql').lower()
         
         if connection_type == 'mysql':
-            result = execute_mysql_query(connection_info, query, query_timeout)
+            result = execute_mysql_query(connection_info, query, query_timeout, result_format)
+            return True, result
+        elif connection_type == 'postgresql':
+            result = execute_postgresql_query(connection_info, query, query_timeout, result_format)
+            return True, result
+        elif connection_type == 'redshift':
+            return False, "Redshift connection not yet implemented"
+        else:
+            return False, f"Unsupported connection type: {connection_type}"
+            
+    except Exception as e:
+        return False, str(e)
+
+
+async def execute_query_async(connection_info, query, query_timeout=None, result_format='rows'):
+    """
+    Async counterpart of execute_query for ASGI views, running on the per-loop pools
+    Returns (success: bool, result: Any)
+    """
+    try:
+        if query_timeout is None:
+            query_timeout = get_db_config()['query_timeout']
+        connection_type = connection_info.get('type', 'mysql').lower()
+        
+        if connection_type == 'mysql':
+            result = await execute_mysql_query_async(connection_info, query, query_timeout, result_format)
             return True, result
         elif connection_type == 'postgresql':
-            result = execute_postgresql_query(connection_info, query, query_timeout)
+            result = await execute_postgresql_query_async(connection_info, query, query_timeout, result_format)
             return True, result
         elif connection_type == 'redshift':
             return False, "Redshift connection not yet implemented"
@@ -885,6 +1740,279 @@ def execute_query(connection_info, query, query_timeout=None):
     except Exception as e:
         return False, str(e)
 
+async def get_database_schema_async(connection_info, schema_names=None):
+    """Async counterpart of get_database_schema_info, coalesced with sync and async callers alike"""
+    config = get_db_config()
+    if not config['single_flight_enabled']:
+        return await _fetch_database_schema_async(connection_info, schema_names)
+    return await single_flight.do_async(
+        _schema_flight_key(connection_info, schema_names),
+        lambda: _fetch_database_schema_async(connection_info, schema_names),
+        config['single_flight_wait_timeout']
+    )
+
+async def _fetch_database_schema_async(connection_info, schema_names=None):
+    """Fetch schema based on database type on the per-loop pools"""
+    connection_type = connection_info.get('type', '').lower()
+    
+    if connection_type == 'postgresql':
+        return await get_postgresql_schema_info_async(connection_info, schema_names)
+    elif connection_type == 'redshift':
+        raise Exception("Redshift schema retrieval not yet implemented.")
+    else:
+        # Default to MySQL for now
+        return await get_mysql_schema_info_async(connection_info, schema_names)
+
+
+def _is_read_query(query):
+    """Return True for statements that produce a result set"""
+    return query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN', 'WITH'))
+
+class _PagedCursor:
+    """An open server-side cursor holding a pooled connection between page requests"""
+    
+    def __init__(self, token, pool, conn, cursor, connection_type, owner):
+        self.token = token
+        self.pool = pool
+        self.conn = conn
+        self.cursor = cursor
+        self.connection_type = connection_type
+        self.owner = owner
+        self.columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        self.rows_fetched = 0
+        self.exhausted = False
+        self.last_access = time.time()
+        self.lock = Lock()
+    
+    def fetch_page(self, page_size, result_format='rows'):
+        """Fetch the next page from the cursor as a result dict"""
+        start_time = time.time()
+        rows = self.cursor.fetchmany(page_size)
+        self.rows_fetched += len(rows)
+        self.last_access = time.time()
+        if len(rows) < page_size:
+            self.exhausted = True
+        result = build_result(self.columns, rows, start_time, result_format)
+        result.update({
+            'rowsFetched': self.rows_fetched,
+            'hasMore': not self.exhausted,
+            'cursor': None if self.exhausted else self.token
+        })
+        return result
+    
+    def close(self):
+        """Close the cursor and hand the connection back to its pool"""
+        discard = False
+        try:
+            if self.connection_type == 'mysql' and not self.exhausted:
+                # Unread rows would have to be drained first; dropping the socket is cheaper
+                discard = True
+            else:
+                self.cursor.close()
+                if self.connection_type == 'postgresql':
+                    self.conn.rollback()
+                    self.conn.autocommit = True
+        except Exception as e:
+            logger.debug(f"Error closing paged cursor {self.token}: {e}")
+            discard = True
+        self.pool.release(self.conn, discard=discard)
+
+class PagedCursorRegistry:
+    """Per-worker registry of open server-side cursors addressed by opaque tokens"""
+    
+    def __init__(self):
+        self._cursors = OrderedDict()  # token -> _PagedCursor, least recently used first
+        self._lock = Lock()
+        self._sweeper = None
+    
+    def _start_sweeper(self):
+        """Start the daemon thread that closes cursors nobody is reading any more"""
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper = Thread(target=self._sweep_forever, name='paged-cursor-sweeper', daemon=True)
+            self._sweeper.start()
+    
+    def _sweep_forever(self):
+        while True:
+            time.sleep(max(get_db_config()['cursor_idle_timeout'] / 4, 5))
+            self.expire_idle()
+    
+    def expire_idle(self):
+        """Close cursors idle for longer than cursor_idle_timeout"""
+        cutoff = time.time() - get_db_config()['cursor_idle_timeout']
+        with self._lock:
+            expired = [
+                self._cursors.pop(token) for token, entry in list(self._cursors.items())
+                if entry.last_access < cutoff and not entry.lock.locked()
+            ]
+        for entry in expired:
+            logger.info(f"Closing idle paged cursor {entry.token}")
+            with entry.lock:
+                entry.close()
+    
+    def register(self, entry):
+        """
+        Track a newly opened cursor, closing least recently used ones to stay within
+        max_open_cursors and within the cursor share of the entry's connection pool
+        """
+        config = get_db_config()
+        max_open = config['max_open_cursors']
+        # Each cursor holds a pooled connection; leave one free for ordinary cell runs
+        max_per_pool = max(1, entry.pool.max_size - 1)
+        evicted = []
+        with self._lock:
+            def over_budget():
+                same_pool = sum(1 for candidate in self._cursors.values() if candidate.pool is entry.pool)
+                return len(self._cursors) >= max_open or same_pool >= max_per_pool
+            
+            for token, candidate in list(self._cursors.items()):
+                if not over_budget():
+                    break
+                if candidate.lock.locked():
+                    continue
+                if len(self._cursors) >= max_open or candidate.pool is entry.pool:
+                    evicted.append(self._cursors.pop(token))
+            if over_budget():
+                raise Exception(f"Too many open result cursors (limit {min(max_open, max_per_pool)}); close or finish reading one first")
+            self._cursors[entry.token] = entry
+            self._start_sweeper()
+        for candidate in evicted:
+            logger.info(f"Evicting paged cursor {candidate.token} to stay within the open cursor budget")
+            with candidate.lock:
+                candidate.close()
+    
+    def checkout(self, token, owner=None):
+        """Return the cursor for a token, checking that the caller owns it"""
+        if not str(token).startswith(f"{os.getpid()}."):
+            # Tokens name the worker holding the cursor; another worker cannot read it
+            raise Exception("Result cursor is held by another server worker. Paged results need a single "
+                            "worker or sticky routing (cursor_sticky_routing); please re-run the query.")
+        with self._lock:
+            entry = self._cursors.get(token)
+            if entry is None or entry.owner != owner:
+                raise Exception("Result cursor not found or expired. Please re-run the query.")
+            self._cursors.move_to_end(token)
+            return entry
+    
+    def discard(self, token):
+        """Stop tracking and close a cursor"""
+        with self._lock:
+            entry = self._cursors.pop(token, None)
+        if entry:
+            entry.close()
+
+# Global registry of open paged-result cursors
+_paged_cursors = PagedCursorRegistry()
+
+def paged_execution_available():
+    """
+    Whether paged execution can be offered. Cursors live in the worker that opened
+    them, so follow-up page requests must reach that worker: either the server runs
+    a single worker (RCA_WEB_WORKERS, set by gunicorn.conf.py) or the deployment
+    routes each user to a fixed worker and sets cursor_sticky_routing.
+    """
+    if get_db_config()['cursor_sticky_routing']:
+        return True
+    try:
+        return int(os.environ.get('RCA_WEB_WORKERS', '1')) <= 1
+    except ValueError:
+        return False
+
+def _open_server_side_cursor(conn, connection_type, query, query_timeout):
+    """Execute a read query on a server-side cursor so rows stay on the database until fetched"""
+    if connection_type == 'mysql':
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SET SESSION max_execution_time = {int(query_timeout * 1000)}")
+        except mysql.connector.Error as e:
+            if e.errno != 1193:  # Unknown system variable
+                raise
+        cursor.close()
+        # mysql.connector's unbuffered cursor streams rows from the socket on demand (SSCursor semantics)
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(query)
+        return cursor
+    
+    with conn.cursor() as setup_cursor:
+        setup_cursor.execute(f"SET statement_timeout = '{int(query_timeout * 1000)}ms'")
+    # Named cursors need a transaction; the connection is held exclusively until the cursor closes
+    conn.autocommit = False
+    cursor = conn.cursor(name=f"rca_{secrets.token_hex(8)}")
+    cursor.execute(query)
+    return cursor
+
+def _resolve_page_size(page_size):
+    """Clamp a requested page size to the configured bounds"""
+    config = get_db_config()
+    try:
+        page_size = int(page_size) if page_size else config['cursor_page_size']
+    except (TypeError, ValueError):
+        page_size = config['cursor_page_size']
+    return max(1, min(page_size, config['cursor_max_page_size']))
+
+def execute_query_paged(connection_info, query, page_size=None, query_timeout=None, owner=None, result_format='rows'):
+    """
+    Execute a query on a server-side cursor and return only its first page.
+    The result carries a 'cursor' token for fetch_query_page while more rows remain.
+    """
+    if query_timeout is None:
+        query_timeout = get_db_config()['query_timeout']
+    connection_type = connection_info.get('type', 'mysql').lower()
+    
+    if connection_type not in ('mysql', 'postgresql'):
+        raise Exception(f"Paged execution not supported for {connection_type}")
+    if not _is_read_query(query):
+        # Statements without a result set have nothing to page through
+        if connection_type == 'mysql':
+            result = execute_mysql_query(connection_info, query, query_timeout, result_format)
+        else:
+            result = execute_postgresql_query(connection_info, query, query_timeout, result_format)
+        query_cache.invalidate_connection(get_connection_fingerprint(connection_info))
+        return dict(result, hasMore=False, cursor=None)
+    
+    page_size = _resolve_page_size(page_size)
+    error_label = 'MySQL' if connection_type == 'mysql' else 'PostgreSQL'
+    pool = _sync_pool_registry.get_pool(dict(connection_info, type=connection_type))
+    conn = pool.acquire()
+    start_time = time.time()
+    try:
+        cursor = _open_server_side_cursor(conn, connection_type, query, query_timeout)
+        entry = _PagedCursor(f"{os.getpid()}.{secrets.token_urlsafe(24)}", pool, conn, cursor, connection_type, owner)
+        result = entry.fetch_page(page_size, result_format)
+    except Exception as e:
+        pool.release(conn, discard=True)
+        logger.error(f"{error_label} paged query execution error: {e}")
+        raise Exception(f"{error_label} Error: {e}")
+    
+    if entry.exhausted:
+        entry.close()
+    else:
+        _paged_cursors.register(entry)
+    
+    # Report time including statement execution, not just the first fetch
+    result['time'] = time.time() - start_time
+    return result
+
+def fetch_query_page(cursor_token, page_size=None, owner=None, result_format='rows'):
+    """Fetch the next page from a cursor opened by execute_query_paged"""
+    page_size = _resolve_page_size(page_size)
+    entry = _paged_cursors.checkout(cursor_token, owner)
+    with entry.lock:
+        try:
+            result = entry.fetch_page(page_size, result_format)
+        except Exception as e:
+            _paged_cursors.discard(cursor_token)
+            raise Exception(f"Error fetching results: {e}")
+    if entry.exhausted:
+        _paged_cursors.discard(cursor_token)
+    
+    return result
+
+def close_query_cursor(cursor_token, owner=None):
+    """Close a paged cursor before all of its rows were read"""
+    entry = _paged_cursors.checkout(cursor_token, owner)
+    with entry.lock:
+        _paged_cursors.discard(cursor_token)
+
 
 def get_schema_for_connection(db_connection):
     """
@@ -895,13 +2023,11 @@ def get_schema_for_connection(db_connection):
         connection_config = db_connection.get_connection_config()
         connection_type = connection_config.get('type', 'mysql').lower()
         
-        if connection_type == 'mysql':
-            schemas = get_mysql_schema_info(connection_config)
-            formatted_schema = format_schema_for_llm(schemas)
-            return formatted_schema
-        elif connection_type == 'postgresql':
-            schemas = get_postgresql_schema_info(connection_config)
-            formatted_schema = format_schema_for_llm(schemas)
+        if connection_type in ('mysql', 'postgresql'):
+            # Imported here because the schema cache builds on this module
+            from .schema_cache import get_connection_schemas_with_fingerprint
+            schemas, fingerprint = get_connection_schemas_with_fingerprint(db_connection)
+            formatted_schema = format_schema_for_llm(schemas, connection_type, fingerprint=fingerprint)
             return formatted_schema
         elif connection_type == 'redshift':
             return "Schema retrieval for Redshift not yet implemented"
@@ -912,74 +2038,15 @@ def get_schema_for_connection(db_connection):
         return f"Error retrieving schema: {str(e)}"
 
 
-def format_schema_for_llm(schemas):
+def format_schema_for_llm(schemas, dialect=None, token_budget=None, relevance=None, fingerprint=None):
     """
-    Format schema information into a readable string for LLM context
+    Format schema information into a compact string for LLM context, degraded
+    to fit token_budget (llm_schema_token_budget by default); fingerprint
+    identifies the schemas for memoization
     """
-    if not schemas:
-        return "No schema information available"
-    
-    formatted_schema = ""
-    
-    for schema in schemas:
-        schema_name = schema['name']
-        formatted_schema += f"Schema: {schema_name}\n"
-        formatted_schema += "=" * (len(schema_name) + 8) + "\n\n"
-        
-        if not schema['tables']:
-            formatted_schema += "No tables found in this schema.\n\n"
-            continue
-            
-        for table in schema['tables']:
-            table_name = table['name']
-            table_type = table['type']
-            
-            # For PostgreSQL, show full qualified name (schema.table)
-            full_table_name = f"{schema_name}.{table_name}" if len(schemas) > 1 or schema_name != 'main' else table_name
-            
-            formatted_schema += f"Table: {full_table_name} ({table_type})\n"
-            if table.get('rows', 0) > 0:
-                formatted_schema += f"Estimated rows: ~{table['rows']}\n"
-            formatted_schema += f"Columns:\n"
-            
-            if not table.get('columns'):
-                formatted_schema += "  (No column information available)\n"
-            else:
-                for column in table['columns']:
-                    # Enhanced column information
-                    col_name = column['name']
-                    col_type = column['type']
-                    
-                    # Key information
-                    key_info = ""
-                    if column.get('key') == 'PRI':
-                        key_info = " [PRIMARY KEY]"
-                    elif column.get('key') == 'UNI':
-                        key_info = " [UNIQUE]"
-                    elif column.get('key') == 'MUL':
-                        key_info = " [INDEX]"
-                    
-                    # Nullable information
-                    nullable_info = ""
-                    if column.get('nullable') == 'NO':
-                        nullable_info = " NOT NULL"
-                    elif column.get('nullable') == 'YES':
-                        nullable_info = " NULLABLE"
-                    
-                    formatted_schema += f"  - {col_name}: {col_type}{key_info}{nullable_info}\n"
-            
-            formatted_schema += "\n"
-    
-    # Add helpful notes for PostgreSQL (always add for PostgreSQL schemas)
-    formatted_schema += "\nIMPORTANT POSTGRESQL SYNTAX NOTES:\n"
-    formatted_schema += "- ALWAYS use double quotes around column names that contain spaces or special characters\n"
-    formatted_schema += "- Column names like 'Order_id' should be referenced as \"Order_id\" in queries\n" 
-    formatted_schema += "- Schema-qualified table names: schema.table_name (e.g., datasage.customer_info)\n"
-    formatted_schema += "- Use LIMIT and OFFSET for pagination\n"
-    formatted_schema += "- Boolean values: TRUE/FALSE\n"
-    formatted_schema += "- Case sensitivity: PostgreSQL is case sensitive for quoted identifiers\n\n"
-    
-    return formatted_schema
+    if token_budget is None:
+        token_budget = get_db_config()['llm_schema_token_budget']
+    return render_schema_for_llm(schemas, dialect, token_budget, relevance, fingerprint)
 
 
 def execute_redshift_query(connection_info, query):
@@ -992,6 +2059,7 @@ def execute_redshift_query(connection_info, query):
 def execute_query_sqlalchemy(connection_info, query, query_timeout=None):
     """
     Execute SQL query using SQLAlchemy for better connection handling
+    Engines are reused across calls through the per-worker engine registry
     Returns (success: bool, result: Any)
     """
     if not SQLALCHEMY_AVAILABLE:
@@ -1004,40 +2072,11 @@ def execute_query_sqlalchemy(connection_info, query, query_timeout=None):
         
         connection_type = connection_info.get('type', 'mysql').lower()
         
-        # Build SQLAlchemy connection string
-        if connection_type == 'mysql':
-            driver = 'mysql+mysqlconnector'
-            port = connection_info.get('port', 3306)
-        elif connection_type == 'postgresql':
-            driver = 'postgresql+psycopg2'
-            port = connection_info.get('port', 5432)
-        else:
+        if connection_type not in ('mysql', 'postgresql'):
             # Fallback to direct execution for unsupported types
             return execute_query(connection_info, query, query_timeout)
         
-        # Build connection URL
-        username = connection_info.get('username', '')
-        password = connection_info.get('password', '')
-        host = connection_info.get('host')
-        database = connection_info.get('database')
-        
-        if username and password:
-            connection_url = f"{driver}://{username}:{password}@{host}:{port}/{database}"
-        else:
-            connection_url = f"{driver}://{host}:{port}/{database}"
-        
-        # Create engine with connection pooling
-        engine = create_engine(
-            connection_url,
-            poolclass=QueuePool,
-            pool_size=5,
-            max_overflow=10,
-            pool_timeout=30,
-            pool_recycle=3600,
-            connect_args={
-                'connect_timeout': get_db_config()['connection_timeout']
-            }
-        )
+        engine = _engine_registry.get_engine(connection_info)
         
         start_time = time.time()
         
@@ -1058,32 +2097,49 @@ def execute_query_sqlalchemy(connection_info, query, query_timeout=None):
                 except Exception:
                     pass  # Continue without timeout setting
             
-            # Execute main query
-            result = conn.execute(text(query))
-            
-            # Handle different query types
-            if query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN', 'WITH')):
-                rows = result.fetchall()
-                columns = list(result.keys())
-                
-                # Convert rows to list of dicts and serialize
-                row_dicts = [dict(zip(columns, row)) for row in rows]
-                serialized_rows = [serialize_row(row_dict) for row_dict in row_dicts]
+            # Execute main query, tracked so it can be killed on cancel or timeout
+            backend_id = _get_backend_id(conn.connection.dbapi_connection, connection_type)
+            with _track_running_query(dict(connection_info, type=connection_type), backend_id, query, query_timeout):
+                if _is_streamable_query(query):
+                    # Server-side (PostgreSQL) or unbuffered (MySQL) cursor so rows past the
+                    # result budget are never transferred
+                    result = conn.execution_options(stream_results=True).execute(text(query))
+                else:
+                    result = conn.execute(text(query))
                 
-                query_result = {
-                    'columns': columns,
-                    'rows': serialized_rows,
-                    'rowCount': len(rows),
-                    'time': time.time() - start_time
-                }
-            else:
-                # For INSERT, UPDATE, DELETE, etc.
-                query_result = {
-                    'rowCount': result.rowcount,
-                    'time': time.time() - start_time
-                }
+                # Handle different query types
+                if query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN', 'WITH')):
+                    columns = list(result.keys())
+                    budget = ResultBudget.for_connection(connection_info, columns)
+                    try:
+                        rows = budget.fetch(result)
+                    except Exception:
+                        if connection_type == 'mysql':
+                            # Rows left unread on the socket; don't return the connection to the pool
+                            conn.invalidate()
+                        raise
+                    if budget.truncated and connection_type == 'mysql':
+                        # Unread rows stay on the socket; drop the connection rather than drain them
+                        conn.invalidate()
+                    
+                    # Convert rows to list of dicts and serialize
+                    row_dicts = [dict(zip(columns, row)) for row in rows]
+                    serialized_rows = [serialize_row(row_dict) for row_dict in row_dicts]
+                    
+                    query_result = {
+                        'columns': columns,
+                        'rows': serialized_rows,
+                        'rowCount': len(rows),
+                        'time': time.time() - start_time
+                    }
+                    query_result.update(budget.metadata())
+                else:
+                    # For INSERT, UPDATE, DELETE, etc.
+                    query_result = {
+                        'rowCount': result.rowcount,
+                        'time': time.time() - start_time
+                    }
         
-        engine.dispose()  # Clean up
         return True, query_result
         
     except Exception as e:
@@ -1091,10 +2147,79 @@ def execute_query_sqlalchemy(connection_info, query, query_timeout=None):
         return False, f"Database Error: {e}"
 
 
+def get_cached_query_result(connection_info, query, result_format='rows', notebook_id=None):
+    """Return a cached result for a read-only query, or None when caching is off or it missed"""
+    if not get_cache_ttl(connection_info) or not is_cacheable_query(query):
+        return None
+    # Callers with different result limits get differently truncated results
+    result = query_cache.get(get_connection_fingerprint(connection_info), query, result_format, notebook_id,
+                             get_result_limits(connection_info))
+    if result is None:
+        return None
+    return dict(result, cached=True)
+
+def store_query_result(connection_info, query, result, result_format='rows', notebook_id=None):
+    """Cache a read-only query's result, or invalidate the connection's cache after a write"""
+    ttl = get_cache_ttl(connection_info)
+    fingerprint = get_connection_fingerprint(connection_info)
+    if not _is_read_query(query):
+        query_cache.invalidate_connection(fingerprint)
+    elif ttl and is_cacheable_query(query):
+        query_cache.set(fingerprint, query, result, ttl, result_format, notebook_id, get_result_limits(connection_info))
+
+def _query_flight_key(connection_info, query, result_format):
+    # Callers with different result limits get differently truncated results
+    return ('query', get_connection_fingerprint(connection_info), result_format,
+            get_result_limits(connection_info), normalize_sql(query))
+
+def _shares_query_error(error):
+    """A cancelled statement's error stays with the caller that cancelled it; the others run it again"""
+    owner = get_query_owner()
+    return owner is None or not running_queries.is_cancelled(owner)
+
+def execute_query_coalesced(connection_info, query, execute, result_format='rows'):
+    """
+    Return execute()'s result for a query; identical concurrent read-only queries on
+    the same connection, in this worker or others on the machine, share one execution
+    """
+    config = get_db_config()
+    if not config['single_flight_enabled'] or not is_cacheable_query(query):
+        return execute()
+    return single_flight.do(_query_flight_key(connection_info, query, result_format), execute,
+                            config['single_flight_wait_timeout'], _shares_query_error)
+
+async def execute_query_coalesced_async(connection_info, query, execute, result_format='rows'):
+    """Async counterpart of execute_query_coalesced for a coroutine function"""
+    config = get_db_config()
+    if not config['single_flight_enabled'] or not is_cacheable_query(query):
+        return await execute()
+    return await single_flight.do_async(_query_flight_key(connection_info, query, result_format), execute,
+                                        config['single_flight_wait_timeout'], _shares_query_error)
+
 def execute_query_with_fallback(connection_info, query, query_timeout=None):
     """
     Execute query with SQLAlchemy first, fallback to direct connection if needed
+    Read-only queries are served from the result cache when it is enabled
     """
+    cached_result = get_cached_query_result(connection_info, query)
+    if cached_result is not None:
+        return True, cached_result
+    
+    def execute():
+        success, result = _execute_query_uncached(connection_info, query, query_timeout)
+        if not success:
+            raise Exception(result)
+        return result
+    
+    try:
+        result = execute_query_coalesced(connection_info, query, execute)
+    except Exception as e:
+        return False, str(e)
+    store_query_result(connection_info, query, result)
+    return True, result
+
+def _execute_query_uncached(connection_info, query, query_timeout=None):
+    """Execute query with SQLAlchemy first, fallback to direct connection if needed"""
     # Try SQLAlchemy first (better connection handling)
     if SQLALCHEMY_AVAILABLE:
         try:
@@ -1109,3 +2234,15 @@ def execute_query_with_fallback(connection_info, query, query_timeout=None):
     # Fallback to direct connection
     return execute_query(connection_info, query, query_timeout)
 
+async def iter_database_schema_async(connection_info, schema_names=None):
+    """Yield schemas as they are introspected, in completion order, on the per-loop pools"""
+    connection_type = connection_info.get('type', '').lower()
+    
+    if connection_type == 'postgresql':
+        schemas = iter_postgresql_schema_info_async(connection_info, schema_names)
+    elif connection_type == 'redshift':
+        raise Exception("Redshift schema retrieval not yet implemented.")
+    else:
+        schemas = iter_mysql_schema_info_async(connection_info, schema_names)
+    async for schema in schemas:
+        yield schema
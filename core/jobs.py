@@ -0,0 +1,298 @@
+"""
+Background execution of long-running cells
+
+Cells submitted with background=1 are stored as QueryJob rows and picked up by the
+processes started with `manage.py run_query_workers`, so the web worker answers with
+a job id at once instead of holding its thread for the whole query.
+
+Results are written as Fernet-encrypted files, readable only by the service
+account, shared by the web and worker processes (the worker service joins the
+web service's private /tmp) and expire after job_result_ttl seconds. Worker
+liveness is checked by pid, so all workers run on one machine.
+"""
+import datetime
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from cryptography.fernet import InvalidToken
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from .db_config import get_config
+from .encryption import get_fernet
+from .models import QueryJob, SQLCell
+from .result_store import cell_results
+from .running_queries import query_owner, process_alive
+
+logger = logging.getLogger(__name__)
+
+JOB_RESULTS_DIR = os.path.join(tempfile.gettempdir(), 'rca_query_jobs')
+
+# Seconds between stale-job recovery and result expiry sweeps in each worker
+MAINTENANCE_INTERVAL = 60
+# Seconds between status checks while a client long-polls a job
+WAIT_POLL_INTERVAL = 0.5
+
+Status = QueryJob.Status
+
+
+class JobLimitExceeded(Exception):
+    """Raised when a user already has the maximum number of pending jobs"""
+
+
+def _result_path(job_uuid):
+    return os.path.join(JOB_RESULTS_DIR, f"{job_uuid}.json")
+
+
+def submit_cell_job(user, cell, query, params):
+    """Queue a cell execution for the background workers and return the job"""
+    limit = get_config()['job_max_pending_per_user']
+    pending = QueryJob.objects.filter(user=user, status__in=(Status.QUEUED, Status.RUNNING)).count()
+    if pending >= limit:
+        raise JobLimitExceeded(f"Too many background jobs in progress (limit {limit})")
+    return QueryJob.objects.create(user=user, cell=cell, query=query, params=params)
+
+
+@contextmanager
+def _claim_lock():
+    """Serialize claims across worker processes so the per-user running cap holds"""
+    os.makedirs(JOB_RESULTS_DIR, mode=0o700, exist_ok=True)
+    with open(os.path.join(JOB_RESULTS_DIR, '.claim.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def claim_next_job():
+    """Mark the oldest queued job of a user below the running cap as running; returns it or None"""
+    cap = get_config()['job_max_running_per_user']
+    with _claim_lock():
+        busy_users = list(
+            QueryJob.objects.filter(status=Status.RUNNING)
+            .values('user').annotate(running=Count('id')).filter(running__gte=cap)
+            .values_list('user', flat=True)
+        )
+        candidates = list(
+            QueryJob.objects.filter(status=Status.QUEUED).exclude(user__in=busy_users)
+            .order_by('created_at').values_list('pk', flat=True)[:20]
+        )
+        for pk in candidates:
+            # Conditional update so a job cancelled meanwhile is not picked up
+            claimed = QueryJob.objects.filter(pk=pk, status=Status.QUEUED).update(
+                status=Status.RUNNING, started_at=timezone.now(), worker_pid=os.getpid()
+            )
+            if claimed:
+                return QueryJob.objects.select_related(
+                    'user', 'cell', 'cell__notebook', 'cell__notebook__database_connection'
+                ).get(pk=pk)
+    return None
+
+
+def write_job_result(job, payload):
+    """Store a finished job's response payload for the result endpoint"""
+    os.makedirs(JOB_RESULTS_DIR, mode=0o700, exist_ok=True)
+    path = _result_path(job.uuid)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    # Results are customer data: encrypted, and only readable by the service account
+    content = get_fernet().encrypt(json.dumps(payload, cls=DjangoJSONEncoder).encode())
+    with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def read_job_result(job):
+    """Return a finished job's stored payload, or None once it expired"""
+    try:
+        with open(_result_path(job.uuid), 'rb') as f:
+            return json.loads(get_fernet().decrypt(f.read()))
+    except (OSError, ValueError, InvalidToken):
+        return None
+
+
+def run_job(job):
+    """Execute a claimed job and record its outcome"""
+    # Imported here because the views import this module
+    from .views import execute_sql_query, prepare_cell_run, cell_query_owner
+    from .db_handlers import store_query_result, execute_query_coalesced
+
+    params = job.params or {}
+    cell = job.cell
+    result_format = params.get('result_format', 'rows')
+    start_time = time.time()
+    result, preview_limit = None, None
+    try:
+        connection_info = cell.notebook.get_connection_info()
+        if not connection_info:
+            raise Exception('No database connection available for this notebook.')
+        run_query, run_connection_info, preview_limit = prepare_cell_run(
+            job.user, connection_info, job.query, params.get('preview', False)
+        )
+        # Tracked under the cell so both the job and the cell cancel endpoints can stop it
+        with query_owner(cell_query_owner(job.user, cell)):
+            result = execute_query_coalesced(
+                run_connection_info, run_query,
+                lambda: execute_sql_query(run_connection_info, run_query, params.get('timeout'), result_format),
+                result_format
+            )
+        store_query_result(run_connection_info, run_query, result, result_format, cell.notebook_id)
+        status, error = Status.SUCCEEDED, ''
+    except Exception as e:
+        error = str(e)
+        status = Status.CANCELLED if 'Query cancelled' in error else Status.FAILED
+        logger.warning(f"Query job {job.uuid} {status}: {error}")
+    execution_time = time.time() - start_time
+
+    if result is not None:
+        try:
+            write_job_result(job, {
+                'success': True,
+                'result': result,
+                'cached': False,
+                'truncated': bool(result.get('truncated')),
+                'preview_limit': preview_limit,
+                'execution_time': execution_time
+            })
+        except (OSError, TypeError, ValueError) as e:
+            status, error = Status.FAILED, f"Could not store job result: {e}"
+            logger.error(f"Query job {job.uuid}: {error}")
+
+    QueryJob.objects.filter(pk=job.pk, status=Status.RUNNING).update(
+        status=status,
+        error=error,
+        row_count=result.get('rowCount') if result else None,
+        truncated=bool(result and result.get('truncated')),
+        execution_time=execution_time,
+        finished_at=timezone.now()
+    )
+
+    if status == Status.SUCCEEDED:
+        # Same bookkeeping as an interactive run; results are not stored on the cell
+        SQLCell.objects.filter(pk=cell.pk).update(
+            query=job.query, result=None, is_executed=True, execution_time=execution_time,
+            updated_at=timezone.now()
+        )
+        cell.notebook.save()
+        cell_results.save(cell.notebook_id, cell.pk, result, execution_time)
+
+
+def cancel_job(job):
+    """Cancel a queued job or stop a running job's query; returns True if anything was cancelled"""
+    if QueryJob.objects.filter(pk=job.pk, status=Status.QUEUED).update(
+            status=Status.CANCELLED, finished_at=timezone.now()):
+        return True
+
+    job.refresh_from_db(fields=['status'])
+    if job.status != Status.RUNNING:
+        return False
+
+    from .views import cell_query_owner
+    from .db_handlers import cancel_running_queries
+
+    connection_info = job.cell.notebook.get_connection_info()
+    if not connection_info:
+        return False
+    # The worker marks the job cancelled once its statement fails
+    return bool(cancel_running_queries(connection_info, cell_query_owner(job.user, job.cell)))
+
+
+def cancel_queued_cell_jobs(cell):
+    """Cancel a cell's jobs that have not started yet; returns how many were cancelled"""
+    return QueryJob.objects.filter(cell=cell, status=Status.QUEUED).update(
+        status=Status.CANCELLED, finished_at=timezone.now()
+    )
+
+
+def wait_for_job(job, timeout):
+    """Block until a job finishes or timeout seconds pass; returns the refreshed job"""
+    deadline = time.monotonic() + timeout
+    while not job.is_finished and time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_INTERVAL)
+        job.refresh_from_db()
+    return job
+
+
+def get_wait_timeout(value, limit=None):
+    """Clamp a client-requested long-poll timeout to limit, by default the configured maximum"""
+    if limit is None:
+        limit = get_config()['job_long_poll_timeout']
+    try:
+        return max(0.0, min(float(value), limit))
+    except (TypeError, ValueError):
+        return limit
+
+
+def recover_stale_jobs():
+    """Fail running jobs whose worker process died, e.g. when it was killed mid-query"""
+    recovered = 0
+    for pk, worker_pid in QueryJob.objects.filter(status=Status.RUNNING).values_list('pk', 'worker_pid'):
+        if not process_alive(worker_pid):
+            recovered += QueryJob.objects.filter(pk=pk, status=Status.RUNNING, worker_pid=worker_pid).update(
+                status=Status.FAILED,
+                error='Worker exited before the query finished',
+                finished_at=timezone.now()
+            )
+    if recovered:
+        logger.warning(f"Marked {recovered} stale query job(s) as failed")
+    return recovered
+
+
+def expire_job_results():
+    """Delete finished jobs and their result files once they are older than job_result_ttl"""
+    ttl = get_config()['job_result_ttl']
+    cutoff = time.time() - ttl
+    try:
+        names = os.listdir(JOB_RESULTS_DIR)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if not name.endswith(('.json', '.tmp')):
+            continue
+        path = os.path.join(JOB_RESULTS_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+    QueryJob.objects.filter(
+        status__in=QueryJob.FINISHED_STATUSES,
+        finished_at__lt=timezone.now() - datetime.timedelta(seconds=ttl)
+    ).delete()
+
+
+def worker_loop(poll_interval=None, should_stop=lambda: False):
+    """Claim and run queued jobs until should_stop() returns True"""
+    poll_interval = poll_interval or get_config()['job_poll_interval']
+    last_maintenance = 0
+    logger.info(f"Query worker {os.getpid()} started")
+    while not should_stop():
+        close_old_connections()
+        try:
+            if time.time() - last_maintenance > MAINTENANCE_INTERVAL:
+                recover_stale_jobs()
+                expire_job_results()
+                last_maintenance = time.time()
+            job = claim_next_job()
+        except Exception as e:
+            logger.error(f"Query worker {os.getpid()} could not poll the job queue: {e}")
+            job = None
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        try:
+            run_job(job)
+        except Exception as e:
+            # Left running; recover_stale_jobs cannot tell, so fail it here
+            logger.error(f"Query worker {os.getpid()} failed to record job {job.uuid}: {e}")
+            QueryJob.objects.filter(pk=job.pk, status=Status.RUNNING).update(
+                status=Status.FAILED, error=str(e), finished_at=timezone.now()
+            )
+    logger.info(f"Query worker {os.getpid()} stopped")
@@ -17,6 +17,8 @@ class KnowledgeGraphGenerator:
         self.table_nodes = {}
         self.column_nodes = {}
         self.relationships = []
+        self.foreign_keys = []  # (schema, table, foreign key) declared in the catalog
+        self.column_ids = {}  # (schema, table, column) -> column node id
         self.column_types = defaultdict(lambda: "other")  # Default column type
         self.type_colors = {
             "number": "#4CAF50",  # Green
@@ -62,12 +64,19 @@ class KnowledgeGraphGenerator:
     
     def detect_relationships(self):
         """
-        Detect relationships between tables based on column names
+        Detect relationships between tables from declared foreign keys, and from
+        column names between tables of schemas that declare none
         """
+        self.add_declared_relationships()
+        declared_schemas = {schema_name for schema_name, _, _ in self.foreign_keys}
+        
         # Group columns by name
         columns_by_name = defaultdict(list)
         
         for col_id, data in self.column_nodes.items():
+            # Schemas with declared keys get only those relationships
+            if self.table_nodes[data['parent_table']]['schema'] in declared_schemas:
+                continue
             column_name = data['label']
             columns_by_name[column_name].append(col_id)
         
@@ -107,6 +116,26 @@ class KnowledgeGraphGenerator:
                         'label': f"{column_name}"
                     })
     
+    def add_declared_relationships(self):
+        """
+        Add a foreign_key relationship per column pair of each declared foreign key
+        whose referenced table is part of the graph
+        """
+        for schema_name, table_name, foreign_key in self.foreign_keys:
+            references = foreign_key['references']
+            ref_schema = references.get('schema') or schema_name
+            for column, ref_column in zip(foreign_key['columns'], references['columns']):
+                source = self.column_ids.get((schema_name, table_name, column))
+                target = self.column_ids.get((ref_schema, references['table'], ref_column))
+                if source is None or target is None:
+                    continue
+                self.relationships.append({
+                    'source': source,
+                    'target': target,
+                    'type': 'foreign_key',
+                    'label': foreign_key['name'] or column
+                })
+    
     def process_mysql_schema(self, schemas):
         """
         Process MySQL schema data into graph nodes and edges
@@ -137,6 +166,9 @@ class KnowledgeGraphGenerator:
                     'rows': table.get('rows', 0)
                 }
                 
+                for foreign_key in table.get('foreign_keys', []):
+                    self.foreign_keys.append((schema_name, table_name, foreign_key))
+                
                 # Process columns
                 for column in table.get('columns', []):
                     col_name = column.get('name', 'Unknown')
@@ -160,6 +192,7 @@ class KnowledgeGraphGenerator:
                         'column_type': column_type,
                         'is_key': is_key
                     }
+                    self.column_ids[(schema_name, table_name, col_name)] = col_id
                     
                     # Add edge from table to column
                     self.graph.add_edge(table_id, col_id, type='has_column')
@@ -36,6 +36,26 @@ class Command(BaseCommand):
             type=int,
             help='MySQL max execution time in seconds (default: 30)',
         )
+        parser.add_argument(
+            '--pool-idle-timeout',
+            type=int,
+            help='Seconds before an idle pooled connection is closed (default: 300)',
+        )
+        parser.add_argument(
+            '--pool-acquire-timeout',
+            type=int,
+            help='Seconds to wait for a free pooled connection (default: 30)',
+        )
+        parser.add_argument(
+            '--pool-health-check-interval',
+            type=int,
+            help='Ping pooled connections idle longer than this many seconds on checkout (default: 30)',
+        )
+        parser.add_argument(
+            '--pool-max-pools',
+            type=int,
+            help='Maximum connection pools kept per worker (default: 32)',
+        )
         parser.add_argument(
             '--show-config',
             action='store_true',
@@ -76,6 +96,18 @@ class Command(BaseCommand):
             
         if options['max_execution_time'] is not None:
             updates['max_execution_time'] = options['max_execution_time']
+            
+        if options['pool_idle_timeout'] is not None:
+            updates['pool_idle_timeout'] = options['pool_idle_timeout']
+            
+        if options['pool_acquire_timeout'] is not None:
+            updates['pool_acquire_timeout'] = options['pool_acquire_timeout']
+            
+        if options['pool_health_check_interval'] is not None:
+            updates['pool_health_check_interval'] = options['pool_health_check_interval']
+            
+        if options['pool_max_pools'] is not None:
+            updates['pool_max_pools'] = options['pool_max_pools']
 
         if not updates:
             self.stdout.write(
@@ -88,7 +120,7 @@ class Command(BaseCommand):
             if value < 0:
                 raise CommandError(f'Invalid value for {key}: {value}. Must be non-negative.')
             
-            if key in ['pool_minsize', 'pool_maxsize'] and value == 0:
+            if key in ['pool_minsize', 'pool_maxsize', 'pool_max_pools'] and value == 0:
                 raise CommandError(f'Invalid value for {key}: {value}. Pool size must be at least 1.')
 
         # Apply updates
@@ -111,6 +143,10 @@ class Command(BaseCommand):
         self.stdout.write(f"  Pool Max Size: {config['pool_maxsize']} connections")
         self.stdout.write(f"  Pool Recycle: {config['pool_recycle']} seconds")
         self.stdout.write(f"  Max Execution Time: {config['max_execution_time']} seconds")
+        self.stdout.write(f"  Pool Idle Timeout: {config['pool_idle_timeout']} seconds")
+        self.stdout.write(f"  Pool Acquire Timeout: {config['pool_acquire_timeout']} seconds")
+        self.stdout.write(f"  Pool Health Check Interval: {config['pool_health_check_interval']} seconds")
+        self.stdout.write(f"  Pool Max Pools: {config['pool_max_pools']} pools per worker")
         
         # Performance recommendations
         self.stdout.write(self.style.WARNING('\nPerformance Tips:'))
@@ -127,6 +163,10 @@ class Command(BaseCommand):
             'pool_maxsize': 10,
             'pool_recycle': 3600,
             'max_execution_time': 30,
+            'pool_idle_timeout': 300,
+            'pool_acquire_timeout': 30,
+            'pool_health_check_interval': 30,
+            'pool_max_pools': 32,
         }
         
         configure_db_settings(**default_config)
@@ -0,0 +1,68 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.db_config import get_config
+from core.jobs import worker_loop, recover_stale_jobs
+
+
+def _run_worker(poll_interval):
+    """Entry point of a worker process; finishes its current job on SIGTERM"""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    # Ctrl-C reaches the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_loop(poll_interval, should_stop=lambda: bool(stopping))
+
+
+class Command(BaseCommand):
+    help = 'Run background query workers for cells executed with background=1'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help='Number of worker processes (default: job_worker_processes setting)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            help='Seconds an idle worker waits before polling the queue again',
+        )
+
+    def handle(self, *args, **options):
+        config = get_config()
+        processes = options['processes'] or config['job_worker_processes']
+        poll_interval = options['poll_interval'] or config['job_poll_interval']
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+        signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+        recover_stale_jobs()
+        # Forked workers must open their own database connections
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        workers = {}
+        self.stdout.write(f"Starting {processes} query worker(s)")
+        while not stopping:
+            for slot in range(processes):
+                worker = workers.get(slot)
+                if worker is not None and worker.is_alive():
+                    continue
+                if worker is not None:
+                    self.stderr.write(f"Query worker {worker.pid} exited with code {worker.exitcode}, restarting")
+                worker = context.Process(target=_run_worker, args=(poll_interval,), daemon=True)
+                worker.start()
+                workers[slot] = worker
+            time.sleep(1)
+
+        self.stdout.write("Stopping query workers after their current jobs")
+        for worker in workers.values():
+            worker.terminate()
+        for worker in workers.values():
+            worker.join()
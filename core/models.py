@@ -227,6 +227,55 @@ class DatabaseConnection(models.Model):
         return config
 
 
+class SchemaSnapshot(models.Model):
+    """Versioned copy of a connection's introspected schema"""
+    connection = models.ForeignKey(
+        DatabaseConnection,
+        on_delete=models.CASCADE,
+        related_name='schema_snapshots'
+    )
+    version = models.PositiveIntegerField()
+    schema = models.JSONField()  # Same structure as live schema retrieval
+    table_digests = models.JSONField(default=dict)  # {schema: {table: catalog digest}}
+    fingerprint = models.CharField(max_length=64)  # Digest of all table digests
+    connection_fingerprint = models.CharField(max_length=64)  # Connection settings it was taken with
+    captured_at = models.DateTimeField(auto_now_add=True)
+    checked_at = models.DateTimeField()  # Last time the remote catalog was confirmed unchanged
+    
+    class Meta:
+        ordering = ['-version']
+        get_latest_by = 'version'
+        unique_together = ('connection', 'version')
+        verbose_name = "Schema Snapshot"
+        verbose_name_plural = "Schema Snapshots"
+    
+    def __str__(self):
+        return f"{self.connection.name} schema v{self.version}"
+
+
+class TableProfile(models.Model):
+    """Column statistics of one table, computed from a sample of its rows"""
+    connection = models.ForeignKey(
+        DatabaseConnection,
+        on_delete=models.CASCADE,
+        related_name='table_profiles'
+    )
+    schema_name = models.CharField(max_length=255)
+    table_name = models.CharField(max_length=255)
+    table_digest = models.CharField(max_length=255, blank=True)  # Snapshot table digest it was profiled at
+    sample_rows = models.PositiveIntegerField(default=0)
+    columns = models.JSONField(default=dict)  # {column: statistics}
+    profiled_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('connection', 'schema_name', 'table_name')
+        verbose_name = "Table Profile"
+        verbose_name_plural = "Table Profiles"
+    
+    def __str__(self):
+        return f"{self.connection.name} {self.schema_name}.{self.table_name} profile"
+
+
 class SQLNotebook(models.Model):
     """Notebook model for SQL queries"""
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
@@ -312,6 +361,75 @@ class SQLCell(models.Model):
         return f"{self.name} ({self.order})"
 
 
+class QueryJob(models.Model):
+    """A cell execution queued for the background query workers"""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+        CANCELLED = 'cancelled', 'Cancelled'
+
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='query_jobs'
+    )
+    cell = models.ForeignKey(
+        SQLCell,
+        on_delete=models.CASCADE,
+        related_name='jobs'
+    )
+    query = models.TextField()
+    params = models.JSONField(default=dict, blank=True)  # timeout, preview, result format
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        db_index=True
+    )
+    error = models.TextField(blank=True)
+    row_count = models.IntegerField(null=True, blank=True)
+    truncated = models.BooleanField(default=False)
+    execution_time = models.FloatField(null=True, blank=True)
+    worker_pid = models.IntegerField(null=True, blank=True)  # Process running the job
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    FINISHED_STATUSES = (Status.SUCCEEDED, Status.FAILED, Status.CANCELLED)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        verbose_name = "Query Job"
+        verbose_name_plural = "Query Jobs"
+
+    def __str__(self):
+        return f"Job {self.uuid} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    def to_dict(self):
+        """Job status as returned by the job API"""
+        return {
+            'job_id': str(self.uuid),
+            'cell_id': self.cell_id,
+            'status': self.status,
+            'error': self.error or None,
+            'row_count': self.row_count,
+            'truncated': self.truncated,
+            'execution_time': self.execution_time,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
 class KnowledgeGraph(models.Model):
     """Model for storing database schema knowledge graph"""
     notebook = models.ForeignKey(SQLNotebook, on_delete=models.CASCADE, related_name='knowledge_graphs')
@@ -0,0 +1,213 @@
+"""
+Query result cache for read-only statements
+
+Results are cached per worker, keyed by connection fingerprint, result format
+and normalized SQL, expire after a per-connection TTL and are evicted least
+recently used first once the total size exceeds the byte budget.
+
+Explicit invalidation writes a marker file so that every worker on the
+machine drops entries cached before the marker, not just the worker that
+handled the invalidation request.
+"""
+import json
+import os
+import re
+import tempfile
+import time
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .db_config import get_config
+
+logger = logging.getLogger(__name__)
+
+# Statements that are safe to serve from cache
+_READ_ONLY_PREFIXES = ('SELECT', 'WITH', 'SHOW', 'DESCRIBE', 'DESC', 'EXPLAIN')
+# Keywords that make an otherwise read-looking statement write or lock data
+_UNCACHEABLE = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|UPSERT|TRUNCATE|DROP|ALTER|CREATE|GRANT|REVOKE|CALL|"
+    r"INTO|FOR\s+UPDATE|FOR\s+SHARE|LOCK\s+IN)\b",
+    re.IGNORECASE
+)
+# Volatile functions whose results differ on every execution
+_VOLATILE = re.compile(r"\b(RAND|RANDOM|UUID|GEN_RANDOM_UUID|NEXTVAL|SLEEP|PG_SLEEP)\s*\(", re.IGNORECASE)
+# Quoted strings/identifiers are kept verbatim; everything else has whitespace collapsed
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`)|(\s+)")
+
+INVALIDATION_DIR = os.path.join(tempfile.gettempdir(), 'rca_query_cache')
+
+
+def normalize_sql(query):
+    """Collapse whitespace outside quoted literals and drop trailing semicolons"""
+    def replace(match):
+        return match.group(1) if match.group(1) is not None else ' '
+    return _SQL_TOKENS.sub(replace, query).strip().rstrip(';').strip()
+
+
+def _strip_quoted(normalized):
+    return _SQL_TOKENS.sub(lambda m: ' ' if m.group(1) else m.group(0), normalized)
+
+
+def is_read_only_query(query):
+    """Return True for a single statement that neither writes nor locks data"""
+    normalized = normalize_sql(query)
+    if not normalized.upper().startswith(_READ_ONLY_PREFIXES):
+        return False
+    # Multiple statements or data-modifying constructs don't qualify
+    unquoted = _strip_quoted(normalized)
+    return ';' not in unquoted and not _UNCACHEABLE.search(unquoted)
+
+
+def is_cacheable_query(query):
+    """Return True for single read-only statements whose results may be reused"""
+    # Volatile functions return something different on every execution
+    return is_read_only_query(query) and not _VOLATILE.search(_strip_quoted(normalize_sql(query)))
+
+
+def get_cache_ttl(connection_info):
+    """TTL in seconds for a connection; 0 disables caching for it"""
+    # Per-connection TTLs come from DatabaseConnection.additional_params
+    if connection_info.get('query_cache_ttl') is not None:
+        try:
+            return max(int(connection_info['query_cache_ttl']), 0)
+        except (TypeError, ValueError):
+            return 0
+    config = get_config()
+    return config['query_cache_ttl'] if config['query_cache_enabled'] else 0
+
+
+class _CacheEntry:
+    __slots__ = ('result', 'size', 'created_at', 'expires_at', 'tags')
+
+    def __init__(self, result, size, ttl, tags):
+        self.result = result
+        self.size = size
+        self.created_at = time.time()
+        self.expires_at = self.created_at + ttl
+        self.tags = tags
+
+
+class QueryResultCache:
+    """Per-worker LRU cache of query results bounded by total bytes"""
+
+    def __init__(self, invalidation_dir=INVALIDATION_DIR):
+        self._entries = OrderedDict()  # key -> _CacheEntry, least recently used first
+        self._lock = Lock()
+        self._bytes = 0
+        self._invalidation_dir = invalidation_dir
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _marker_path(self, tag):
+        return os.path.join(self._invalidation_dir, tag.replace(':', '_'))
+
+    def _invalidated_since(self, entry):
+        """Check the shared invalidation markers for any of the entry's tags"""
+        for tag in entry.tags:
+            try:
+                if os.stat(self._marker_path(tag)).st_mtime >= entry.created_at:
+                    return True
+            except FileNotFoundError:
+                continue
+        return False
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, fingerprint, query, result_format='rows', notebook_id=None, limits=None):
+        """Return a cached result or None; limits are the (max_rows, max_bytes) the result must have been fetched under"""
+        key = (fingerprint, result_format, limits, normalize_sql(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry.expires_at < time.time():
+                self._remove_locked(key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+        if self._invalidated_since(entry):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove_locked(key)
+                self.stats['misses'] += 1
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            if notebook_id is not None:
+                entry.tags = entry.tags | {f"notebook:{notebook_id}"}
+            self.stats['hits'] += 1
+        return entry.result
+
+    def set(self, fingerprint, query, result, ttl, result_format='rows', notebook_id=None, limits=None):
+        """Store a result, evicting least recently used entries to stay within the byte budget"""
+        config = get_config()
+        size = len(json.dumps(result, cls=DjangoJSONEncoder))
+        if size > config['query_cache_max_entry_bytes']:
+            logger.debug(f"Result of {size} bytes too large for the query cache")
+            return False
+        tags = {f"connection:{fingerprint}"}
+        if notebook_id is not None:
+            tags.add(f"notebook:{notebook_id}")
+        key = (fingerprint, result_format, limits, normalize_sql(query))
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = _CacheEntry(result, size, ttl, tags)
+            self._bytes += size
+            self.stats['stores'] += 1
+            while self._bytes > config['query_cache_max_bytes'] and len(self._entries) > 1:
+                self._remove_locked(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+        return True
+
+    def _invalidate_tag(self, tag):
+        """Drop local entries with a tag and mark it invalidated for other workers"""
+        try:
+            os.makedirs(self._invalidation_dir, exist_ok=True)
+            with open(self._marker_path(tag), 'a'):
+                pass
+            os.utime(self._marker_path(tag), None)
+        except OSError as e:
+            logger.warning(f"Could not write query cache invalidation marker for {tag}: {e}")
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if tag in entry.tags]
+            for key in keys:
+                self._remove_locked(key)
+            self.stats['invalidations'] += 1
+        return len(keys)
+
+    def invalidate_connection(self, fingerprint):
+        """Drop every cached result for a connection"""
+        return self._invalidate_tag(f"connection:{fingerprint}")
+
+    def invalidate_notebook(self, notebook_id):
+        """Drop every cached result served to a notebook"""
+        return self._invalidate_tag(f"notebook:{notebook_id}")
+
+    def clear(self):
+        """Drop all locally cached results"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=get_config()['query_cache_max_bytes'],
+                hit_rate=self.stats['hits'] / lookups if lookups else 0.0
+            )
+
+
+# Global query result cache for this worker
+query_cache = QueryResultCache()
@@ -0,0 +1,154 @@
+"""
+Columnar result encoding for query results
+
+Row results repeat every column name once per row and convert values cell by
+cell. The columnar format sends column names and dtypes once, followed by one
+value array per column, and converts each column in a single pass.
+"""
+import base64
+import datetime
+import decimal
+import json
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Optional binary encodings
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+# Media types understood by negotiate_result_format
+ROWS_JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.rca.columnar+json'
+COLUMNAR_MSGPACK = 'application/x-msgpack'
+COLUMNAR_ARROW = 'application/vnd.apache.arrow.stream'
+
+# Python types mapped to the dtype reported for a column; order matters since
+# bool is a subclass of int and datetime is a subclass of date
+_DTYPES = (
+    (bool, 'bool'),
+    (int, 'int'),
+    (float, 'float'),
+    (decimal.Decimal, 'decimal'),
+    (str, 'string'),
+    (datetime.datetime, 'datetime'),
+    (datetime.date, 'date'),
+    (datetime.time, 'time'),
+    (datetime.timedelta, 'interval'),
+    ((bytes, bytearray, memoryview), 'bytes'),
+    (uuid.UUID, 'uuid'),
+)
+
+def _isoformat(value):
+    return value.isoformat()
+
+def _to_str(value):
+    return str(value)
+
+def _interval_seconds(value):
+    return value.total_seconds()
+
+def _bytes_to_base64(value):
+    return base64.b64encode(bytes(value)).decode('ascii')
+
+# Per-dtype converters to JSON-friendly values; None means values pass through
+_CONVERTERS = {
+    'decimal': _to_str,  # Keep exact precision, as DjangoJSONEncoder does for row results
+    'datetime': _isoformat,
+    'date': _isoformat,
+    'time': _isoformat,
+    'interval': _interval_seconds,
+    'bytes': _bytes_to_base64,
+    'uuid': _to_str,
+    'other': _to_str,
+}
+
+def detect_dtype(values):
+    """Detect a column's dtype from its first non-null value"""
+    for value in values:
+        if value is None:
+            continue
+        for python_type, dtype in _DTYPES:
+            if isinstance(value, python_type):
+                return dtype
+        return 'other'
+    return 'null'
+
+def convert_column(values, dtype):
+    """Convert a whole column to JSON-friendly values in one pass"""
+    converter = _CONVERTERS.get(dtype)
+    if converter is None:
+        return list(values)
+    return [None if value is None else converter(value) for value in values]
+
+def to_columnar(columns, rows):
+    """
+    Build a columnar result from column names and row tuples
+    Returns {'columns', 'dtypes', 'data'} where data[j] holds column j's values
+    """
+    column_values = list(zip(*rows)) if rows else [() for _ in columns]
+    dtypes = [detect_dtype(values) for values in column_values]
+    data = [convert_column(values, dtype) for values, dtype in zip(column_values, dtypes)]
+    return {
+        'format': 'columnar',
+        'columns': list(columns),
+        'dtypes': dtypes,
+        'data': data
+    }
+
+def negotiate_result_format(accept_header):
+    """
+    Pick the result format for a request's Accept header
+    Returns (result_format, media_type) where result_format is 'rows' or 'columnar'
+    """
+    accept = (accept_header or '').lower()
+    if COLUMNAR_ARROW in accept and ARROW_AVAILABLE:
+        return 'columnar', COLUMNAR_ARROW
+    if COLUMNAR_MSGPACK in accept and MSGPACK_AVAILABLE:
+        return 'columnar', COLUMNAR_MSGPACK
+    if COLUMNAR_JSON in accept or COLUMNAR_MSGPACK in accept or COLUMNAR_ARROW in accept:
+        # Binary encodings fall back to columnar JSON when their library is missing
+        return 'columnar', COLUMNAR_JSON
+    return 'rows', ROWS_JSON
+
+def to_arrow_array(values):
+    """Build an Arrow array, falling back to strings for columns of mixed types"""
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+def _msgpack_default(value):
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+def encode_payload(payload, media_type):
+    """Encode a response payload whose 'result' is columnar for a binary media type"""
+    if media_type == COLUMNAR_MSGPACK:
+        return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+    
+    if media_type == COLUMNAR_ARROW:
+        # Arrow carries the result table; the rest of the payload travels as schema metadata
+        result = payload.get('result') or {}
+        columns = result.get('columns') or []
+        table = pa.Table.from_arrays(
+            [to_arrow_array(values) for values in result.get('data') or []],
+            names=columns
+        )
+        metadata = {key: value for key, value in payload.items() if key != 'result'}
+        metadata['result'] = {key: value for key, value in result.items() if key != 'data'}
+        table = table.replace_schema_metadata({'rca': json.dumps(metadata, cls=DjangoJSONEncoder)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    
+    raise ValueError(f"Unsupported result media type: {media_type}")
@@ -0,0 +1,163 @@
+"""
+Row and byte budgets for query results
+
+Rows are fetched in batches and kept only while the result stays within its
+row and (estimated) serialized byte budget, so a runaway SELECT cannot
+materialize millions of rows in a worker before anything checks its size.
+
+Limits come from the global configuration, can be overridden per user in the
+'user_result_limits' setting and capped per connection through the
+max_result_rows / max_result_bytes keys of DatabaseConnection.additional_params.
+"""
+import re
+
+from .db_config import get_config
+from .query_cache import normalize_sql, is_read_only_query
+
+# Keys in connection_info that carry the effective limits
+LIMIT_KEYS = ('max_result_rows', 'max_result_bytes')
+
+# Row-limiting clauses at the outermost level of a SELECT
+_LIMIT_CLAUSE = re.compile(r"\b(LIMIT|FETCH\s+(FIRST|NEXT)|OFFSET)\b", re.IGNORECASE)
+# Tokens skipped while looking for the outermost level: literals, quoted identifiers and comments
+_SKIPPED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def _positive_int(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _user_overrides(user):
+    """Return the configured limit overrides for a user, looked up by id or email"""
+    overrides = get_config().get('user_result_limits') or {}
+    if user is None:
+        return {}
+    for key in (str(getattr(user, 'id', '')), getattr(user, 'email', None)):
+        if key and key in overrides:
+            return overrides[key]
+    return {}
+
+
+def get_result_limits(connection_info):
+    """Return (max_rows, max_bytes) for a connection"""
+    config = get_config()
+    max_rows = _positive_int(connection_info.get('max_result_rows')) or config['max_result_rows']
+    max_bytes = _positive_int(connection_info.get('max_result_bytes')) or config['max_result_bytes']
+    return max_rows, max_bytes
+
+
+def apply_user_result_limits(connection_info, user, max_rows=None):
+    """
+    Return a copy of connection_info whose limits are the tightest of the
+    connection's, the user's and an optional caller-supplied row cap
+    """
+    config = get_config()
+    overrides = _user_overrides(user)
+    limited = dict(connection_info)
+    for key, cap in zip(LIMIT_KEYS, (max_rows, None)):
+        candidates = [
+            _positive_int(connection_info.get(key)),
+            _positive_int(overrides.get(key)) or config[key],
+            _positive_int(cap),
+        ]
+        limited[key] = min(value for value in candidates if value)
+    return limited
+
+
+def apply_preview_limit(query, limit):
+    """
+    Add a LIMIT to the outermost SELECT for interactive preview runs.
+    Returns (query, applied); queries that already limit their rows or are
+    not plain read-only SELECTs are returned unchanged.
+    """
+    if not normalize_sql(query).upper().startswith(('SELECT', 'WITH')) or not is_read_only_query(query):
+        return query, False
+
+    # Only clauses outside parentheses belong to the outermost statement
+    statement = query.strip().rstrip(';').rstrip()
+    outer, depth = [], 0
+    for char in _SKIPPED.sub(' ', statement):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0:
+            outer.append(char)
+    if _LIMIT_CLAUSE.search(''.join(outer)):
+        return query, False
+
+    # Newline first so a trailing line comment cannot swallow the clause
+    return f"{statement}\nLIMIT {int(limit)}", True
+
+
+def estimate_row_bytes(row):
+    """Approximate a row's JSON-serialized size without encoding it"""
+    values = row.values() if isinstance(row, dict) else row
+    size = 2
+    for value in values:
+        if value is None:
+            size += 5
+        elif isinstance(value, (str, bytes, bytearray)):
+            size += len(value) + 3
+        elif isinstance(value, (bool, int, float)):
+            size += 12
+        else:
+            size += len(str(value)) + 3
+    return size
+
+
+class ResultBudget:
+    """Row/byte allowance for one result set, consumed batch by batch while fetching"""
+
+    def __init__(self, max_rows, max_bytes, columns=(), batch_size=None):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size or get_config()['fetch_batch_size']
+        self.rows = []
+        self.bytes = 0
+        self.truncated = False
+        self.set_columns(columns)
+
+    def set_columns(self, columns):
+        """Account for column names, which row results repeat once per row"""
+        self.row_overhead = sum(len(str(column)) + 4 for column in columns)
+
+    @classmethod
+    def for_connection(cls, connection_info, columns=()):
+        max_rows, max_bytes = get_result_limits(connection_info)
+        return cls(max_rows, max_bytes, columns)
+
+    def next_batch_size(self):
+        """Rows to request next; one past the row limit so truncation can be detected"""
+        return max(1, min(self.batch_size, self.max_rows - len(self.rows) + 1))
+
+    def add(self, batch):
+        """Keep rows from a batch while the budget lasts; returns False once fetching should stop"""
+        if not batch:
+            return False
+        for row in batch:
+            size = estimate_row_bytes(row) + self.row_overhead
+            if len(self.rows) >= self.max_rows or self.bytes + size > self.max_bytes:
+                self.truncated = True
+                return False
+            self.rows.append(row)
+            self.bytes += size
+        return True
+
+    def fetch(self, cursor):
+        """Fetch from a DB-API cursor (or SQLAlchemy result) until exhausted or over budget"""
+        while self.add(cursor.fetchmany(self.next_batch_size())):
+            pass
+        return self.rows
+
+    def metadata(self):
+        """Result metadata describing how much was read"""
+        return {
+            'truncated': self.truncated,
+            'rows_fetched': len(self.rows),
+            'bytes': self.bytes,
+        }
@@ -0,0 +1,192 @@
+"""
+On-disk store for cell results
+
+Cell results are not kept in the database (cell.result stays empty for privacy),
+so without this store every preview or page of an earlier result meant running
+the query again. When result_store_enabled is set, the latest result of each cell
+is written as an Arrow IPC file, optionally Fernet-encrypted, next to a small
+JSON metadata file. Unencrypted files are read back memory-mapped, so a preview
+or a page only touches the rows it returns.
+
+Files expire after result_store_ttl seconds, and the oldest are evicted once the
+store grows past result_store_max_bytes.
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .db_config import get_config
+from .encryption import get_fernet
+from .result_format import to_arrow_array
+
+# Optional: Arrow IPC files for stored results
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_DIR = os.path.join(tempfile.gettempdir(), 'rca_cell_results')
+
+# Seconds between expiry sweeps triggered by writes in one worker
+SWEEP_INTERVAL = 60
+
+
+def _column_values(result):
+    """Return (columns, per-column value lists) for a rows- or columnar-format result"""
+    columns = list(result.get('columns') or [])
+    if result.get('format') == 'columnar':
+        return columns, result.get('data') or [[] for _ in columns]
+    rows = result.get('rows') or []
+    return columns, [[row.get(column) for row in rows] for column in columns]
+
+
+def _read_slice(source, offset, limit):
+    """Read rows [offset, offset + limit) of an Arrow file; zero-copy until rows are converted"""
+    table = pa.ipc.open_file(source).read_all()
+    return table.slice(max(0, offset), limit).to_pylist()
+
+
+class CellResultStore:
+    """Latest result of each cell, kept as Arrow files shared by all workers on the machine"""
+
+    def __init__(self, directory=RESULT_STORE_DIR):
+        self._directory = directory
+        self._last_sweep = 0
+
+    @staticmethod
+    def is_enabled():
+        return ARROW_AVAILABLE and get_config()['result_store_enabled']
+
+    def _paths(self, notebook_id, cell_id):
+        base = os.path.join(self._directory, str(notebook_id), str(cell_id))
+        return f"{base}.arrow", f"{base}.json"
+
+    def save(self, notebook_id, cell_id, result, execution_time=None):
+        """Write a cell's result; returns its metadata, or None when the store is disabled"""
+        if not self.is_enabled() or not isinstance(result, dict) or 'columns' not in result:
+            return None
+        config = get_config()
+        data_path, meta_path = self._paths(notebook_id, cell_id)
+        try:
+            columns, values = _column_values(result)
+            table = pa.Table.from_arrays([to_arrow_array(column) for column in values], names=columns)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            data = sink.getvalue().to_pybytes()
+            encrypted = bool(config['result_store_encrypt'])
+            if encrypted:
+                data = get_fernet().encrypt(data)
+
+            metadata = {
+                'columns': columns,
+                'dtypes': [str(field.type) for field in table.schema],
+                'row_count': table.num_rows,
+                'truncated': bool(result.get('truncated')),
+                'bytes': len(data),
+                'encrypted': encrypted,
+                'execution_time': execution_time,
+                'stored_at': time.time(),
+            }
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            # Data first, then metadata, each swapped in atomically
+            for path, content, mode in ((data_path, data, 'wb'),
+                                        (meta_path, json.dumps(metadata, cls=DjangoJSONEncoder), 'w')):
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, mode) as f:
+                    f.write(content)
+                os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not store result of cell {cell_id}: {e}")
+            return None
+
+        if time.time() - self._last_sweep > SWEEP_INTERVAL:
+            self.expire()
+        return metadata
+
+    def get_metadata(self, notebook_id, cell_id):
+        """Return a stored result's metadata, or None if there is none or it expired"""
+        if not ARROW_AVAILABLE:
+            return None
+        data_path, meta_path = self._paths(notebook_id, cell_id)
+        try:
+            with open(meta_path) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - metadata.get('stored_at', 0) > get_config()['result_store_ttl'] or not os.path.exists(data_path):
+            self.delete(notebook_id, cell_id)
+            return None
+        return metadata
+
+    def read_rows(self, notebook_id, cell_id, offset=0, limit=None):
+        """
+        Return (metadata, rows) for a slice of a stored result, rows as dicts,
+        or (None, []) when no result is stored
+        """
+        metadata = self.get_metadata(notebook_id, cell_id)
+        if metadata is None:
+            return None, []
+        data_path, _ = self._paths(notebook_id, cell_id)
+        try:
+            if metadata.get('encrypted'):
+                with open(data_path, 'rb') as f:
+                    source = pa.py_buffer(get_fernet().decrypt(f.read()))
+                rows = _read_slice(source, offset, limit)
+            else:
+                with pa.memory_map(data_path) as source:
+                    rows = _read_slice(source, offset, limit)
+        except Exception as e:
+            logger.warning(f"Could not read stored result of cell {cell_id}: {e}")
+            return None, []
+        return metadata, rows
+
+    def delete(self, notebook_id, cell_id):
+        for path in self._paths(notebook_id, cell_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def expire(self):
+        """Remove expired results, then the oldest ones while the store is over its byte budget"""
+        self._last_sweep = time.time()
+        config = get_config()
+        cutoff = time.time() - config['result_store_ttl']
+        entries = []
+        for root, _, names in os.walk(self._directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.st_mtime < cutoff:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                elif name.endswith('.arrow'):
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= config['result_store_max_bytes']:
+                break
+            for stale_path in (path, path[:-len('.arrow')] + '.json'):
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+            total -= size
+
+
+# Global cell result store
+cell_results = CellResultStore()
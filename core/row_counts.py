@@ -0,0 +1,135 @@
+"""
+Exact table row counts computed in the background
+
+Schema retrieval reports the catalog's row estimates (pg_class.reltuples /
+pg_stat_user_tables, information_schema.tables.table_rows) and never scans user
+data. When exact_row_counts_enabled is set, tables whose exact count is missing
+or older than exact_row_count_ttl are counted by a background thread, and later
+schema loads report the cached count with the time it was taken.
+
+Counts are kept as one small file per connection so every worker on the machine
+can use them; writers lock the file so counts taken by other workers are kept.
+"""
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from threading import Lock, Thread
+
+from .db_config import get_config
+
+logger = logging.getLogger(__name__)
+
+ROW_COUNTS_DIR = os.path.join(tempfile.gettempdir(), 'rca_row_counts')
+
+# Connections with a counting thread running in this worker
+_counting = set()
+_counting_lock = Lock()
+
+
+def _quote_identifier(name, connection_type):
+    if connection_type == 'postgresql':
+        return '"' + name.replace('"', '""') + '"'
+    return '`' + name.replace('`', '``') + '`'
+
+
+def _counts_path(connection_info):
+    # Imported here because db_handlers uses this module
+    from .db_handlers import get_connection_fingerprint
+    return os.path.join(ROW_COUNTS_DIR, f"{get_connection_fingerprint(connection_info)}.json")
+
+
+def load_row_counts(connection_info):
+    """Return cached exact counts as {"schema.table": {"rows": n, "counted_at": ts}}"""
+    try:
+        with open(_counts_path(connection_info)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@contextmanager
+def _counts_lock(path):
+    """Serialize read-modify-write of a connection's counts across threads and workers"""
+    os.makedirs(ROW_COUNTS_DIR, exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _save_row_count(connection_info, schema_name, table_name, rows):
+    """Merge one table's count into the connection's file"""
+    path = _counts_path(connection_info)
+    with _counts_lock(path):
+        counts = load_row_counts(connection_info)
+        counts[f"{schema_name}.{table_name}"] = {'rows': rows, 'counted_at': time.time()}
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(counts, f)
+        os.replace(temp_path, path)
+
+
+def apply_exact_row_counts(connection_info, schemas):
+    """
+    Replace catalog estimates with fresh cached exact counts, and schedule counting
+    for tables without one when exact counts are enabled; returns schemas
+    """
+    config = get_config()
+    counts = load_row_counts(connection_info)
+    cutoff = time.time() - config['exact_row_count_ttl']
+    stale = []
+    for schema in schemas:
+        for table in schema['tables']:
+            if table['type'] != 'table':
+                continue
+            cached = counts.get(f"{schema['name']}.{table['name']}")
+            if cached and cached['counted_at'] >= cutoff:
+                table['rows'] = cached['rows']
+                table['rows_exact'] = True
+                table['rows_counted_at'] = cached['counted_at']
+            else:
+                stale.append((schema['name'], table['name']))
+
+    if stale and config['exact_row_counts_enabled']:
+        schedule_exact_row_counts(connection_info, stale[:config['exact_row_count_max_tables']])
+    return schemas
+
+
+def schedule_exact_row_counts(connection_info, tables):
+    """Count tables in a background thread, at most one thread per connection per worker"""
+    from .db_handlers import get_connection_fingerprint
+    fingerprint = get_connection_fingerprint(connection_info)
+    with _counting_lock:
+        if fingerprint in _counting:
+            return False
+        _counting.add(fingerprint)
+    Thread(
+        target=_count_tables, args=(dict(connection_info), list(tables), fingerprint),
+        name='exact-row-counts', daemon=True
+    ).start()
+    return True
+
+
+def _count_tables(connection_info, tables, fingerprint):
+    from .db_handlers import execute_query
+    connection_type = connection_info.get('type', 'mysql').lower()
+    timeout = get_config()['exact_row_count_timeout']
+    try:
+        for schema_name, table_name in tables:
+            qualified = '.'.join(_quote_identifier(name, connection_type) for name in (schema_name, table_name))
+            success, result = execute_query(connection_info, f"SELECT COUNT(*) AS row_count FROM {qualified}", timeout)
+            if not success or not result.get('rows'):
+                logger.warning(f"Exact row count failed for {schema_name}.{table_name}: {result}")
+                continue
+            _save_row_count(connection_info, schema_name, table_name, result['rows'][0]['row_count'])
+    except Exception as e:
+        logger.error(f"Exact row counting stopped: {e}")
+    finally:
+        with _counting_lock:
+            _counting.discard(fingerprint)
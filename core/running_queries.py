@@ -0,0 +1,183 @@
+"""
+Registry of in-flight queries
+
+Every statement sent to a customer database is recorded together with the
+server-side session running it (MySQL connection id / PostgreSQL backend pid),
+so it can be stopped with KILL QUERY / pg_cancel_backend when the user cancels
+it or it outlives its timeout.
+
+Records are written as small files so that a cancel request handled by any
+worker on the machine can find queries started by another worker. They hold
+customer SQL, so the directory and files are only accessible to the service account.
+"""
+import hashlib
+import json
+import os
+import secrets
+import tempfile
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+RUNNING_QUERIES_DIR = os.path.join(tempfile.gettempdir(), 'rca_running_queries')
+
+# Owner of the queries issued by the current request, e.g. (user_id, 'cell', cell_id)
+_current_owner = ContextVar('running_query_owner', default=None)
+
+
+def owner_key(owner):
+    """Stable file-name-safe key for an owner tuple"""
+    return hashlib.sha256(json.dumps([str(part) for part in owner]).encode()).hexdigest()[:32]
+
+
+def get_query_owner():
+    """Return the owner queries are currently attributed to, if any"""
+    return _current_owner.get()
+
+
+@contextmanager
+def query_owner(owner):
+    """Attribute queries run inside the block to an owner so they can be cancelled as a group"""
+    running_queries.clear_cancelled(owner)
+    token = _current_owner.set(owner)
+    try:
+        yield
+    finally:
+        _current_owner.reset(token)
+
+
+class RunningQuery:
+    """A statement in flight on a customer database"""
+
+    def __init__(self, fingerprint, connection_type, backend_id, query, owner=None):
+        self.query_id = secrets.token_urlsafe(12)
+        self.fingerprint = fingerprint
+        self.connection_type = connection_type
+        self.backend_id = backend_id
+        self.query = query
+        self.owner = owner
+        self.started_at = time.time()
+        self.timed_out = False
+        self.abandoned = False
+        self.finished = False
+        self.lock = Lock()  # Serializes a kill against the statement finishing
+
+    def to_dict(self):
+        return {
+            'query_id': self.query_id,
+            'fingerprint': self.fingerprint,
+            'type': self.connection_type,
+            'backend_id': self.backend_id,
+            'query': self.query[:500],
+            'owner': [str(part) for part in self.owner] if self.owner is not None else None,
+            'started_at': self.started_at,
+            'pid': os.getpid(),
+        }
+
+
+class RunningQueryRegistry:
+    """In-flight queries recorded as files shared by all workers on the machine"""
+
+    def __init__(self, directory=RUNNING_QUERIES_DIR):
+        self._directory = directory
+
+    def _record_path(self, entry):
+        prefix = owner_key(entry.owner) if entry.owner is not None else 'anonymous'
+        return os.path.join(self._directory, f"{prefix}.{entry.query_id}.json")
+
+    def _open_private(self, path, flags):
+        """Open a file in the registry directory with owner-only permissions"""
+        os.makedirs(self._directory, mode=0o700, exist_ok=True)
+        return os.open(path, os.O_WRONLY | os.O_CREAT | flags, 0o600)
+
+    def _cancel_marker_path(self, owner):
+        return os.path.join(self._directory, f"cancelled.{owner_key(owner)}")
+
+    def register(self, fingerprint, connection_type, backend_id, query, owner=None):
+        """Record a statement that is about to run; refuses to start work for a cancelled owner"""
+        if owner is not None and self.is_cancelled(owner):
+            raise Exception("Query cancelled")
+        entry = RunningQuery(fingerprint, connection_type, backend_id, query, owner)
+        try:
+            with os.fdopen(self._open_private(self._record_path(entry), os.O_TRUNC), 'w') as f:
+                json.dump(entry.to_dict(), f)
+        except OSError as e:
+            logger.warning(f"Could not write running query record {entry.query_id}: {e}")
+        return entry
+
+    def unregister(self, entry):
+        """Forget a statement once it finished, failed or was cancelled"""
+        try:
+            os.remove(self._record_path(entry))
+        except OSError:
+            pass
+
+    def _read_records(self, prefix=''):
+        """Read the records of every worker whose file names start with a prefix"""
+        records = []
+        try:
+            names = [name for name in os.listdir(self._directory)
+                     if name.startswith(prefix) and name.endswith('.json')]
+        except FileNotFoundError:
+            return records
+        for name in names:
+            path = os.path.join(self._directory, name)
+            try:
+                with open(path) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not process_alive(record.get('pid')):
+                # Left behind by a worker that died mid-query
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            records.append(record)
+        return records
+
+    def find(self, owner):
+        """Return the records of every worker's in-flight queries for an owner"""
+        return self._read_records(f"{owner_key(owner)}.")
+
+    def find_all(self):
+        """Return the records of every worker's in-flight queries"""
+        return self._read_records()
+
+    def mark_cancelled(self, owner):
+        """Flag an owner as cancelled so no further statements start for it"""
+        try:
+            os.close(self._open_private(self._cancel_marker_path(owner), os.O_APPEND))
+        except OSError as e:
+            logger.warning(f"Could not write cancel marker: {e}")
+
+    def is_cancelled(self, owner):
+        return os.path.exists(self._cancel_marker_path(owner))
+
+    def clear_cancelled(self, owner):
+        try:
+            os.remove(self._cancel_marker_path(owner))
+        except OSError:
+            pass
+
+
+def process_alive(pid):
+    """Return True if a worker process with this pid still exists"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Global registry of in-flight queries
+running_queries = RunningQueryRegistry()
@@ -0,0 +1,167 @@
+"""
+Versioned schema snapshots per DatabaseConnection
+
+The schema explorer, the agent and knowledge graph generation read a saved
+connection's schema from its latest SchemaSnapshot instead of introspecting the
+remote catalog on every call. A snapshot younger than schema_cache_max_age is
+served as is; an older one is checked with a single catalog digest query and only
+the schemas whose tables were added, dropped or altered are introspected again,
+producing a new version. Notebooks without a saved connection are introspected live.
+"""
+import hashlib
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .column_profiles import apply_column_profiles
+from .db_config import get_config
+from .db_handlers import get_database_schema_info, get_database_schema_async
+from .db_handlers import get_schema_digests, get_schema_digests_async, get_connection_fingerprint
+from .models import SchemaSnapshot, TableProfile
+from .row_counts import apply_exact_row_counts
+
+logger = logging.getLogger(__name__)
+
+
+def _digests_fingerprint(digests):
+    return hashlib.sha256(json.dumps(digests, sort_keys=True).encode()).hexdigest()
+
+
+def get_latest_snapshot(db_connection):
+    # The schema itself is loaded on first access; freshness checks don't need it
+    return SchemaSnapshot.objects.filter(connection=db_connection).defer('schema').first()
+
+
+def _is_fresh(snapshot, connection_fingerprint):
+    if snapshot is None or snapshot.connection_fingerprint != connection_fingerprint:
+        return False
+    age = (timezone.now() - snapshot.checked_at).total_seconds()
+    return age < get_config()['schema_cache_max_age']
+
+
+def _plan_refresh(snapshot, digests, connection_fingerprint, force_refresh):
+    """
+    Compare catalog digests with a snapshot
+    Returns the set of schema names to introspect again, or None for all of them
+    """
+    if force_refresh or snapshot is None or snapshot.connection_fingerprint != connection_fingerprint:
+        return None
+    previous = snapshot.table_digests or {}
+    return {name for name in set(previous) | set(digests) if previous.get(name) != digests.get(name)}
+
+
+def _mark_checked(snapshot):
+    snapshot.checked_at = timezone.now()
+    SchemaSnapshot.objects.filter(pk=snapshot.pk).update(checked_at=snapshot.checked_at)
+    return snapshot
+
+
+def _store_snapshot(db_connection, previous, schemas, schema_names, digests, connection_fingerprint):
+    """Save a new version, merging re-introspected schemas into the previous snapshot"""
+    if previous is not None and schema_names is not None:
+        kept = [schema for schema in previous.schema if schema['name'] not in schema_names]
+        schemas = sorted(kept + list(schemas), key=lambda schema: schema['name'])
+
+    version = (previous.version + 1) if previous else 1
+    try:
+        snapshot = SchemaSnapshot.objects.create(
+            connection=db_connection,
+            version=version,
+            schema=schemas,
+            table_digests=digests,
+            fingerprint=_digests_fingerprint(digests),
+            connection_fingerprint=connection_fingerprint,
+            checked_at=timezone.now()
+        )
+    except IntegrityError:
+        # Another worker stored this version first
+        return get_latest_snapshot(db_connection)
+
+    keep = get_config()['schema_snapshot_versions']
+    SchemaSnapshot.objects.filter(connection=db_connection, version__lte=version - keep).delete()
+    logger.info(f"Stored schema v{version} for connection {db_connection.id} "
+                f"({'all' if schema_names is None else len(schema_names)} schema(s) introspected)")
+    return snapshot
+
+
+def get_schema_snapshot(db_connection, force_refresh=False):
+    """Return a connection's current schema snapshot, refreshing it when stale and changed"""
+    connection_info = db_connection.get_connection_config()
+    connection_fingerprint = get_connection_fingerprint(connection_info)
+    snapshot = get_latest_snapshot(db_connection)
+    if not force_refresh and _is_fresh(snapshot, connection_fingerprint):
+        return snapshot
+
+    digests = get_schema_digests(connection_info)
+    schema_names = _plan_refresh(snapshot, digests, connection_fingerprint, force_refresh)
+    if schema_names is not None and not schema_names:
+        return _mark_checked(snapshot)
+
+    schemas = get_database_schema_info(connection_info, schema_names)
+    return _store_snapshot(db_connection, snapshot, schemas, schema_names, digests, connection_fingerprint)
+
+
+async def get_schema_snapshot_async(db_connection, force_refresh=False):
+    """Async counterpart of get_schema_snapshot, introspecting on the per-loop pools"""
+    connection_info = db_connection.get_connection_config()
+    connection_fingerprint = get_connection_fingerprint(connection_info)
+    snapshot = await sync_to_async(get_latest_snapshot)(db_connection)
+    if not force_refresh and _is_fresh(snapshot, connection_fingerprint):
+        return snapshot
+
+    digests = await get_schema_digests_async(connection_info)
+    schema_names = _plan_refresh(snapshot, digests, connection_fingerprint, force_refresh)
+    if schema_names is not None and not schema_names:
+        return await sync_to_async(_mark_checked)(snapshot)
+
+    schemas = await get_database_schema_async(connection_info, schema_names)
+    return await sync_to_async(_store_snapshot)(
+        db_connection, snapshot, schemas, schema_names, digests, connection_fingerprint
+    )
+
+
+def snapshot_schemas(db_connection, snapshot):
+    """A snapshot's schemas with the connection's current exact row counts and column profiles"""
+    schemas = apply_exact_row_counts(db_connection.get_connection_config(), snapshot.schema)
+    return apply_column_profiles(db_connection, snapshot, schemas)
+
+
+def get_connection_schemas(db_connection, force_refresh=False):
+    """Schemas of a saved connection from its snapshot"""
+    return snapshot_schemas(db_connection, get_schema_snapshot(db_connection, force_refresh))
+
+
+def snapshot_fingerprint(db_connection, snapshot, schemas):
+    """
+    Fingerprint of a snapshot's schemas with their exact row counts and column
+    profiles, built from the snapshot's version and digest instead of hashing the schemas
+    """
+    digest = hashlib.sha256(f"{db_connection.id}:{snapshot.version}:{snapshot.fingerprint}".encode())
+    for schema in schemas:
+        for table in schema['tables']:
+            if table.get('rows_exact'):
+                digest.update(f"{schema['name']}.{table['name']}={table['rows']};".encode())
+    profiles = TableProfile.objects.filter(connection=db_connection).aggregate(count=Count('id'), latest=Max('profiled_at'))
+    digest.update(f"{profiles['count']}:{profiles['latest']}".encode())
+    return digest.hexdigest()
+
+
+def get_connection_schemas_with_fingerprint(db_connection, force_refresh=False):
+    """(schemas, fingerprint) of a saved connection, for memoized prompt renderings and retrieval indexes"""
+    snapshot = get_schema_snapshot(db_connection, force_refresh)
+    schemas = snapshot_schemas(db_connection, snapshot)
+    return schemas, snapshot_fingerprint(db_connection, snapshot, schemas)
+
+
+def get_notebook_schemas(notebook, force_refresh=False):
+    """Schemas for a notebook: cached for saved connections, introspected live otherwise"""
+    if notebook.database_connection:
+        return get_connection_schemas(notebook.database_connection, force_refresh)
+    connection_info = notebook.get_connection_info()
+    if not connection_info:
+        return None
+    return get_database_schema_info(connection_info)
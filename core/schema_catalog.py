@@ -0,0 +1,129 @@
+"""
+Indexed schema catalogs for the lazy schema explorer API
+
+The explorer asks for one level at a time: the list of schemas, a page of one
+schema's tables, then the columns of one table. Each level is answered from a
+SchemaCatalog built once per schema snapshot version (or, for notebooks without a
+saved connection, once per schema_cache_max_age) and kept in memory by the worker,
+so a request only serializes the slice it returns.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from .db_config import get_config
+from .db_handlers import get_connection_fingerprint, get_database_schema_info
+from .row_counts import apply_exact_row_counts
+from .schema_cache import get_schema_snapshot
+
+
+class SchemaCatalog:
+    """
+    Read-only view of a schema list with per-schema and per-table lookups
+
+    index_key identifies the connection across versions and token the schema
+    version, so derived structures such as the search index can be updated in place.
+    """
+
+    def __init__(self, schemas, connection_info, index_key, token, version=None, captured_at=None,
+                 connection_id=None):
+        self.schemas = sorted(schemas, key=lambda schema: schema['name'])
+        self.connection_info = connection_info
+        self.connection_id = connection_id  # Saved connection, which has column profiles
+        self.index_key = index_key
+        self.token = token
+        self.version = version
+        self.captured_at = captured_at
+        self.built_at = time.time()
+        self._schemas = OrderedDict(
+            (schema['name'], OrderedDict((table['name'], table) for table in schema['tables']))
+            for schema in self.schemas
+        )
+
+    def list_schemas(self):
+        """Schema names with table and view counts"""
+        return [{
+            'name': name,
+            'table_count': sum(1 for table in tables.values() if table['type'] == 'table'),
+            'view_count': sum(1 for table in tables.values() if table['type'] == 'view'),
+        } for name, tables in self._schemas.items()]
+
+    def has_schema(self, schema_name):
+        return schema_name in self._schemas
+
+    def list_tables(self, schema_name, name_filter='', offset=0, limit=None):
+        """
+        Return (total, tables) for a page of a schema's tables whose name contains
+        name_filter, without their columns
+        """
+        tables = self._schemas.get(schema_name, {}).values()
+        if name_filter:
+            needle = name_filter.lower()
+            tables = [table for table in tables if needle in table['name'].lower()]
+        else:
+            tables = list(tables)
+        end = None if limit is None else offset + limit
+        page = [{
+            'name': table['name'],
+            'type': table['type'],
+            'rows': table.get('rows', 0),
+            'column_count': len(table.get('columns', [])),
+        } for table in tables[offset:end]]
+        # Exact counts change independently of the snapshot
+        apply_exact_row_counts(self.connection_info, [{'name': schema_name, 'tables': page}])
+        return len(tables), page
+
+    def get_table(self, schema_name, table_name):
+        return self._schemas.get(schema_name, {}).get(table_name)
+
+
+# Catalogs kept per worker, least recently used first
+_catalogs = OrderedDict()
+_catalogs_lock = Lock()
+
+
+def _cached_catalog(key, build, max_age=None):
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is not None and (max_age is None or time.time() - catalog.built_at < max_age):
+            _catalogs.move_to_end(key)
+            return catalog
+
+    catalog = build()
+    with _catalogs_lock:
+        _catalogs[key] = catalog
+        _catalogs.move_to_end(key)
+        while len(_catalogs) > get_config()['schema_catalog_max_catalogs']:
+            _catalogs.popitem(last=False)
+    return catalog
+
+
+def get_connection_catalog(db_connection, force_refresh=False):
+    """Catalog of a saved connection's current schema snapshot"""
+    snapshot = get_schema_snapshot(db_connection, force_refresh)
+    connection_info = db_connection.get_connection_config()
+    index_key = ('snapshot', db_connection.id)
+    token = (snapshot.version, snapshot.fingerprint)
+    return _cached_catalog(index_key + token, lambda: SchemaCatalog(
+        snapshot.schema, connection_info, index_key, token,
+        version=snapshot.version, captured_at=snapshot.captured_at, connection_id=db_connection.id
+    ))
+
+
+def get_live_catalog(connection_info, force_refresh=False):
+    """Catalog of a connection without a saved DatabaseConnection, introspected at most once per schema_cache_max_age"""
+    key = ('live', get_connection_fingerprint(connection_info))
+    max_age = 0 if force_refresh else get_config()['schema_cache_max_age']
+    return _cached_catalog(key, lambda: SchemaCatalog(
+        get_database_schema_info(connection_info), connection_info, key, time.time()
+    ), max_age=max_age)
+
+
+def get_notebook_catalog(notebook, force_refresh=False):
+    """Catalog for a notebook's connection, or None when it has none"""
+    if notebook.database_connection:
+        return get_connection_catalog(notebook.database_connection, force_refresh)
+    connection_info = notebook.get_connection_info()
+    if not connection_info:
+        return None
+    return get_live_catalog(connection_info, force_refresh)
@@ -0,0 +1,232 @@
+"""
+Compact, token-budgeted schema rendering for LLM prompts
+
+Each table is rendered on one line with its typed columns:
+
+    sales.orders (~120000 rows): id int PK NN, customer_id int IX NN -> sales.customers.id, note text
+
+Declared foreign keys are kept at every level: a single-column key is shown on
+its column, a composite one after the columns.
+
+Columns with sampled statistics get a short hint: their few values, or their
+range, and their share of nulls (status varchar {paid|open|void}, total decimal
+[0.5..980.0, 12% null]).
+
+When the rendering exceeds the token budget it degrades step by step: column
+statistics are dropped first, then row counts, then nullable flags, then the
+least relevant tables. Token counts come from tiktoken when it is installed and
+fall back to an estimate. Renderings are memoized per schema fingerprint,
+dialect, budget and relevance; saved connections pass their snapshot's
+fingerprint so the schemas are not hashed on every call.
+"""
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+# Optional: exact token counts for budgets
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# tiktoken encoding used to measure prompts
+TOKEN_ENCODING = 'cl100k_base'
+
+# Renderings kept per worker
+RENDER_CACHE_SIZE = 32
+
+_KEY_FLAGS = {'PRI': 'PK', 'UNI': 'UQ', 'MUL': 'IX'}
+
+# Columns with at most this many distinct values list them instead of a range
+MAX_LISTED_VALUES = 10
+
+# Longest value shown in a column hint
+MAX_HINT_VALUE_LENGTH = 24
+
+_DIALECT_NOTES = {
+    'postgresql': (
+        'PostgreSQL: qualify tables as schema.table; double-quote identifiers with '
+        'upper case, spaces or special characters (e.g. "Order_id").'
+    ),
+    'redshift': (
+        'Redshift: qualify tables as schema.table; double-quote case-sensitive identifiers.'
+    ),
+    'mysql': (
+        'MySQL: backtick-quote identifiers with spaces, special characters or reserved words; '
+        'tables of other databases are referenced as database.table.'
+    ),
+}
+
+_encoding = None
+_encoding_failed = False
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and TIKTOKEN_AVAILABLE and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            # The encoding file is downloaded on first use and may be unreachable
+            _encoding_failed = True
+            logger.warning(f"tiktoken encoding unavailable, estimating schema tokens: {e}")
+    return _encoding
+
+
+def count_tokens(texts):
+    """Token counts of a list of strings"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return [len(text) // 4 + 1 for text in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def schemas_fingerprint(schemas):
+    return hashlib.sha256(json.dumps(schemas, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _reference(schema_name, references, qualify):
+    table = references['table']
+    ref_schema = references.get('schema') or schema_name
+    return f"{ref_schema}.{table}" if qualify or ref_schema != schema_name else table
+
+
+def _hint_value(value):
+    text = str(value)
+    return text if len(text) <= MAX_HINT_VALUE_LENGTH else text[:MAX_HINT_VALUE_LENGTH] + '...'
+
+
+def _profile_hint(profile):
+    """' {a|b}' for few values or ' [min..max]', with the share of nulls when there are any"""
+    parts = []
+    top_values = profile.get('top_values')
+    if top_values and profile.get('distinct', 0) <= min(MAX_LISTED_VALUES, len(top_values)):
+        values = '|'.join(_hint_value(entry['value']) for entry in top_values)
+        listed = f" {{{values}}}"
+    else:
+        listed = ''
+        if profile.get('min') is not None:
+            parts.append(f"{_hint_value(profile['min'])}..{_hint_value(profile['max'])}")
+    null_rate = profile.get('null_rate') or 0
+    if null_rate >= 0.01:
+        parts.append(f"{round(null_rate * 100)}% null")
+    return listed + (f" [{', '.join(parts)}]" if parts else '')
+
+
+def _render_table(schema_name, table, qualify, rows=True, nullable=True, profiles=True):
+    name = f"{schema_name}.{table['name']}" if qualify else table['name']
+    header = name if table['type'] == 'table' else f"{name} [{table['type']}]"
+    if rows and table.get('rows'):
+        header += f" (~{table['rows']} rows)"
+
+    column_references = {}
+    composite = []
+    for foreign_key in table.get('foreign_keys') or []:
+        target = _reference(schema_name, foreign_key['references'], qualify)
+        ref_columns = foreign_key['references']['columns']
+        if len(foreign_key['columns']) == 1:
+            column_references[foreign_key['columns'][0]] = f"{target}.{ref_columns[0]}"
+        else:
+            composite.append(f"({', '.join(foreign_key['columns'])}) -> {target}({', '.join(ref_columns)})")
+
+    columns = []
+    for column in table.get('columns') or []:
+        text = f"{column['name']} {column['type']}"
+        flag = _KEY_FLAGS.get(column.get('key'))
+        if flag:
+            text += f" {flag}"
+        if nullable and column.get('nullable') == 'NO':
+            text += " NN"
+        if profiles and column.get('profile'):
+            text += _profile_hint(column['profile'])
+        if column['name'] in column_references:
+            text += f" -> {column_references[column['name']]}"
+        columns.append(text)
+    line = f"{header}: {', '.join(columns) if columns else '(no column information)'}"
+    if composite:
+        line += f"; FK {'; FK '.join(composite)}"
+    return line
+
+
+def _preamble(dialect):
+    lines = ["Tables, one per line: name (~estimated rows): column type [PK primary key, UQ unique, IX indexed, "
+             "NN not null, -> foreign key to table.column] {sampled values} [sampled range, % null]"]
+    note = _DIALECT_NOTES.get(dialect)
+    if note:
+        lines.append(note)
+    return lines
+
+
+def _fit(schemas, dialect, token_budget, relevance):
+    """Return (text, level) for the richest rendering that fits the budget"""
+    qualify = len(schemas) > 1 or any(schema['name'] != 'main' for schema in schemas)
+    tables = [(schema['name'], table) for schema in schemas for table in schema['tables']]
+    preamble = _preamble(dialect)
+    preamble_tokens = sum(count_tokens(preamble))
+
+    # Richest first: everything, without column statistics, without row counts, without nullable flags
+    for level, options in enumerate(({'profiles': True, 'rows': True, 'nullable': True},
+                                     {'profiles': False, 'rows': True, 'nullable': True},
+                                     {'profiles': False, 'rows': False, 'nullable': True},
+                                     {'profiles': False, 'rows': False, 'nullable': False})):
+        lines = [_render_table(schema_name, table, qualify, **options) for schema_name, table in tables]
+        counts = count_tokens(lines) if token_budget else []
+        if not token_budget or preamble_tokens + sum(counts) <= token_budget:
+            return '\n'.join(preamble + lines), level
+
+    # Keep the most relevant tables that fit, then base tables with the most rows
+    def rank(position):
+        schema_name, table = tables[position]
+        score = relevance.get((schema_name, table['name']), 0.0) if relevance else 0.0
+        return (-score, table['type'] != 'table', -(table.get('rows') or 0), position)
+
+    remaining = token_budget - preamble_tokens - 20  # room for the omission note
+    kept = []
+    for position in sorted(range(len(tables)), key=rank):
+        if counts[position] <= remaining:
+            kept.append(position)
+            remaining -= counts[position]
+    omitted = len(tables) - len(kept)
+    lines = [lines[position] for position in sorted(kept)]
+    lines.append(f"({omitted} less relevant table(s) omitted to fit the context budget)")
+    return '\n'.join(preamble + lines), 4
+
+
+def render_schema_for_llm(schemas, dialect=None, token_budget=None, relevance=None, fingerprint=None):
+    """
+    Render schemas compactly for an LLM prompt within token_budget tokens
+
+    relevance optionally maps (schema, table) to a score; when tables have to be
+    dropped, the lowest scored go first. fingerprint identifies the schemas for
+    memoization and is computed when not given.
+    """
+    if not schemas:
+        return "No schema information available"
+    dialect = (dialect or '').lower()
+    if fingerprint is None:
+        fingerprint = schemas_fingerprint(schemas)
+    relevance_key = hashlib.sha256(
+        json.dumps(sorted((list(key), score) for key, score in (relevance or {}).items())).encode()
+    ).hexdigest() if relevance else None
+    key = (fingerprint, dialect, token_budget, relevance_key)
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    text, level = _fit(schemas, dialect, token_budget, relevance)
+    if level:
+        logger.info(f"Schema rendering degraded to level {level} to fit {token_budget} tokens")
+    with _cache_lock:
+        _cache[key] = text
+        while len(_cache) > RENDER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return text
@@ -0,0 +1,307 @@
+"""
+Query-relevance table retrieval for text-to-SQL prompts
+
+Large schemas don't fit in every LLM call, so the agent only sends the tables
+most relevant to the user's request. Each table is a document made of its name,
+its columns' names, its comments and its columns' sampled values, with the
+table's own name weighted highest; documents are ranked against the request with
+BM25. When schema_retrieval_embedding_model names a sentence-transformers model
+installed locally, its cosine ranking is fused with the BM25 ranking by
+reciprocal rank. The top tables are then joined by their foreign-key neighbours,
+so the tables needed for a join come along.
+
+Indexes are kept per schema fingerprint, so one schema version is indexed once
+per worker.
+"""
+import logging
+import math
+from collections import Counter, OrderedDict
+from threading import Lock
+
+from .db_config import get_config
+from .schema_prompt import schemas_fingerprint
+from .schema_search import tokenize
+
+# Optional: local embeddings fused with the lexical ranking
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Weight of a token by where it occurs in a table's document
+FIELD_WEIGHTS = {
+    'table': 3.0,
+    'schema': 1.0,
+    'column': 1.0,
+    'comment': 1.0,
+    'value': 0.5,
+}
+
+# Reciprocal rank fusion constant
+RRF_K = 60
+
+# Share of a seed table's score given to its foreign-key neighbours
+NEIGHBOR_DECAY = 0.5
+
+# Indexes kept per worker
+RETRIEVER_CACHE_SIZE = 8
+
+# Words of a request that don't point at any table
+STOPWORDS = frozenset("""
+a about all an and any are as at be by can did do does each every find for from get give had has
+have how i in into is it its list me much my of on or our per please query return show sql than
+that the their them then there these this those to top total us was we were what when where which
+who with would you your
+""".split())
+
+
+def normalize_token(token):
+    """Lowercase singular form of a token, so "categories" finds "category" and "orders" finds "order\""""
+    token = token.lower()
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 4 and token.endswith(('sses', 'xes', 'ches', 'shes')):
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def query_terms(text):
+    return [normalize_token(token) for token in tokenize(text) if token.lower() not in STOPWORDS]
+
+
+def _table_document(schema_name, table):
+    """Weighted term frequencies of one table"""
+    terms = Counter()
+
+    def add(text, field):
+        for token in tokenize(text):
+            terms[normalize_token(token)] += FIELD_WEIGHTS[field]
+
+    add(table['name'], 'table')
+    add(schema_name, 'schema')
+    add(table.get('comment'), 'comment')
+    for column in table.get('columns') or []:
+        add(column['name'], 'column')
+        add(column.get('comment'), 'comment')
+        for entry in (column.get('profile') or {}).get('top_values') or []:
+            if isinstance(entry.get('value'), str):
+                add(entry['value'], 'value')
+    return terms
+
+
+def _embedding_text(schema_name, table):
+    columns = ', '.join(column['name'] for column in table.get('columns') or [])
+    text = f"{schema_name}.{table['name']}: {columns}"
+    return f"{text}. {table['comment']}" if table.get('comment') else text
+
+
+_models = {}
+_models_lock = Lock()
+
+
+def _get_embedding_model(name):
+    with _models_lock:
+        if name not in _models:
+            try:
+                _models[name] = SentenceTransformer(name)
+            except Exception as e:
+                logger.warning(f"Embedding model {name} unavailable, ranking tables lexically: {e}")
+                _models[name] = None
+        return _models[name]
+
+
+class SchemaRetriever:
+    """BM25 index, optional embeddings and the foreign-key graph of one schema version"""
+
+    def __init__(self, schemas, embedding_model=None):
+        self.tables = []            # (schema, table name) per document id
+        self.rows = []              # estimated rows per document id
+        self._postings = {}         # term -> [(document id, weighted frequency)]
+        self._lengths = []
+        self._neighbors = {}        # (schema, table) -> foreign-key neighbours, referenced tables first
+        self._embeddings = None
+        self._model = None
+
+        texts = []
+        for schema in schemas:
+            for table in schema['tables']:
+                document_id = len(self.tables)
+                self.tables.append((schema['name'], table['name']))
+                self.rows.append(table.get('rows') or 0)
+                terms = _table_document(schema['name'], table)
+                self._lengths.append(sum(terms.values()))
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, []).append((document_id, frequency))
+                texts.append(_embedding_text(schema['name'], table))
+                self._add_foreign_keys(schema['name'], table)
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+        if embedding_model and SENTENCE_TRANSFORMERS_AVAILABLE and texts:
+            self._model = _get_embedding_model(embedding_model)
+            if self._model is not None:
+                self._embeddings = self._model.encode(texts, normalize_embeddings=True)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def _add_foreign_keys(self, schema_name, table):
+        source = (schema_name, table['name'])
+        for foreign_key in table.get('foreign_keys') or []:
+            references = foreign_key['references']
+            target = (references.get('schema') or schema_name, references['table'])
+            if target == source:
+                continue
+            self._neighbors.setdefault(source, []).insert(0, target)
+            self._neighbors.setdefault(target, []).append(source)
+
+    def bm25(self, text):
+        """{document id: BM25 score} for a text"""
+        scores = {}
+        total = len(self.tables)
+        for term in set(query_terms(text)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for document_id, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[document_id] / self._average_length)
+                scores[document_id] = scores.get(document_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+    def _semantic(self, text, limit):
+        """{document id: cosine similarity} of the limit closest tables"""
+        query = self._model.encode([text], normalize_embeddings=True)[0]
+        similarities = self._embeddings @ query
+        top = similarities.argsort()[::-1][:limit]
+        return {int(document_id): float(similarities[document_id]) for document_id in top}
+
+    def rank(self, text, limit):
+        """[(document id, score)] best first"""
+        lexical = self.bm25(text)
+        if self._embeddings is None:
+            ranked = sorted(lexical.items(), key=lambda item: (-item[1], item[0]))
+            return ranked[:limit]
+
+        # Reciprocal rank fusion of the lexical and semantic rankings
+        fused = {}
+        for ranking in (lexical, self._semantic(text, max(limit * 4, 50))):
+            ordered = sorted(ranking, key=lambda document_id: -ranking[document_id])
+            for position, document_id in enumerate(ordered):
+                fused[document_id] = fused.get(document_id, 0.0) + 1.0 / (RRF_K + position + 1)
+        return sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def retrieve(self, text, top_k, max_neighbors=0):
+        """
+        The top_k tables for a request as dicts (schema, table, score, reason), followed
+        by up to max_neighbors foreign-key neighbours of them; the largest base
+        tables stand in when nothing in the request matches
+        """
+        ranked = self.rank(text, top_k)
+        if ranked:
+            selected = [{'schema': self.tables[document_id][0], 'table': self.tables[document_id][1],
+                         'score': round(score, 4), 'reason': 'match'} for document_id, score in ranked]
+        else:
+            largest = sorted(range(len(self.tables)), key=lambda document_id: -self.rows[document_id])[:top_k]
+            selected = [{'schema': self.tables[document_id][0], 'table': self.tables[document_id][1],
+                         'score': 0.0, 'reason': 'size'} for document_id in largest]
+
+        seen = {(entry['schema'], entry['table']) for entry in selected}
+        known = set(self.tables)
+        neighbors = []
+        for entry in list(selected):
+            for neighbor in self._neighbors.get((entry['schema'], entry['table']), ()):
+                if len(neighbors) >= max_neighbors:
+                    break
+                if neighbor in seen or neighbor not in known:
+                    continue
+                seen.add(neighbor)
+                neighbors.append({'schema': neighbor[0], 'table': neighbor[1],
+                                  'score': round(entry['score'] * NEIGHBOR_DECAY, 4), 'reason': 'foreign_key'})
+        return selected + neighbors
+
+
+_retrievers = OrderedDict()
+_retrievers_lock = Lock()
+
+
+def get_schema_retriever(schemas, fingerprint=None):
+    """The retriever for a schema list, built once per fingerprint and embedding model"""
+    model = get_config()['schema_retrieval_embedding_model'] or None
+    key = (fingerprint or schemas_fingerprint(schemas), model)
+    with _retrievers_lock:
+        retriever = _retrievers.get(key)
+        if retriever is not None:
+            _retrievers.move_to_end(key)
+            return retriever
+
+    retriever = SchemaRetriever(schemas, model)
+    with _retrievers_lock:
+        _retrievers[key] = retriever
+        while len(_retrievers) > RETRIEVER_CACHE_SIZE:
+            _retrievers.popitem(last=False)
+    return retriever
+
+
+def count_tables(schemas):
+    return sum(len(schema['tables']) for schema in schemas)
+
+
+def select_relevant_tables(schemas, question, top_k=None, fingerprint=None):
+    """
+    Tables relevant to a question, or None when the schemas are small enough
+    (schema_retrieval_min_tables) to be sent whole
+    """
+    config = get_config()
+    if count_tables(schemas) <= config['schema_retrieval_min_tables']:
+        return None
+    retriever = get_schema_retriever(schemas, fingerprint)
+    return retriever.retrieve(question, top_k or config['schema_retrieval_top_k'],
+                              config['schema_retrieval_max_neighbors'])
+
+
+def prune_schemas(schemas, tables):
+    """Schemas restricted to the given (schema, table) dicts, in their original order"""
+    wanted = {(entry['schema'], entry['table']) for entry in tables}
+    pruned = []
+    for schema in schemas:
+        kept = [table for table in schema['tables'] if (schema['name'], table['name']) in wanted]
+        if kept:
+            pruned.append(dict(schema, tables=kept))
+    return pruned
+
+
+def find_requested_tables(schemas, names, exclude=(), limit=10):
+    """
+    Tables named in an agent's request ("schema.table" or "table"); names that match
+    no table are searched for as keywords. Tables in exclude are skipped
+    """
+    by_name = {}
+    for schema in schemas:
+        for table in schema['tables']:
+            by_name.setdefault(table['name'].lower(), []).append((schema['name'], table['name']))
+            by_name.setdefault(f"{schema['name']}.{table['name']}".lower(), []).append((schema['name'], table['name']))
+
+    excluded = set(exclude)
+    found = []
+    keywords = []
+    for name in names:
+        matches = by_name.get(name.strip().strip('`"').lower())
+        if matches:
+            found.extend(match for match in matches if match not in found and match not in excluded)
+        else:
+            keywords.append(name)
+    if keywords:
+        for entry in get_schema_retriever(schemas).retrieve(' '.join(keywords), limit):
+            position = (entry['schema'], entry['table'])
+            if entry['reason'] == 'match' and position not in found and position not in excluded:
+                found.append(position)
+    return [{'schema': schema, 'table': table} for schema, table in found[:limit]]
@@ -0,0 +1,310 @@
+"""
+Server-side search over schema, table and column names
+
+Each connection's catalog gets a SchemaSearchIndex built from its schema snapshot.
+Names are indexed once per distinct name (a column called "id" in ten thousand
+tables is one name), with an inverted index of identifier tokens (snake_case and
+camelCase parts), sorted token and name lists for prefix lookups and a trigram
+index for substrings and misspellings; comments get their own token index.
+
+A query is answered in tiers, best first: exact name, name prefix, all tokens,
+token prefixes, comments, then trigram similarity. A tier is only computed when
+the earlier ones did not fill the requested number of matches, and within a tier
+schemas, tables and views come before columns, shorter names first. Indexes are
+kept per connection and updated schema by schema when a new snapshot version
+arrives, so only changed schemas are re-indexed.
+"""
+import bisect
+import hashlib
+import json
+import re
+from collections import Counter, OrderedDict
+from threading import Lock
+
+from .db_config import get_config
+
+# Identifier parts: "orderLineItems2024" -> order, line, items, 2024
+_TOKEN_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+# Token or name expansions considered per prefix
+MAX_PREFIX_TERMS = 200
+
+# Share of a query's trigrams a name must contain to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+# Score reported for each tier; objects get OBJECT_BONUS on top of it
+TIER_SCORES = {
+    'name': 10.0,
+    'name_prefix': 8.0,
+    'tokens': 6.0,
+    'token_prefix': 4.0,
+    'comment': 2.0,
+    'fuzzy': 1.0,
+}
+OBJECT_BONUS = 0.5
+
+
+def tokenize(text):
+    """Lowercase identifier and word tokens of a name or comment"""
+    if not text:
+        return []
+    return [token.lower() for token in _TOKEN_PATTERN.findall(str(text))]
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Entry:
+    """One indexed schema, table, view or column"""
+
+    __slots__ = ('kind', 'schema', 'table', 'column', 'data_type', 'comment', 'name')
+
+    def __init__(self, kind, schema, table=None, column=None, data_type=None, comment=None):
+        self.kind = kind
+        self.schema = schema
+        self.table = table
+        self.column = column
+        self.data_type = data_type
+        self.comment = comment
+        self.name = column or table or schema
+
+    def to_dict(self, score, match):
+        result = {'kind': self.kind, 'schema': self.schema, 'score': score, 'match': match}
+        if self.table is not None:
+            result['table'] = self.table
+        if self.column is not None:
+            result['column'] = self.column
+            result['type'] = self.data_type
+        if self.comment:
+            result['comment'] = self.comment
+        return result
+
+
+def _schema_entries(schema):
+    yield _Entry('schema', schema['name'])
+    for table in schema['tables']:
+        yield _Entry('view' if table['type'] == 'view' else 'table', schema['name'], table['name'],
+                     comment=table.get('comment'))
+        for column in table.get('columns', []):
+            yield _Entry('column', schema['name'], table['name'], column['name'],
+                         column.get('type'), column.get('comment'))
+
+
+def _schema_hash(schema):
+    return hashlib.sha1(json.dumps(schema, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _add_posting(postings, key, value):
+    postings.setdefault(key, set()).add(value)
+
+
+def _remove_posting(postings, key, value):
+    values = postings.get(key)
+    if values is not None:
+        values.discard(value)
+        if not values:
+            del postings[key]
+
+
+def _expand(sorted_keys, prefix):
+    """Keys of a sorted list starting with prefix, at most MAX_PREFIX_TERMS of them"""
+    start = bisect.bisect_left(sorted_keys, prefix)
+    matches = []
+    for key in sorted_keys[start:start + MAX_PREFIX_TERMS]:
+        if not key.startswith(prefix):
+            break
+        matches.append(key)
+    return matches
+
+
+def _intersect(sets):
+    sets = sorted(sets, key=len)
+    if not sets:
+        return set()
+    result = set(sets[0])
+    for other in sets[1:]:
+        result &= other
+    return result
+
+
+class SchemaSearchIndex:
+    """Token, prefix and trigram index over one connection's schemas"""
+
+    def __init__(self):
+        self._entries = {}          # entry id -> _Entry
+        self._by_schema = {}        # schema name -> entry ids
+        self._schema_hashes = {}    # schema name -> hash of the indexed schema
+        self._objects = {}          # lowercase name -> schema, table and view entry ids
+        self._columns = {}          # lowercase name -> column entry ids
+        self._name_tokens = {}      # token -> lowercase names
+        self._name_trigrams = {}    # trigram -> lowercase names
+        self._comment_tokens = {}   # token -> entry ids with the token in their comment
+        self._sorted = None         # (names, name tokens, comment tokens), rebuilt after updates
+        self._next_id = 0
+        self._lock = Lock()
+        self.version = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _add_entry(self, entry):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self._by_schema.setdefault(entry.schema, set()).add(entry_id)
+
+        name = entry.name.lower()
+        if name not in self._objects and name not in self._columns:
+            for token in tokenize(entry.name):
+                _add_posting(self._name_tokens, token, name)
+            for gram in trigrams(name):
+                _add_posting(self._name_trigrams, gram, name)
+        _add_posting(self._columns if entry.kind == 'column' else self._objects, name, entry_id)
+        for token in tokenize(entry.comment):
+            _add_posting(self._comment_tokens, token, entry_id)
+
+    def _remove_entry(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        name = entry.name.lower()
+        _remove_posting(self._columns if entry.kind == 'column' else self._objects, name, entry_id)
+        if name not in self._objects and name not in self._columns:
+            for token in tokenize(entry.name):
+                _remove_posting(self._name_tokens, token, name)
+            for gram in trigrams(name):
+                _remove_posting(self._name_trigrams, gram, name)
+        for token in tokenize(entry.comment):
+            _remove_posting(self._comment_tokens, token, entry_id)
+
+    def update(self, schemas, version=None):
+        """Re-index only the schemas that were added, changed or dropped; returns their names"""
+        with self._lock:
+            incoming = {schema['name']: schema for schema in schemas}
+            changed = {name for name in self._schema_hashes if name not in incoming}
+            hashes = {}
+            for name, schema in incoming.items():
+                hashes[name] = _schema_hash(schema)
+                if self._schema_hashes.get(name) != hashes[name]:
+                    changed.add(name)
+
+            for name in changed:
+                for entry_id in self._by_schema.pop(name, ()):
+                    self._remove_entry(entry_id)
+                self._schema_hashes.pop(name, None)
+                if name in incoming:
+                    for entry in _schema_entries(incoming[name]):
+                        self._add_entry(entry)
+                    self._schema_hashes[name] = hashes[name]
+            if changed:
+                self._sorted = None
+            self.version = version
+            return changed
+
+    def _sorted_keys(self):
+        if self._sorted is None:
+            self._sorted = (
+                sorted(set(self._objects) | set(self._columns)),
+                sorted(self._name_tokens),
+                sorted(self._comment_tokens),
+            )
+        return self._sorted
+
+    def _token_names(self, tokens, sorted_tokens, prefix):
+        """Names containing every token, or a token starting with each one when prefix is set"""
+        sets = []
+        for token in tokens:
+            if prefix:
+                names = set()
+                for match in _expand(sorted_tokens, token):
+                    names |= self._name_tokens[match]
+            else:
+                names = self._name_tokens.get(token, set())
+            if not names:
+                return set()
+            sets.append(names)
+        return _intersect(sets)
+
+    def _tiers(self, query, tokens, fuzzy):
+        """Yield (tier, matching names or None, matching entry ids or None), best tier first"""
+        sorted_names, sorted_tokens, sorted_comment_tokens = self._sorted_keys()
+        if query in self._objects or query in self._columns:
+            yield 'name', [query], None
+        yield 'name_prefix', _expand(sorted_names, query), None
+        yield 'tokens', self._token_names(tokens, sorted_tokens, prefix=False), None
+        yield 'token_prefix', self._token_names(tokens, sorted_tokens, prefix=True), None
+
+        comment_sets = []
+        for token in tokens:
+            ids = set()
+            for match in _expand(sorted_comment_tokens, token):
+                ids |= self._comment_tokens[match]
+            comment_sets.append(ids)
+        yield 'comment', None, _intersect(comment_sets)
+
+        query_grams = trigrams(query)
+        if fuzzy and query_grams:
+            hits = Counter()
+            for gram in query_grams:
+                hits.update(self._name_trigrams.get(gram, ()))
+            needed = max(1, int(len(query_grams) * FUZZY_THRESHOLD))
+            names = [name for name, count in hits.items() if count >= needed]
+            names.sort(key=lambda name: (-hits[name], len(name), name))
+            yield 'fuzzy', names, None
+
+    def search(self, query, limit=20, kinds=None, schema=None, fuzzy=True):
+        """
+        Ranked matches for a query as dicts: kind, schema, table, column, type,
+        comment, score and the tier that matched
+        """
+        raw_query = (query or '').strip()
+        query = raw_query.lower()
+        if not query or limit <= 0:
+            return []
+        tokens = tokenize(raw_query) or [query]
+
+        def wanted(entry):
+            return (not kinds or entry.kind in kinds) and (not schema or entry.schema == schema)
+
+        matches = []
+        seen = set()
+        with self._lock:
+            for tier, names, entry_ids in self._tiers(query, tokens, fuzzy):
+                if names is not None:
+                    if tier != 'fuzzy':
+                        names = sorted(names, key=lambda name: (len(name), name))
+                    # Schemas, tables and views before columns within a tier
+                    entry_ids = (entry_id for postings in (self._objects, self._columns)
+                                 for name in names for entry_id in sorted(postings.get(name, ())))
+                else:
+                    entry_ids = sorted(entry_ids, key=lambda entry_id: self._entries[entry_id].kind == 'column')
+                for entry_id in entry_ids:
+                    entry = self._entries[entry_id]
+                    if entry_id in seen or not wanted(entry):
+                        continue
+                    seen.add(entry_id)
+                    score = TIER_SCORES[tier] + (OBJECT_BONUS if entry.kind != 'column' else 0)
+                    matches.append(entry.to_dict(score, tier))
+                    if len(matches) >= limit:
+                        return matches
+        return matches
+
+
+# Indexes kept per worker, keyed by catalog identity, least recently used first
+_indexes = OrderedDict()
+_indexes_lock = Lock()
+
+
+def get_search_index(catalog):
+    """The search index for a catalog's connection, brought up to the catalog's version"""
+    with _indexes_lock:
+        index = _indexes.get(catalog.index_key)
+        if index is None:
+            index = _indexes[catalog.index_key] = SchemaSearchIndex()
+        _indexes.move_to_end(catalog.index_key)
+        while len(_indexes) > get_config()['schema_catalog_max_catalogs']:
+            _indexes.popitem(last=False)
+
+    if index.version != catalog.token:
+        index.update(catalog.schemas, catalog.token)
+    return index
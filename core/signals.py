@@ -0,0 +1,35 @@
+"""
+Signal handlers that keep per-worker connection resources in sync with DatabaseConnection rows
+"""
+import logging
+
+from django.db.models.signals import pre_save, post_delete
+from django.dispatch import receiver
+
+from .models import DatabaseConnection
+from .db_handlers import release_connection_resources
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=DatabaseConnection)
+def release_resources_for_changed_connection(sender, instance, **kwargs):
+    """Dispose pools and engines built from a connection's previous settings"""
+    if not instance.pk:
+        return
+    previous = DatabaseConnection.objects.filter(pk=instance.pk).first()
+    if previous is None:
+        return
+    try:
+        release_connection_resources(previous.get_connection_config())
+    except Exception as e:
+        logger.warning(f"Could not release resources for connection {instance.pk}: {e}")
+
+
+@receiver(post_delete, sender=DatabaseConnection)
+def release_resources_for_deleted_connection(sender, instance, **kwargs):
+    """Dispose pools and engines for a deleted connection"""
+    try:
+        release_connection_resources(instance.get_connection_config())
+    except Exception as e:
+        logger.warning(f"Could not release resources for deleted connection {instance.pk}: {e}")
@@ -0,0 +1,299 @@
+"""
+Single-flight coalescing of identical concurrent work
+
+When several callers ask for the same schema or run the same read-only query on
+the same connection at the same time, only one of them (the leader) executes it
+and the others receive a copy of its result.
+
+Within a worker, callers in other threads or coroutines wait on the leader's
+Future. Across workers on the machine, the leaders of each worker take an flock
+on a lock file per key: the first one executes and leaves its outcome in a
+Fernet-encrypted JSON file next to the lock, and the workers that waited on the
+lock read that file instead of executing again. Results too large to share this
+way are executed by every worker, as before.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from threading import Lock
+
+from cryptography.fernet import InvalidToken
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Optional: cross-worker coalescing relies on POSIX file locks
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from .db_config import get_config
+from .encryption import get_fernet
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_DIR = os.path.join(tempfile.gettempdir(), 'rca_single_flight')
+
+# Seconds between polls of a lock held by another worker
+LOCK_POLL_INTERVAL = 0.05
+
+# Shared outcome files older than this are removed by the periodic sweep
+SHARED_FILE_MAX_AGE = 600
+
+# Seconds between sweeps of old shared outcome files in one worker
+SWEEP_INTERVAL = 60
+
+
+class _NotShared(Exception):
+    """The leader failed in a way its followers should not inherit; they execute themselves"""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key within and across workers"""
+
+    def __init__(self, directory=SINGLE_FLIGHT_DIR):
+        self._directory = directory
+        self._calls = {}  # key -> Future of the leader running in this worker
+        self._lock = Lock()
+        self._fernet = None
+        self._last_sweep = 0
+        self.stats = {'executions': 0, 'shared': 0, 'shared_across_workers': 0}
+
+    def _claim(self, key):
+        """Return (future, is_leader) for a key"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats['shared'] += 1
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, wait_timeout=None, share_error=None):
+        """
+        Return fn()'s result, or a copy of the result of an identical call already
+        in flight; share_error(e) decides whether followers get the leader's error
+        (the default) or execute themselves
+        """
+        future, leader = self._claim(key)
+        if not leader:
+            try:
+                return copy.deepcopy(future.result(timeout=wait_timeout))
+            except FutureTimeoutError:
+                logger.warning(f"Timed out waiting for a shared {key[0]} execution; executing it again")
+                return fn()
+            except _NotShared:
+                return self.do(key, fn, wait_timeout, share_error)
+
+        try:
+            result = self._run_exclusive(key, fn, wait_timeout, share_error)
+        except Exception as e:
+            shared = share_error is None or share_error(e)
+            self._settle(key, future, error=e if shared else _NotShared(str(e)))
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def do_async(self, key, coroutine_fn, wait_timeout=None, share_error=None):
+        """Async counterpart of do for coroutine functions; followers may be threads or coroutines"""
+        future, leader = self._claim(key)
+        if not leader:
+            try:
+                # Shielded so a follower timing out doesn't cancel the leader's Future
+                result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), wait_timeout)
+                return copy.deepcopy(result)
+            except asyncio.TimeoutError:
+                logger.warning(f"Timed out waiting for a shared {key[0]} execution; executing it again")
+                return await coroutine_fn()
+            except _NotShared:
+                return await self.do_async(key, coroutine_fn, wait_timeout, share_error)
+
+        try:
+            result = await self._run_exclusive_async(key, coroutine_fn, wait_timeout, share_error)
+        except Exception as e:
+            shared = share_error is None or share_error(e)
+            self._settle(key, future, error=e if shared else _NotShared(str(e)))
+            raise
+        self._settle(key, future, result)
+        return result
+
+    # Cross-worker coordination
+
+    def _open_lock(self, key):
+        """Return (lock file, shared outcome path), or (None, None) when files can't be used"""
+        if not FCNTL_AVAILABLE:
+            return None, None
+        path = os.path.join(self._directory, hashlib.sha256(repr(key).encode()).hexdigest())
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            return open(f"{path}.lock", 'a'), f"{path}.json"
+        except OSError as e:
+            logger.warning(f"Single-flight lock unavailable: {e}")
+            return None, None
+
+    @staticmethod
+    def _try_lock(lock_file):
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _get_fernet(self):
+        if self._fernet is None:
+            self._fernet = get_fernet()
+        return self._fernet
+
+    def _read_shared(self, path, since):
+        """The outcome another worker left after since, as (kind, value), or None"""
+        try:
+            with open(path, 'rb') as f:
+                record = json.loads(self._get_fernet().decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken):
+            return None
+        if record['written_at'] < since:
+            return None
+        return record['kind'], record.get('value')
+
+    def _write_shared(self, path, kind, value=None):
+        """Leave an outcome for workers waiting on the lock"""
+        try:
+            content = json.dumps({'written_at': time.time(), 'kind': kind, 'value': value}, cls=DjangoJSONEncoder)
+            if kind == 'result' and len(content) > get_config()['single_flight_max_shared_bytes']:
+                content = json.dumps({'written_at': time.time(), 'kind': 'unshared'})
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(self._get_fernet().encrypt(content.encode()))
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not share a single-flight outcome: {e}")
+        if time.time() - self._last_sweep > SWEEP_INTERVAL:
+            self.sweep()
+
+    def _outcome(self, shared):
+        """Result of an outcome left by another worker; None when this worker has to execute"""
+        kind, value = shared
+        if kind == 'error':
+            raise Exception(value)
+        if kind == 'result':
+            with self._lock:
+                self.stats['shared_across_workers'] += 1
+            return value
+        return None
+
+    def _execute_and_share(self, path, fn, share_error):
+        with self._lock:
+            self.stats['executions'] += 1
+        try:
+            result = fn()
+        except Exception as e:
+            if share_error is None or share_error(e):
+                self._write_shared(path, 'error', str(e))
+            raise
+        self._write_shared(path, 'result', result)
+        return result
+
+    def _run_exclusive(self, key, fn, wait_timeout, share_error):
+        lock_file, path = self._open_lock(key)
+        if lock_file is None:
+            with self._lock:
+                self.stats['executions'] += 1
+            return fn()
+
+        with lock_file:
+            waited_since = time.time()
+            acquired = self._try_lock(lock_file)
+            waited = not acquired
+            while not acquired:
+                if wait_timeout is not None and time.time() - waited_since > wait_timeout:
+                    logger.warning(f"Timed out waiting for another worker's {key[0]} execution; executing it again")
+                    return self._execute_and_share(path, fn, share_error)
+                time.sleep(LOCK_POLL_INTERVAL)
+                acquired = self._try_lock(lock_file)
+            try:
+                shared = self._read_shared(path, waited_since) if waited else None
+                if shared is not None:
+                    if shared[0] == 'unshared':
+                        # Too large to pass on; let every waiting worker execute at once
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+                        with self._lock:
+                            self.stats['executions'] += 1
+                        return fn()
+                    return self._outcome(shared)
+                return self._execute_and_share(path, fn, share_error)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def _run_exclusive_async(self, key, coroutine_fn, wait_timeout, share_error):
+        lock_file, path = self._open_lock(key)
+        if lock_file is None:
+            with self._lock:
+                self.stats['executions'] += 1
+            return await coroutine_fn()
+
+        with lock_file:
+            waited_since = time.time()
+            acquired = self._try_lock(lock_file)
+            waited = not acquired
+            while not acquired:
+                if wait_timeout is not None and time.time() - waited_since > wait_timeout:
+                    logger.warning(f"Timed out waiting for another worker's {key[0]} execution; executing it again")
+                    break
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                acquired = self._try_lock(lock_file)
+            try:
+                shared = self._read_shared(path, waited_since) if waited and acquired else None
+                if shared is not None and shared[0] != 'unshared':
+                    return self._outcome(shared)
+                if shared is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                with self._lock:
+                    self.stats['executions'] += 1
+                try:
+                    result = await coroutine_fn()
+                except Exception as e:
+                    if shared is None and (share_error is None or share_error(e)):
+                        self._write_shared(path, 'error', str(e))
+                    raise
+                if shared is None:
+                    self._write_shared(path, 'result', result)
+                return result
+            finally:
+                if acquired:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def sweep(self):
+        """Remove shared outcome files older than SHARED_FILE_MAX_AGE"""
+        self._last_sweep = time.time()
+        cutoff = self._last_sweep - SHARED_FILE_MAX_AGE
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self._directory, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls))
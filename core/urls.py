@@ -1,10 +1,18 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from . import views_async
 from . import views_oauth
 from . import views_graph
+from . import views_jobs
+from . import views_schema
 
 app_name = 'core'
 
+# Async views await the per-loop database pools when served through rca.asgi
+cell_views = views_async if settings.USE_ASYNC_VIEWS else views
+job_wait_view = views_async.api_wait_for_job if settings.USE_ASYNC_VIEWS else views_jobs.api_wait_for_job
+
 urlpatterns = [
     path('', views.home, name='home'),
     path('login/', views.login_view, name='login'),
@@ -41,10 +49,36 @@ urlpatterns += [
     path('api/notebooks/<uuid:notebook_uuid>/cells/<int:cell_id>/results/', views.api_get_cell_results, name='api_get_cell_results'),
     path('api/cells/<int:cell_id>/update/', views.api_update_cell, name='api_update_cell'),
     path('api/cells/<int:cell_id>/update-name/', views.api_update_cell_name, name='api_update_cell_name'),
-    path('api/cells/<int:cell_id>/execute/', views.api_execute_cell, name='api_execute_cell'),
+    path('api/cells/<int:cell_id>/execute/', cell_views.api_execute_cell, name='api_execute_cell'),
+    path('api/cells/<int:cell_id>/results/next-page/', views.api_fetch_cell_results_page, name='api_fetch_cell_results_page'),
+    path('api/cells/<int:cell_id>/results/close/', views.api_close_cell_results_cursor, name='api_close_cell_results_cursor'),
+    path('api/cells/<int:cell_id>/cancel/', views.api_cancel_cell, name='api_cancel_cell'),
+    path('api/running-queries/', views.api_running_queries, name='api_running_queries'),
+    path('api/jobs/', views_jobs.api_list_jobs, name='api_list_jobs'),
+    path('api/jobs/<uuid:job_uuid>/', views_jobs.api_get_job, name='api_get_job'),
+    path('api/jobs/<uuid:job_uuid>/wait/', job_wait_view, name='api_wait_for_job'),
+    path('api/jobs/<uuid:job_uuid>/result/', views_jobs.api_get_job_result, name='api_get_job_result'),
+    path('api/jobs/<uuid:job_uuid>/cancel/', views_jobs.api_cancel_job, name='api_cancel_job'),
     path('api/cells/<int:cell_id>/delete/', views.api_delete_cell, name='api_delete_cell'),
-    path('api/notebooks/<uuid:notebook_uuid>/schema/', views.api_get_database_schema, name='api_get_database_schema'),
-    path('api/database-schema/', views.api_get_database_schema, name='api_get_database_schema_no_notebook'),
+    path('api/notebooks/<uuid:notebook_uuid>/schema/', cell_views.api_get_database_schema, name='api_get_database_schema'),
+    path('api/database-schema/', cell_views.api_get_database_schema, name='api_get_database_schema_no_notebook'),
+    
+    # Lazy schema explorer endpoints
+    path('api/notebooks/<uuid:notebook_uuid>/schema/schemas/', views_schema.api_list_schemas, name='api_list_schemas'),
+    path('api/notebooks/<uuid:notebook_uuid>/schema/schemas/<str:schema_name>/tables/', views_schema.api_list_schema_tables, name='api_list_schema_tables'),
+    path('api/notebooks/<uuid:notebook_uuid>/schema/schemas/<str:schema_name>/tables/<str:table_name>/columns/', views_schema.api_get_table_columns, name='api_get_table_columns'),
+    path('api/notebooks/<uuid:notebook_uuid>/schema/search/', views_schema.api_search_schema, name='api_search_schema'),
+    path('api/database-schema/schemas/', views_schema.api_list_schemas, name='api_list_schemas_no_notebook'),
+    path('api/database-schema/schemas/<str:schema_name>/tables/', views_schema.api_list_schema_tables, name='api_list_schema_tables_no_notebook'),
+    path('api/database-schema/schemas/<str:schema_name>/tables/<str:table_name>/columns/', views_schema.api_get_table_columns, name='api_get_table_columns_no_notebook'),
+    path('api/database-schema/search/', views_schema.api_search_schema, name='api_search_schema_no_notebook'),
+    
+    # Query result cache endpoints
+    path('api/notebooks/<uuid:notebook_uuid>/query-cache/invalidate/', views.api_invalidate_notebook_query_cache, name='api_invalidate_notebook_query_cache'),
+    path('api/connections/<int:connection_id>/schema/refresh/', views.api_refresh_connection_schema, name='api_refresh_connection_schema'),
+    path('api/connections/<int:connection_id>/query-cache/invalidate/', views.api_invalidate_connection_query_cache, name='api_invalidate_connection_query_cache'),
+    path('api/query-cache/stats/', views.api_query_cache_stats, name='api_query_cache_stats'),
+    path('api/connection-pools/stats/', views.api_connection_pool_stats, name='api_connection_pool_stats'),
     
     # Knowledge Graph endpoints
     path('api/notebooks/<uuid:notebook_uuid>/knowledge-graph/generate/', views_graph.generate_knowledge_graph, name='generate_knowledge_graph'),
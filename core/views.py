@@ -13,7 +13,19 @@ import datetime
 from .models import SQLNotebook, SQLCell, DatabaseConnection
 import mysql.connector
 import psycopg2
-from .db_handlers import execute_mysql_query, execute_postgresql_query, execute_redshift_query, get_mysql_schema_info, get_postgresql_schema_info
+from .db_handlers import execute_mysql_query, execute_postgresql_query, execute_redshift_query, get_database_schema_info
+from .db_handlers import execute_query_paged, fetch_query_page, close_query_cursor, paged_execution_available
+from .db_handlers import get_cached_query_result, store_query_result, get_connection_fingerprint, get_connection_pool_stats
+from .db_handlers import execute_query_coalesced
+from .db_handlers import cancel_running_queries, get_running_queries
+from .running_queries import query_owner
+from .jobs import submit_cell_job, cancel_queued_cell_jobs, JobLimitExceeded
+from .result_limits import apply_user_result_limits, apply_preview_limit
+from .db_config import get_config
+from .query_cache import query_cache
+from .result_store import cell_results
+from .schema_cache import get_schema_snapshot, snapshot_schemas
+from .result_format import negotiate_result_format, encode_payload, ROWS_JSON, COLUMNAR_JSON
 
 # DateTimeEncoder has been removed as we now handle datetime serialization at the database level
 
@@ -406,7 +418,8 @@ def workbench(request):
         'connection': connection_info,
         'connection_id': connection_id,
         'notebook': notebook,
-        'cells': cells_json
+        'cells': cells_json,
+        'use_async_views': settings.USE_ASYNC_VIEWS
     }
     
     return render(request, 'workbench.html', context)
@@ -707,7 +720,8 @@ def open_notebook(request, notebook_uuid):
         'notebook': notebook,
         'cells': cells_json,
         'connection': connection_info,
-        'connection_id': connection_id
+        'connection_id': connection_id,
+        'use_async_views': settings.USE_ASYNC_VIEWS
     }
     
     return render(request, 'workbench.html', context)
@@ -764,18 +778,12 @@ def api_update_cell(request, cell_id):
     
     return JsonResponse({'success': True})
 
-@login_required(login_url='/login/')
-def api_execute_cell(request, cell_id):
-    """Execute SQL in a cell"""
-    if request.method != 'POST':
-        return JsonResponse({'success': False, 'error': 'Invalid request method'})
-    
+# Helper function to resolve the connection a cell should run against
+def get_cell_connection_info(request, cell):
+    """Return the notebook's connection info for a cell, falling back to the session connection"""
     # Get the current database connection from session as fallback
     session_connection = request.session.get('db_connection')
     
-    cell = get_object_or_404(SQLCell, id=cell_id, notebook__user=request.user)
-    query = request.POST.get('query', cell.query)
-    
     # First try to get connection from the notebook's database_connection
     connection_info = None
     if cell.notebook.database_connection:
@@ -800,6 +808,69 @@ def api_execute_cell(request, cell_id):
         cell.notebook.connection_info = session_connection
         cell.notebook.save()
     
+    return connection_info
+
+# Helper function to apply result limits to a cell run
+def prepare_cell_run(user, connection_info, query, preview=False):
+    """
+    Return (query, connection_info, preview_limit) for running a cell: the connection
+    carries the user's row/byte limits, and preview mode adds a LIMIT to the outermost SELECT
+    """
+    preview_limit = None
+    if preview:
+        preview_limit = get_config()['preview_row_limit']
+        # One extra row tells the result budget whether the preview cut anything off
+        query, _ = apply_preview_limit(query, preview_limit + 1)
+    return query, apply_user_result_limits(connection_info, user, preview_limit), preview_limit
+
+# Helper function to identify a cell's in-flight queries
+def cell_query_owner(user, cell):
+    """Owner key under which a cell's statements are tracked for cancellation"""
+    return (user.id, 'cell', cell.id)
+
+# Helper function to hand a cell execution to the background query workers
+def submit_background_cell(request, cell, query, params):
+    """Queue a cell execution and answer with its job id at once"""
+    try:
+        job = submit_cell_job(request.user, cell, query, params)
+    except JobLimitExceeded as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=429)
+    return JsonResponse({'success': True, 'job_id': str(job.uuid), 'job': job.to_dict()}, status=202)
+
+# Helper function to record a successful cell execution
+def record_cell_execution(request, cell, query, connection_info, execution_time, result=None):
+    """Update cell metadata after execution, keep the result in the on-disk store and remember the connection"""
+    # Update cell metadata but don't save query results (for privacy)
+    cell.query = query
+    # cell.result = result  # No longer storing results for privacy reasons
+    cell.result = None  # Explicitly set to None instead of storing results
+    cell.is_executed = True
+    cell.execution_time = execution_time
+    cell.save()
+    
+    # Update the notebook's last_modified time
+    cell.notebook.save()
+    
+    # Results can be referenced later from the result store when it is enabled
+    if result is not None:
+        cell_results.save(cell.notebook_id, cell.id, result, execution_time)
+    
+    # Ensure the connection is properly saved in the session as well
+    if cell.notebook.database_connection:
+        request.session['db_connection_id'] = cell.notebook.database_connection.id
+        request.session['db_connection'] = connection_info
+        request.session.modified = True
+
+@login_required(login_url='/login/')
+def api_execute_cell(request, cell_id):
+    """Execute SQL in a cell"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    
+    cell = get_object_or_404(SQLCell, id=cell_id, notebook__user=request.user)
+    query = request.POST.get('query', cell.query)
+    connection_info = get_cell_connection_info(request, cell)
+    
     if not connection_info:
         return JsonResponse({
             'success': False,
@@ -819,33 +890,62 @@ def api_execute_cell(request, cell_id):
             except (ValueError, TypeError):
                 query_timeout = None
         
+        # Paged mode keeps the rest of the result on a server-side cursor
+        page_size = request.POST.get('page_size')
+        # Columnar/binary results are negotiated through the Accept header
+        result_format, media_type = negotiate_result_format(request.headers.get('Accept'))
+        
+        # Read-only results may be served from the query cache unless the client opts out
+        use_cache = request.POST.get('use_cache', '1') not in ('0', 'false')
+        notebook_id = cell.notebook.id
+        
+        # Results are capped by row/byte budgets; preview mode also limits the outermost SELECT
+        preview = request.POST.get('preview') in ('1', 'true')
+        
+        # Long-running cells can be handed to the background query workers
+        if request.POST.get('background') in ('1', 'true'):
+            return submit_background_cell(request, cell, query, {
+                'timeout': query_timeout,
+                'preview': preview,
+                'result_format': result_format,
+                'media_type': media_type,
+            })
+        
+        run_query, run_connection_info, preview_limit = prepare_cell_run(request.user, connection_info, query, preview)
+        
         # Execute query with the connection info and timeout
-        result = execute_sql_query(connection_info, query, query_timeout)
+        result = None
+        # Cursors stay in this worker, so paging is only offered when page requests come back here
+        if page_size and not paged_execution_available():
+            page_size = None
+        if page_size:
+            result = execute_query_paged(run_connection_info, run_query, page_size, query_timeout,
+                                         owner=(request.user.id, cell.id), result_format=result_format)
+        elif use_cache:
+            result = get_cached_query_result(run_connection_info, run_query, result_format, notebook_id)
+        if result is None:
+            # Statements are tracked under the cell so api_cancel_cell can stop them
+            with query_owner(cell_query_owner(request.user, cell)):
+                result = execute_query_coalesced(
+                    run_connection_info, run_query,
+                    lambda: execute_sql_query(run_connection_info, run_query, query_timeout, result_format),
+                    result_format
+                )
+            store_query_result(run_connection_info, run_query, result, result_format, notebook_id)
         # print(result)
         execution_time = time.time() - start_time
         
-        # Update cell metadata but don't save query results (for privacy)
-        cell.query = query
-        # cell.result = result  # No longer storing results for privacy reasons
-        cell.result = None  # Explicitly set to None instead of storing results
-        cell.is_executed = True
-        cell.execution_time = execution_time
-        cell.save()
-        
-        # Update the notebook's last_modified time
-        cell.notebook.save()
+        # Paged results only hold their first page, so they are not stored
+        record_cell_execution(request, cell, query, connection_info, execution_time, None if page_size else result)
         
-        # Ensure the connection is properly saved in the session as well
-        if cell.notebook.database_connection:
-            request.session['db_connection_id'] = cell.notebook.database_connection.id
-            request.session['db_connection'] = connection_info
-            request.session.modified = True
-        
-        return JsonResponse({
+        return query_result_response({
             'success': True,
             'result': result,
+            'cached': bool(result.get('cached')),
+            'truncated': bool(result.get('truncated')),
+            'preview_limit': preview_limit,
             'execution_time': execution_time
-        })
+        }, media_type)
         
     except Exception as e:
         # print(f"Query execution error: {str(e)}")
@@ -854,6 +954,120 @@ def api_execute_cell(request, cell_id):
             'error': str(e)
         })
 
+@login_required(login_url='/login/')
+def api_fetch_cell_results_page(request, cell_id):
+    """Fetch the next page of a paged cell execution from its open cursor"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    
+    cell = get_object_or_404(SQLCell, id=cell_id, notebook__user=request.user)
+    cursor_token = request.POST.get('cursor')
+    if not cursor_token:
+        return JsonResponse({'success': False, 'error': 'cursor is required'}, status=400)
+    
+    try:
+        result_format, media_type = negotiate_result_format(request.headers.get('Accept'))
+        result = fetch_query_page(cursor_token, request.POST.get('page_size'),
+                                  owner=(request.user.id, cell.id), result_format=result_format)
+        return query_result_response({
+            'success': True,
+            'result': result
+        }, media_type)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+@login_required(login_url='/login/')
+def api_close_cell_results_cursor(request, cell_id):
+    """Close a paged cell execution's cursor before all rows were read"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    
+    cell = get_object_or_404(SQLCell, id=cell_id, notebook__user=request.user)
+    cursor_token = request.POST.get('cursor')
+    if not cursor_token:
+        return JsonResponse({'success': False, 'error': 'cursor is required'}, status=400)
+    
+    try:
+        close_query_cursor(cursor_token, owner=(request.user.id, cell.id))
+        return JsonResponse({'success': True})
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+@login_required(login_url='/login/')
+def api_cancel_cell(request, cell_id):
+    """Stop a cell's running query on the database server"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    
+    cell = get_object_or_404(SQLCell, id=cell_id, notebook__user=request.user)
+    connection_info = get_cell_connection_info(request, cell)
+    if not connection_info:
+        return JsonResponse({
+            'success': False,
+            'error': 'No database connection available for this notebook.'
+        })
+    
+    try:
+        cancelled = cancel_running_queries(connection_info, cell_query_owner(request.user, cell))
+        cancelled_jobs = cancel_queued_cell_jobs(cell)
+        return JsonResponse({'success': True, 'cancelled': cancelled, 'cancelled_jobs': cancelled_jobs})
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+@login_required(login_url='/login/')
+def api_running_queries(request):
+    """List the current user's queries in flight on the database servers"""
+    queries = get_running_queries(None if request.user.is_staff else (request.user.id,))
+    for running_query in queries:
+        running_query.pop('fingerprint', None)
+    return JsonResponse({'success': True, 'queries': queries})
+
+@login_required(login_url='/login/')
+def api_invalidate_notebook_query_cache(request, notebook_uuid):
+    """Drop cached query results for a notebook's connection"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    
+    notebook = get_object_or_404(SQLNotebook, uuid=notebook_uuid, user=request.user)
+    removed = query_cache.invalidate_notebook(notebook.id)
+    connection_info = notebook.get_connection_info()
+    if connection_info:
+        removed += query_cache.invalidate_connection(get_connection_fingerprint(connection_info))
+    
+    return JsonResponse({'success': True, 'invalidated': removed})
+
+@login_required(login_url='/login/')
+def api_invalidate_connection_query_cache(request, connection_id):
+    """Drop cached query results for a database connection"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    
+    connection = get_object_or_404(DatabaseConnection, id=connection_id, user=request.user)
+    removed = query_cache.invalidate_connection(get_connection_fingerprint(connection.get_connection_config()))
+    
+    return JsonResponse({'success': True, 'invalidated': removed})
+
+@login_required(login_url='/login/')
+def api_query_cache_stats(request):
+    """Hit/miss metrics for this worker's query result cache"""
+    return JsonResponse({'success': True, 'stats': query_cache.get_stats()})
+
+@login_required(login_url='/login/')
+def api_connection_pool_stats(request):
+    """Pool checkout/overflow statistics for this worker (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    return JsonResponse({'success': True, 'stats': get_connection_pool_stats()})
+
 @login_required(login_url='/login/')
 def api_update_cell_name(request, cell_id):
     """Update a cell's name"""
@@ -894,7 +1108,8 @@ def api_delete_cell(request, cell_id):
     cell = get_object_or_404(SQLCell, id=cell_id, notebook__user=request.user)
     notebook = cell.notebook
     
-    # Delete the cell
+    # Delete the cell and any result kept for it on disk
+    cell_results.delete(notebook.id, cell.id)
     cell.delete()
     
     # Update the notebook's last_modified time
@@ -982,35 +1197,36 @@ def api_update_notebook_title(request, notebook_uuid):
         })
 
 # Helper function to execute SQL queries
-def execute_sql_query(connection_info, query, query_timeout=None):
+def execute_sql_query(connection_info, query, query_timeout=None, result_format='rows'):
     """Execute SQL query based on database type"""
     connection_type = connection_info.get('type', '').lower()
     
     if connection_type == 'mysql':
-        return execute_mysql_query(connection_info, query, query_timeout)
+        return execute_mysql_query(connection_info, query, query_timeout, result_format)
     elif connection_type == 'postgresql':
-        return execute_postgresql_query(connection_info, query, query_timeout)
+        return execute_postgresql_query(connection_info, query, query_timeout, result_format)
     elif connection_type == 'redshift':
         return execute_redshift_query(connection_info, query)
     else:
         # Default to MySQL for now
-        return execute_mysql_query(connection_info, query, query_timeout)
+        return execute_mysql_query(connection_info, query, query_timeout, result_format)
+
+# Helper function to render query results in the negotiated media type
+def query_result_response(payload, media_type=ROWS_JSON):
+    """Return query results as JSON, or binary-encoded for msgpack/Arrow clients"""
+    if media_type in (ROWS_JSON, COLUMNAR_JSON):
+        response = JsonResponse(payload)
+        if media_type == COLUMNAR_JSON:
+            response['Content-Type'] = COLUMNAR_JSON
+    else:
+        response = HttpResponse(encode_payload(payload, media_type), content_type=media_type)
+    response['Vary'] = 'Accept'
+    return response
         
 # Helper function to get database schema
 def get_database_schema(connection_info):
     """Fetch schema based on database type"""
-    connection_type = connection_info.get('type', '').lower()
-    
-    if connection_type == 'mysql':
-        return get_mysql_schema_info(connection_info)
-    elif connection_type == 'postgresql':
-        return get_postgresql_schema_info(connection_info)
-    elif connection_type == 'redshift':
-        # TODO: Implement Redshift schema retrieval
-        raise Exception("Redshift schema retrieval not yet implemented.")
-    else:
-        # Default to MySQL for now
-        return get_mysql_schema_info(connection_info)
+    return get_database_schema_info(connection_info)
         
 @login_required(login_url='/login/')
 def api_get_database_schema(request, notebook_uuid=None):
@@ -1020,6 +1236,17 @@ def api_get_database_schema(request, notebook_uuid=None):
         connection_info = None
         if notebook_uuid:
             notebook = get_object_or_404(SQLNotebook, uuid=notebook_uuid, user=request.user)
+            
+            # Saved connections are served from their schema snapshot
+            if notebook.database_connection:
+                refresh = request.GET.get('refresh') in ('1', 'true')
+                snapshot = get_schema_snapshot(notebook.database_connection, force_refresh=refresh)
+                return JsonResponse({
+                    'success': True,
+                    'schemas': snapshot_schemas(notebook.database_connection, snapshot),
+                    'schema_version': snapshot.version,
+                    'captured_at': snapshot.captured_at.isoformat()
+                })
             connection_info = notebook.get_connection_info()
         
         # If no notebook provided, try to get connection from session
@@ -1045,6 +1272,28 @@ def api_get_database_schema(request, notebook_uuid=None):
             'error': str(e)
         })
 
+@login_required(login_url='/login/')
+def api_refresh_connection_schema(request, connection_id):
+    """Re-introspect a saved connection's schema and store it as a new snapshot version"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    
+    connection = get_object_or_404(DatabaseConnection, id=connection_id, user=request.user)
+    try:
+        snapshot = get_schema_snapshot(connection, force_refresh=True)
+        return JsonResponse({
+            'success': True,
+            'schema_version': snapshot.version,
+            'captured_at': snapshot.captured_at.isoformat(),
+            'fingerprint': snapshot.fingerprint,
+            'table_count': sum(len(schema['tables']) for schema in snapshot.schema)
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
 @login_required(login_url='/login/')
 def api_get_cell_results(request, notebook_uuid, cell_id):
     """API to get cell results for referencing"""
@@ -1063,49 +1312,79 @@ def api_get_cell_results(request, notebook_uuid, cell_id):
         # Return different levels of detail based on request
         detail_level = request.GET.get('detail', 'preview')  # preview, full, metadata
         
+        # Results come from the on-disk result store when it holds one for this cell,
+        # otherwise from cell.result (only set for agent-created cells)
+        result_data = cell.result if isinstance(cell.result, dict) and 'rows' in cell.result else None
+        last_executed = cell.updated_at.isoformat() if cell.updated_at else None
+        
         if detail_level == 'metadata':
             # Return just metadata about the results
-            result_data = cell.result
-            if result_data and isinstance(result_data, dict):
-                row_count = len(result_data.get('rows', [])) if 'rows' in result_data else 0
+            stored = cell_results.get_metadata(notebook.id, cell.id)
+            if stored:
+                row_count = stored['row_count']
+                columns = stored['columns']
+            elif result_data:
+                row_count = len(result_data.get('rows', []))
                 columns = result_data.get('columns', [])
             else:
                 row_count = 0
                 columns = []
                 
             data = {
-                'has_results': bool(result_data),
+                'has_results': bool(stored or result_data),
                 'row_count': row_count,
                 'columns': columns,
+                'dtypes': stored['dtypes'] if stored else None,
+                'truncated': bool(stored and stored.get('truncated')),
                 'execution_time': cell.execution_time,
-                'last_executed': cell.updated_at.isoformat() if cell.updated_at else None
+                'last_executed': last_executed
             }
         elif detail_level == 'full':
-            # Return full results
+            # Return full results, or one page of them with offset/limit
+            offset = max(0, int(request.GET.get('offset', 0)))
+            limit = request.GET.get('limit')
+            limit = max(0, int(limit)) if limit else None
+            stored, rows = cell_results.read_rows(notebook.id, cell.id, offset, limit)
+            if stored:
+                result = {
+                    'columns': stored['columns'],
+                    'rows': rows,
+                    'rowCount': stored['row_count'],
+                    'truncated': stored.get('truncated', False)
+                }
+            else:
+                result = cell.result
             data = {
                 'cell_id': cell.id,
                 'cell_name': cell.name,
                 'cell_query': cell.query,
-                'result': cell.result,
+                'result': result,
+                'offset': offset,
                 'execution_time': cell.execution_time,
-                'last_executed': cell.updated_at.isoformat() if cell.updated_at else None
+                'last_executed': last_executed
             }
         else:  # preview
             # Return preview with limited rows
             max_rows = int(request.GET.get('max_rows', 5))
-            result_data = cell.result
-            
-            if result_data and isinstance(result_data, dict) and 'rows' in result_data:
+            stored, rows = cell_results.read_rows(notebook.id, cell.id, 0, max_rows)
+            if stored:
+                columns = stored['columns']
+                total_rows = stored['row_count']
+            elif result_data:
                 rows = result_data['rows'][:max_rows]
+                columns = result_data.get('columns', [])
+                total_rows = len(result_data['rows'])
+            
+            if stored or result_data:
                 data = {
                     'cell_id': cell.id,
                     'cell_name': cell.name,
                     'cell_query': cell.query[:100] + '...' if len(cell.query) > 100 else cell.query,
-                    'columns': result_data.get('columns', []),
+                    'columns': columns,
                     'sample_rows': rows,
-                    'total_rows': len(result_data['rows']),
+                    'total_rows': total_rows,
                     'execution_time': cell.execution_time,
-                    'last_executed': cell.updated_at.isoformat() if cell.updated_at else None,
+                    'last_executed': last_executed,
                     'has_results': True
                 }
             else:
@@ -1118,7 +1397,7 @@ def api_get_cell_results(request, notebook_uuid, cell_id):
                     'sample_rows': [],
                     'total_rows': 0,
                     'execution_time': cell.execution_time,
-                    'last_executed': cell.updated_at.isoformat() if cell.updated_at else None,
+                    'last_executed': last_executed,
                     'has_results': False
                 }
             
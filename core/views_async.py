@@ -0,0 +1,224 @@
+"""
+Async views for ASGI deployments
+
+Cell execution and schema retrieval await the aiomysql/asyncpg pools directly, so a
+single worker can keep many slow warehouse queries in flight. ORM and session access
+stay synchronous and are run through sync_to_async.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from .models import SQLNotebook, SQLCell, QueryJob
+from .db_handlers import execute_query_async, get_database_schema_async, iter_database_schema_async, execute_query_paged, paged_execution_available
+from .db_handlers import get_cached_query_result, store_query_result, execute_query_coalesced_async
+from .result_format import negotiate_result_format
+from .running_queries import query_owner
+from .schema_cache import get_schema_snapshot_async, snapshot_schemas
+from .row_counts import apply_exact_row_counts
+from .jobs import WAIT_POLL_INTERVAL, get_wait_timeout
+from .views import get_cell_connection_info, record_cell_execution, query_result_response, cell_query_owner
+from .views import prepare_cell_run, submit_background_cell
+
+def _load_cell(request, cell_id):
+    """Load a cell, its query and the connection it should run against"""
+    cell = get_object_or_404(
+        SQLCell.objects.select_related('notebook', 'notebook__database_connection'),
+        id=cell_id, notebook__user=request.user
+    )
+    query = request.POST.get('query', cell.query)
+    return cell, query, get_cell_connection_info(request, cell)
+
+def _get_schema_connection_info(request, notebook_uuid):
+    """
+    Return (database_connection, connection_info) for a notebook: its saved connection
+    when it has one, otherwise its connection info falling back to the session connection
+    """
+    connection_info = None
+    if notebook_uuid:
+        notebook = get_object_or_404(
+            SQLNotebook.objects.select_related('database_connection'), uuid=notebook_uuid, user=request.user
+        )
+        if notebook.database_connection:
+            return notebook.database_connection, None
+        connection_info = notebook.get_connection_info()
+
+    # If no notebook provided, try to get connection from session
+    if not connection_info:
+        connection_info = request.session.get('db_connection')
+    return None, connection_info
+
+@login_required(login_url='/login/')
+async def api_execute_cell(request, cell_id):
+    """Execute SQL in a cell without holding a worker thread while the query runs"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+
+    cell, query, connection_info = await sync_to_async(_load_cell)(request, cell_id)
+
+    if not connection_info:
+        return JsonResponse({
+            'success': False,
+            'error': 'No database connection available for this notebook.'
+        })
+
+    start_time = time.time()
+    try:
+        # Get query timeout from request (optional)
+        query_timeout = request.POST.get('timeout')
+        if query_timeout:
+            try:
+                query_timeout = int(query_timeout)
+            except (ValueError, TypeError):
+                query_timeout = None
+
+        page_size = request.POST.get('page_size')
+        result_format, media_type = negotiate_result_format(request.headers.get('Accept'))
+        use_cache = request.POST.get('use_cache', '1') not in ('0', 'false')
+        notebook_id = cell.notebook.id
+        preview = request.POST.get('preview') in ('1', 'true')
+        if request.POST.get('background') in ('1', 'true'):
+            return await sync_to_async(submit_background_cell)(request, cell, query, {
+                'timeout': query_timeout,
+                'preview': preview,
+                'result_format': result_format,
+                'media_type': media_type,
+            })
+        run_query, run_connection_info, preview_limit = prepare_cell_run(request.user, connection_info, query, preview)
+
+        result = None
+        # Cursors stay in this worker, so paging is only offered when page requests come back here
+        if page_size and not paged_execution_available():
+            page_size = None
+        if page_size:
+            # Server-side cursors live on the sync pools, so run the first page in a worker thread
+            result = await sync_to_async(execute_query_paged, thread_sensitive=False)(
+                run_connection_info, run_query, page_size, query_timeout,
+                owner=(request.user.id, cell.id), result_format=result_format
+            )
+        elif use_cache:
+            result = get_cached_query_result(run_connection_info, run_query, result_format, notebook_id)
+        if result is None:
+            async def execute():
+                success, result = await execute_query_async(run_connection_info, run_query, query_timeout, result_format)
+                if not success:
+                    raise Exception(result)
+                return result
+            
+            # Statements are tracked under the cell so api_cancel_cell can stop them
+            with query_owner(cell_query_owner(request.user, cell)):
+                result = await execute_query_coalesced_async(run_connection_info, run_query, execute, result_format)
+            store_query_result(run_connection_info, run_query, result, result_format, notebook_id)
+        execution_time = time.time() - start_time
+
+        await sync_to_async(record_cell_execution)(
+            request, cell, query, connection_info, execution_time, None if page_size else result
+        )
+
+        return query_result_response({
+            'success': True,
+            'result': result,
+            'cached': bool(result.get('cached')),
+            'truncated': bool(result.get('truncated')),
+            'preview_limit': preview_limit,
+            'execution_time': execution_time
+        }, media_type)
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+@login_required(login_url='/login/')
+async def api_wait_for_job(request, job_uuid):
+    """Long-poll a background job without holding a worker thread while it runs"""
+    job = await sync_to_async(get_object_or_404)(QueryJob, uuid=job_uuid, user=await request.auser())
+    deadline = time.monotonic() + await sync_to_async(get_wait_timeout)(request.GET.get('timeout'))
+    while not job.is_finished and time.monotonic() < deadline:
+        await asyncio.sleep(WAIT_POLL_INTERVAL)
+        await sync_to_async(job.refresh_from_db)()
+    return JsonResponse({'success': True, 'job': job.to_dict()})
+
+def _ndjson_line(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder) + '\n'
+
+async def _stream_schemas(schemas, connection_info=None, **summary):
+    """
+    NDJSON schema stream: one {"schema": ...} line per schema as it becomes
+    available, then a final {"done": true} line, or {"success": false} on failure
+    """
+    count = 0
+    try:
+        async for schema in schemas:
+            if connection_info is not None:
+                apply_exact_row_counts(connection_info, [schema])
+            count += 1
+            yield _ndjson_line({'schema': schema})
+        yield _ndjson_line(dict(summary, success=True, done=True, schema_count=count))
+    except Exception as e:
+        yield _ndjson_line({'success': False, 'done': True, 'error': str(e)})
+
+async def _iterate(items):
+    for item in items:
+        yield item
+
+@login_required(login_url='/login/')
+async def api_get_database_schema(request, notebook_uuid=None):
+    """
+    API endpoint to get database schema information
+
+    With stream=1 the response is NDJSON; live introspection then sends each schema
+    as soon as it has been read instead of waiting for the whole database.
+    """
+    try:
+        database_connection, connection_info = await sync_to_async(_get_schema_connection_info)(request, notebook_uuid)
+        stream = request.GET.get('stream') in ('1', 'true')
+
+        # Saved connections are served from their schema snapshot
+        if database_connection:
+            refresh = request.GET.get('refresh') in ('1', 'true')
+            snapshot = await get_schema_snapshot_async(database_connection, force_refresh=refresh)
+            schemas = await sync_to_async(snapshot_schemas)(database_connection, snapshot)
+            if stream:
+                return StreamingHttpResponse(
+                    _stream_schemas(_iterate(schemas), schema_version=snapshot.version,
+                                    captured_at=snapshot.captured_at.isoformat()),
+                    content_type='application/x-ndjson'
+                )
+            return JsonResponse({
+                'success': True,
+                'schemas': schemas,
+                'schema_version': snapshot.version,
+                'captured_at': snapshot.captured_at.isoformat()
+            })
+
+        if not connection_info:
+            return JsonResponse({
+                'success': False,
+                'error': 'No database connection available'
+            })
+
+        if stream:
+            return StreamingHttpResponse(
+                _stream_schemas(iter_database_schema_async(connection_info), connection_info),
+                content_type='application/x-ndjson'
+            )
+
+        schemas = await get_database_schema_async(connection_info)
+
+        return JsonResponse({
+            'success': True,
+            'schemas': schemas
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
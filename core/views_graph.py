@@ -9,6 +9,7 @@ from django.shortcuts import get_object_or_404
 from .models import SQLNotebook, KnowledgeGraph
 from .db_handlers import get_mysql_schema_info
 from .knowledge_graph import KnowledgeGraphGenerator
+from .schema_cache import get_connection_schemas
 
 @login_required(login_url='/login/')
 @require_http_methods(["POST"])
@@ -37,7 +38,10 @@ def generate_knowledge_graph(request, notebook_uuid):
         
         # Get database schema
         try:
-            schemas = get_mysql_schema_info(connection_info)
+            if notebook.database_connection:
+                schemas = get_connection_schemas(notebook.database_connection)
+            else:
+                schemas = get_mysql_schema_info(connection_info)
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -0,0 +1,80 @@
+"""
+Views for background cell execution jobs
+"""
+from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_http_methods
+from django.shortcuts import get_object_or_404
+
+from .db_config import get_config
+from .models import QueryJob
+from .jobs import read_job_result, cancel_job, wait_for_job, get_wait_timeout
+from .result_format import ROWS_JSON
+from .views import query_result_response
+
+@login_required(login_url='/login/')
+def api_list_jobs(request):
+    """List the current user's recent background jobs, optionally filtered by status"""
+    jobs = QueryJob.objects.filter(user=request.user)
+    status = request.GET.get('status')
+    if status:
+        jobs = jobs.filter(status=status)
+    cell_id = request.GET.get('cell_id')
+    if cell_id:
+        jobs = jobs.filter(cell_id=cell_id)
+    return JsonResponse({'success': True, 'jobs': [job.to_dict() for job in jobs[:50]]})
+
+@login_required(login_url='/login/')
+def api_get_job(request, job_uuid):
+    """Return a background job's status"""
+    job = get_object_or_404(QueryJob, uuid=job_uuid, user=request.user)
+    return JsonResponse({'success': True, 'job': job.to_dict()})
+
+@login_required(login_url='/login/')
+def api_wait_for_job(request, job_uuid):
+    """
+    Long-poll a background job until it finishes or the timeout passes
+
+    A waiting request holds a sync worker, so the wait is capped at
+    job_sync_long_poll_timeout here; the async view waits up to job_long_poll_timeout.
+    """
+    job = get_object_or_404(QueryJob, uuid=job_uuid, user=request.user)
+    timeout = get_wait_timeout(request.GET.get('timeout'), get_config()['job_sync_long_poll_timeout'])
+    job = wait_for_job(job, timeout)
+    return JsonResponse({'success': True, 'job': job.to_dict()})
+
+@login_required(login_url='/login/')
+def api_get_job_result(request, job_uuid):
+    """Return a finished job's result in the format negotiated when it was submitted"""
+    job = get_object_or_404(QueryJob, uuid=job_uuid, user=request.user)
+    if job.status != QueryJob.Status.SUCCEEDED:
+        return JsonResponse({
+            'success': False,
+            'error': job.error or f"Job is {job.status}",
+            'job': job.to_dict()
+        }, status=409)
+
+    payload = read_job_result(job)
+    if payload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Job result has expired',
+            'job': job.to_dict()
+        }, status=410)
+    payload['job'] = job.to_dict()
+    return query_result_response(payload, (job.params or {}).get('media_type', ROWS_JSON))
+
+@login_required(login_url='/login/')
+@require_http_methods(["POST"])
+def api_cancel_job(request, job_uuid):
+    """Cancel a queued job or stop a running job's query"""
+    job = get_object_or_404(QueryJob.objects.select_related('cell__notebook'), uuid=job_uuid, user=request.user)
+    try:
+        cancelled = cancel_job(job)
+        job.refresh_from_db()
+        return JsonResponse({'success': True, 'cancelled': cancelled, 'job': job.to_dict()})
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
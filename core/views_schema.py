@@ -0,0 +1,176 @@
+"""
+Views for the lazy schema explorer API
+
+Schemas, pages of tables and a table's columns are served one level at a time
+from the connection's cached catalog. Responses carry an ETag and answer a
+matching If-None-Match with 304, so an unchanged level costs no transfer.
+Search runs against the catalog's in-memory search index.
+"""
+import hashlib
+import json
+import time
+
+from django.contrib.auth.decorators import login_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .column_profiles import get_table_profile
+from .db_config import get_config
+from .models import SQLNotebook
+from .schema_catalog import get_notebook_catalog, get_live_catalog
+from .schema_search import get_search_index
+
+
+def _get_catalog(request, notebook_uuid):
+    """Catalog for a notebook's connection, or the session connection without a notebook"""
+    refresh = request.GET.get('refresh') in ('1', 'true')
+    if notebook_uuid:
+        notebook = get_object_or_404(
+            SQLNotebook.objects.select_related('database_connection'), uuid=notebook_uuid, user=request.user
+        )
+        catalog = get_notebook_catalog(notebook, refresh)
+        if catalog is not None:
+            return catalog
+    connection_info = request.session.get('db_connection')
+    if not connection_info:
+        return None
+    return get_live_catalog(connection_info, refresh)
+
+
+def _conditional_json(request, payload):
+    """JSON response with a content ETag; 304 when the client already has it"""
+    body = json.dumps(payload, cls=DjangoJSONEncoder)
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Browsers keep the response but revalidate it on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def _catalog_info(catalog):
+    return {
+        'schema_version': catalog.version,
+        'captured_at': catalog.captured_at.isoformat() if catalog.captured_at else None,
+    }
+
+
+def _no_connection():
+    return JsonResponse({
+        'success': False,
+        'error': 'No database connection available'
+    })
+
+
+@login_required(login_url='/login/')
+def api_list_schemas(request, notebook_uuid=None):
+    """List schemas with their table and view counts"""
+    try:
+        catalog = _get_catalog(request, notebook_uuid)
+        if catalog is None:
+            return _no_connection()
+        return _conditional_json(request, dict(_catalog_info(catalog), success=True, schemas=catalog.list_schemas()))
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+
+@login_required(login_url='/login/')
+def api_list_schema_tables(request, schema_name, notebook_uuid=None):
+    """A page of one schema's tables, without columns, optionally filtered by name (q)"""
+    try:
+        catalog = _get_catalog(request, notebook_uuid)
+        if catalog is None:
+            return _no_connection()
+        if not catalog.has_schema(schema_name):
+            return JsonResponse({'success': False, 'error': f"Schema {schema_name} not found"}, status=404)
+
+        config = get_config()
+        offset = max(0, int(request.GET.get('offset', 0)))
+        limit = min(max(1, int(request.GET.get('limit', config['schema_page_size']))), config['schema_max_page_size'])
+        name_filter = request.GET.get('q', '').strip()
+        total, tables = catalog.list_tables(schema_name, name_filter, offset, limit)
+        return _conditional_json(request, dict(
+            _catalog_info(catalog),
+            success=True,
+            schema=schema_name,
+            tables=tables,
+            total=total,
+            offset=offset,
+            limit=limit,
+            has_more=offset + len(tables) < total
+        ))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'offset and limit must be integers'}, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+
+@login_required(login_url='/login/')
+def api_get_table_columns(request, schema_name, table_name, notebook_uuid=None):
+    """Columns with their sampled statistics, indexes and foreign keys of one table"""
+    try:
+        catalog = _get_catalog(request, notebook_uuid)
+        if catalog is None:
+            return _no_connection()
+        table = catalog.get_table(schema_name, table_name)
+        if table is None:
+            return JsonResponse({'success': False, 'error': f"Table {schema_name}.{table_name} not found"}, status=404)
+
+        columns = table.get('columns', [])
+        profile = get_table_profile(catalog.connection_id, schema_name, table_name) if catalog.connection_id else None
+        if profile:
+            columns = [dict(column, profile=profile['columns'][column['name']])
+                       if column['name'] in profile['columns'] else column for column in columns]
+        return _conditional_json(request, dict(
+            _catalog_info(catalog),
+            success=True,
+            schema=schema_name,
+            table=table['name'],
+            type=table['type'],
+            columns=columns,
+            profiled_at=profile['profiled_at'].isoformat() if profile else None,
+            indexes=table.get('indexes', []),
+            foreign_keys=table.get('foreign_keys', [])
+        ))
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+
+@login_required(login_url='/login/')
+def api_search_schema(request, notebook_uuid=None):
+    """Ranked schema, table and column matches for q, optionally filtered by kind and schema"""
+    try:
+        catalog = _get_catalog(request, notebook_uuid)
+        if catalog is None:
+            return _no_connection()
+
+        query = request.GET.get('q', '').strip()
+        limit = min(max(1, int(request.GET.get('limit', 20))), 100)
+        kinds = set(request.GET.getlist('kind')) or None
+        started = time.perf_counter()
+        matches = get_search_index(catalog).search(query, limit, kinds, request.GET.get('schema') or None)
+        return JsonResponse(dict(
+            _catalog_info(catalog),
+            success=True,
+            query=query,
+            matches=matches,
+            search_time_ms=round((time.perf_counter() - started) * 1000, 2)
+        ))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'limit must be an integer'}, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
@@ -10,7 +10,11 @@ backlog = 2048
 
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+# Paged result cursors live in one worker; the app only offers paging when it knows page requests return to it
+os.environ['RCA_WEB_WORKERS'] = str(workers)
+# Set GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker (with USE_ASYNC_VIEWS=True) and
+# serve rca.asgi:application to run the async views on the per-loop database pools
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
 worker_connections = 1000
 
 # Timeout settings - increased to handle text-to-SQL agent processing
@@ -64,6 +68,22 @@ def worker_int(worker):
     """Called when a worker receives the SIGINT or SIGQUIT signal."""
     worker.log.info("Worker received SIGINT or SIGQUIT signal")
 
+def worker_exit(server, worker):
+    """Called just after a worker has been exited, in the worker process."""
+    # Close pooled customer-database connections instead of leaving them to time out server-side
+    try:
+        from core.db_handlers import close_sync_connection_pools, dispose_sqlalchemy_engines
+        close_sync_connection_pools()
+        dispose_sqlalchemy_engines()
+    except Exception as e:
+        worker.log.warning("Error closing database connection pools: %s", e)
+    # Close the agent's keep-alive connections to the LLM API
+    try:
+        from mcp_agent.llm_client import close_llm_client
+        close_llm_client()
+    except Exception as e:
+        worker.log.warning("Error closing LLM client: %s", e)
+
 def on_exit(server):
     """Called just before exiting."""
     server.log.info("Shutting down Gunicorn server") 
\ No newline at end of file
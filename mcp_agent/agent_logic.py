@@ -9,20 +9,28 @@ import os
 import re
 import json
 import logging
+from threading import Lock
 from typing import TypedDict, List, Dict, Any, Optional
 from langgraph.graph import StateGraph, END
-from anthropic import Anthropic
+from langchain_core.runnables import RunnableConfig
 from django.conf import settings
 from core.models import SQLNotebook, DatabaseConnection, SQLCell
-from core.db_handlers import execute_query, get_schema_for_connection, execute_query_with_fallback
+from core.db_handlers import execute_query, get_schema_for_connection, execute_query_with_fallback, format_schema_for_llm
+from core.running_queries import running_queries, get_query_owner
+from core.result_limits import apply_user_result_limits
+from core.result_store import cell_results
+from core.db_config import get_config
+from core.schema_retrieval import count_tables, find_requested_tables, prune_schemas
+from .llm_client import llm_client
+from .prompt_cache import cache_breakpoint, prefix_hashes, prompt_cache_stats
 from .models import AgentConversation, ChatMessage
 
 logger = logging.getLogger(__name__)
 
 # Agent state management
-# Note: We don't cache agent instances because LangGraph agents maintain internal state
-# between invocations, which can cause iteration counts and other state to persist
-# across different user queries. Creating fresh agents ensures clean state.
+# The workflow is compiled once per process (get_agent_graph). A compiled graph keeps no
+# state between invocations: each invoke/stream starts from the AgentState passed in,
+# so concurrent runs share the graph but not their iteration counts or messages.
 
 
 class AgentState(TypedDict):
@@ -43,6 +51,9 @@ class AgentState(TypedDict):
     selected_schemas: List[Dict[str, Any]]  # Selected schemas for focused context
     last_successful_sql: Optional[str]  # Last SQL that executed successfully
     start_time: float  # Workflow start time for timeout tracking
+    schema_pool: Optional[List[Dict[str, Any]]]  # Schemas the prompt's tables were retrieved from (None when sent whole)
+    schema_tables: List[Dict[str, Any]]  # Retrieved tables currently in the prompt
+    schema_fingerprint: Optional[str]  # Snapshot fingerprint of schema_pool, None for live schemas
 
 
 def get_database_specific_instructions(connection_type: str) -> str:
@@ -114,40 +125,53 @@ def get_database_specific_instructions(connection_type: str) -> str:
 """)
 
 
-def get_system_prompt(database_schema: str, user_nl_query: str, connection_type: str, iteration: int = 0, selected_schemas: list = None) -> str:
-    """Generate the system prompt for the Anthropic API"""
+def get_event_emitter(config: Optional[RunnableConfig]):
+    """
+    The emit(event, data) callback a streaming run passes in its config's "configurable"
+    section, or a no-op for runs that are not streamed
+    """
+    emit = ((config or {}).get("configurable") or {}).get("emit")
+    return emit or (lambda event, data: None)
+
+
+# Model the agent generates SQL with
+AGENT_MODEL = "claude-3-5-sonnet-20241022"  # Using Claude 3.5 Sonnet
+
+# Line an agent replies with to get tables that were left out of its schema
+TABLE_REQUEST_PATTERN = re.compile(r'^\s*REQUEST_TABLES:\s*(.+)$', re.MULTILINE | re.IGNORECASE)
+
+# Tables added per request for more tables
+MAX_REQUESTED_TABLES = 10
+
+
+def render_retrieved_tables(schemas: list, tables: list, connection_type: str, fingerprint: Optional[str] = None) -> str:
+    """Render only the retrieved tables, keeping the best scored ones when over the token budget"""
+    relevance = {(entry['schema'], entry['table']): entry.get('score', 0.0) for entry in tables}
+    # The relevance map lists every retrieved table, so it tells prunings of one fingerprint apart
+    return format_schema_for_llm(prune_schemas(schemas, tables), connection_type, relevance=relevance,
+                                 fingerprint=fingerprint)
+
+
+def get_schema_retrieval_context(shown: int, total: int) -> str:
+    """Tell the model the schema is partial and how to ask for the rest"""
+    return f"""
+
+**Partial Schema:**
+The schema above shows the {shown} of {total} tables most relevant to the request, with the tables they join to.
+If a table you need is not listed, reply with a single line `REQUEST_TABLES: name, name` naming the tables
+(schema.table or table) or keywords to look for, and no SQL. The schema will be extended and you can continue."""
+
+
+def get_instructions_prompt(connection_type: str) -> str:
+    """Static instructions for a database type, identical across requests so providers can cache them"""
     
     # Get database-specific instructions
     db_specific_instructions = get_database_specific_instructions(connection_type)
     
-    # Build selected schemas context if provided
-    selected_schemas_context = ""
-    if selected_schemas and len(selected_schemas) > 0:
-        selected_schemas_context = "\n\n**Selected Schema Context:**\n"
-        selected_schemas_context += f"The user has focused on {len(selected_schemas)} schema(s). Only use tables from these schemas:\n\n"
-        
-        for schema in selected_schemas:
-            selected_schemas_context += f"Schema: {schema.get('name', 'unknown')}\n"
-            tables = schema.get('tables', [])
-            if tables:
-                selected_schemas_context += f"Tables ({len(tables)}): {', '.join(tables[:10])}"
-                if len(tables) > 10:
-                    selected_schemas_context += f" ... and {len(tables) - 10} more"
-                selected_schemas_context += "\n"
-            selected_schemas_context += "\n"
-    
-    base_prompt = f"""You are an expert SQL generation assistant. Your role is to help users generate accurate SQL queries based on their natural language requests and the provided database schema.
+    return f"""You are an expert SQL generation assistant. Your role is to help users generate accurate SQL queries based on their natural language requests and the provided database schema.
 
 **Database Type:** {connection_type.upper()}
 
-**Database Schema:**
-{database_schema}
-
-**User's Request:**
-{user_nl_query}{selected_schemas_context}
-
-**Current Iteration:** {iteration}
-
 {db_specific_instructions}
 
 **Your Workflow:**
@@ -169,11 +193,12 @@ def get_system_prompt(database_schema: str, user_nl_query: str, connection_type:
 - **Use intermediate steps sparingly**: Only when you need to understand data structure or relationships
 - **Focus on the actual question**: Don't embellish with unnecessary analysis unless requested
 - If a simple query already answers the question completely, mark it as final immediately
+- On later iterations, review the previous execution results. If there were errors, fix them. If the query was successful and fully answered the user's question, repeat the same working query and say 'This is the final query'
 
 **Important Guidelines:**
 - Use the exact table and column names from the schema
 - Follow {connection_type.upper()}-specific syntax and functions
-- Consider relationships between tables when writing JOINs
+- Join on the declared foreign keys shown in the schema (column -> table.column) instead of querying the catalog for relationships
 - Be careful with data types and NULL handling specific to {connection_type.upper()}
 - **Focus on the selected schemas** if any are specified to reduce token usage
 - Always validate your SQL syntax for {connection_type.upper()}
@@ -194,14 +219,95 @@ def get_system_prompt(database_schema: str, user_nl_query: str, connection_type:
 
 Begin by analyzing the schema and user request to generate an appropriate {connection_type.upper()} SQL query."""
 
-    if iteration > 0:
-        base_prompt += f"\n\n**ITERATION {iteration}:** Review the previous execution results. If there were errors, fix them. If the query was successful and fully answered the user's question, repeat the same working query and say 'This is the final query' to complete the task. Only continue with new SQL if you need additional data to provide a complete answer.\n**CRITICAL: You MUST include a SQL query in your response - never respond with just text!**"
+
+def get_request_prompt(user_nl_query: str, selected_schemas: list = None) -> str:
+    """The user's request and schema focus, fixed for the length of one agent run"""
+    
+    # Build selected schemas context if provided
+    selected_schemas_context = ""
+    if selected_schemas and len(selected_schemas) > 0:
+        selected_schemas_context = "\n\n**Selected Schema Context:**\n"
+        selected_schemas_context += f"The user has focused on {len(selected_schemas)} schema(s). Only use tables from these schemas:\n\n"
         
-    return base_prompt
+        for schema in selected_schemas:
+            selected_schemas_context += f"Schema: {schema.get('name', 'unknown')}\n"
+            tables = schema.get('tables', [])
+            if tables:
+                selected_schemas_context += f"Tables ({len(tables)}): {', '.join(tables[:10])}"
+                if len(tables) > 10:
+                    selected_schemas_context += f" ... and {len(tables) - 10} more"
+                selected_schemas_context += "\n"
+            selected_schemas_context += "\n"
+    
+    return f"""**User's Request:**
+{user_nl_query}{selected_schemas_context}"""
+
+
+def get_iteration_prompt(iteration: int) -> str:
+    """Per-iteration reminder, sent after the cached prefix"""
+    return f"**ITERATION {iteration}:** Review the previous execution results. If there were errors, fix them. If the query was successful and fully answered the user's question, repeat the same working query and say 'This is the final query' to complete the task. Only continue with new SQL if you need additional data to provide a complete answer.\n**CRITICAL: You MUST include a SQL query in your response - never respond with just text!**"
+
+
+def get_system_prompt(database_schema: str, user_nl_query: str, connection_type: str, selected_schemas: list = None, schema_retrieval_context: str = "", cache: bool = False) -> List[Dict[str, Any]]:
+    """
+    Generate the system prompt for the Anthropic API as text blocks, most stable first:
+    instructions and dialect notes, then the schema, then the request
+    
+    The iteration counter is not part of the system prompt; it follows the conversation
+    (see build_conversation) so the prefix stays byte-identical across iterations. With
+    cache, the instructions and the schema each end a cached prefix.
+    """
+    instructions = {"type": "text", "text": get_instructions_prompt(connection_type)}
+    schema = {"type": "text", "text": f"**Database Schema:**\n{database_schema}{schema_retrieval_context}"}
+    if cache:
+        cache_breakpoint(instructions)
+        cache_breakpoint(schema)
+    return [instructions, schema, {"type": "text", "text": get_request_prompt(user_nl_query, selected_schemas)}]
+
+
+def build_conversation(state: AgentState, cache: bool = False) -> List[Dict[str, Any]]:
+    """
+    Messages for the Anthropic API: the saved history, the generation request and this
+    run's turns, ending with the iteration reminder
+    
+    The generation request sits right after the saved history on every iteration, so
+    each call's messages extend the previous call's instead of rewriting them. With
+    cache, a cache breakpoint is put on the last turn, before the reminder.
+    """
+    # Saved messages carry their timestamp; this run's messages don't have one yet
+    history_length = 0
+    for position, msg in enumerate(state["messages"]):
+        if msg.get("timestamp") is not None:
+            history_length = position + 1
+    request = {"role": "user", "content": f"Please generate a SQL query for: {state['user_nl_query']}"}
+    turns = state["messages"][:history_length] + [request] + state["messages"][history_length:]
+    
+    messages = []
+    for msg in turns:
+        if msg["role"] in ["user", "assistant", "tool_result"]:
+            # Map 'tool_result' to 'user' for Anthropic, so the LLM sees the result as user feedback
+            role = msg["role"]
+            if role == "tool_result":
+                role = "user"
+            messages.append({
+                "role": role,
+                "content": [{"type": "text", "text": msg["content"]}]
+            })
+    
+    if cache:
+        cache_breakpoint(messages[-1]["content"][-1])
+    if state["current_iteration"] > 0:
+        reminder = {"type": "text", "text": get_iteration_prompt(state["current_iteration"])}
+        if messages[-1]["role"] == "user":
+            messages[-1]["content"].append(reminder)
+        else:
+            messages.append({"role": "user", "content": [reminder]})
+    return messages
 
 
-def sql_generation_node(state: AgentState) -> AgentState:
+def sql_generation_node(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
     """LLM node that generates SQL using Anthropic API"""
+    emit = get_event_emitter(config)
     try:
         # Safety check for iteration limits to prevent infinite loops
         ITERATION_LIMIT = 10
@@ -215,11 +321,6 @@ def sql_generation_node(state: AgentState) -> AgentState:
                 logger.info(f"Using last successful SQL as final due to iteration limit: {state['final_sql'][:50]}...")
             return state
         
-        # Initialize Anthropic client
-        anthropic_client = Anthropic(
-            api_key=settings.ANTHROPIC_API_KEY
-        )
-        
         # Get connection type from the notebook's actual connection
         try:
             # First try to get from the database connection model
@@ -266,47 +367,39 @@ def sql_generation_node(state: AgentState) -> AgentState:
             logger.error(f"Error determining connection type: {e}")
             connection_type = 'mysql'  # Default fallback
         
-        # Prepare messages for Anthropic API
-        messages = []
-        
-        # Add system message with dynamic connection type and selected schemas
+        # System blocks and messages, ordered from most to least stable for prompt caching
+        cache = get_config()['agent_prompt_caching']
         selected_schemas = state.get("selected_schemas", [])
-        system_prompt = get_system_prompt(state["database_schema"], state["user_nl_query"], connection_type, state["current_iteration"], selected_schemas)
+        schema_retrieval_context = ""
+        if state.get("schema_pool"):
+            schema_retrieval_context = get_schema_retrieval_context(len(state["schema_tables"]), count_tables(state["schema_pool"]))
+        system_prompt = get_system_prompt(state["database_schema"], state["user_nl_query"], connection_type, selected_schemas, schema_retrieval_context, cache)
         
         # Log basic schema info for debugging
         if state["current_iteration"] == 0:  # Only log on first iteration to avoid spam
             logger.info(f"Agent using {connection_type} connection with schema ({len(state['database_schema'])} chars)")
             logger.debug(f"Schema preview: {state['database_schema'][:200]}...")
         
-        # Add conversation history
-        for msg in state["messages"]:
-            if msg["role"] in ["user", "assistant", "tool_result"]:
-                # Map 'tool_result' to 'user' for Anthropic, so the LLM sees the result as user feedback
-                role = msg["role"]
-                if role == "tool_result":
-                    role = "user"
-                messages.append({
-                    "role": role,
-                    "content": msg["content"]
-                })
-        
-        # If this is the first iteration, add the user's original query
-        if state["current_iteration"] == 0:
-            messages.append({
-                "role": "user",
-                "content": f"Please generate a SQL query for: {state['user_nl_query']}"
-            })
+        messages = build_conversation(state, cache)
         
         # Call Anthropic API with timeout
         try:
             # Set a reasonable timeout for API calls (20 seconds)
-            response = anthropic_client.messages.create(
-                model="claude-3-5-sonnet-20241022",  # Using Claude 3.5 Sonnet
+            request = dict(
+                model=AGENT_MODEL,
                 max_tokens=4000,
                 system=system_prompt,
                 messages=messages,
                 timeout=20.0  # 20 second timeout
             )
+            if config and (config.get("configurable") or {}).get("emit"):
+                # Streamed runs forward the model's text as it is generated
+                iteration = state["current_iteration"]
+                response = llm_client.stream_message(lambda text: emit("token", {"iteration": iteration, "text": text}), **request)
+            else:
+                response = llm_client.create_message(**request)
+            if cache:
+                prompt_cache_stats.record(prefix_hashes(AGENT_MODEL, system_prompt, messages), response.usage)
         except Exception as api_error:
             logger.error(f"Anthropic API error: {api_error}")
             # If API times out, try to use last successful SQL or terminate gracefully
@@ -355,9 +448,17 @@ def sql_generation_node(state: AgentState) -> AgentState:
             "timestamp": None  # Will be set when saved to DB
         })
         
+        # Extend a pruned schema with the tables the model asked for and generate again
+        table_request = TABLE_REQUEST_PATTERN.search(response_content)
+        if table_request and state.get("schema_pool") and add_requested_tables(state, table_request.group(1), connection_type):
+            state["current_sql_query"] = None
+            emit("tables_added", {"iteration": state["current_iteration"], "message": state["messages"][-1]["content"]})
+            return state
+        
         if sql_matches:
             # Extract the SQL query
             state["current_sql_query"] = current_sql
+            emit("sql", {"iteration": state["current_iteration"], "sql": current_sql})
             
             # Only mark as final if:
             # 1. Agent explicitly says it's final (on any iteration)
@@ -370,6 +471,7 @@ def sql_generation_node(state: AgentState) -> AgentState:
                 duplicate_detected or
                 state["current_iteration"] >= state["max_iterations"] - 1):
                 state["final_sql"] = state["current_sql_query"]
+                emit("final_sql", {"iteration": state["current_iteration"], "sql": state["final_sql"]})
                 logger.info(f"Agent marked SQL as final: {state['final_sql'][:50]}... (explicit: {explicitly_final}, duplicate: {duplicate_detected}, iteration: {state['current_iteration']})")
         else:
             state["current_sql_query"] = None
@@ -389,8 +491,46 @@ def sql_generation_node(state: AgentState) -> AgentState:
     return state
 
 
-def execute_sql_tool(state: AgentState) -> AgentState:
+def add_requested_tables(state: AgentState, request: str, connection_type: str) -> bool:
+    """
+    Add the tables named in a REQUEST_TABLES line to the prompt's schema and report
+    them back to the model as a tool result. Returns False when nothing new was found
+    """
+    names = [name for name in request.split(',') if name.strip()]
+    known = [(entry['schema'], entry['table']) for entry in state["schema_tables"]]
+    found = find_requested_tables(state["schema_pool"], names, exclude=known, limit=MAX_REQUESTED_TABLES)
+    if not found:
+        logger.info(f"Agent requested tables that are not in the schema or already shown: {request}")
+        return False
+    
+    # Requested tables are needed for the answer, so they are the last to be dropped for the budget
+    top_score = max((entry.get('score', 0.0) for entry in state["schema_tables"]), default=0.0)
+    state["schema_tables"] = state["schema_tables"] + [dict(entry, score=top_score + 1, reason='requested') for entry in found]
+    state["database_schema"] = render_retrieved_tables(state["schema_pool"], state["schema_tables"], connection_type,
+                                                       state.get("schema_fingerprint"))
+    # Each extension counts as an iteration so repeated requests stay bounded
+    state["current_iteration"] = state.get("current_iteration", 0) + 1
+    
+    added = ', '.join(f"{entry['schema']}.{entry['table']}" for entry in found)
+    state["messages"].append({
+        "role": "tool_result",
+        "content": f"Added tables to the schema: {added}. Continue with the updated schema.",
+        "timestamp": None,
+        # Table names can contain "error" or "timeout", so the router must not read this as an execution result
+        "metadata": {"schema_extension": True}
+    })
+    logger.info(f"Agent schema extended with {len(found)} requested table(s): {added}")
+    return True
+
+
+def is_schema_extension(message) -> bool:
+    """Whether a message is the reply to a table request rather than an SQL execution result"""
+    return bool((message.get("metadata") or {}).get("schema_extension"))
+
+
+def execute_sql_tool(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
     """Tool node that executes SQL and creates a new SQL cell"""
+    emit = get_event_emitter(config)
     try:
         if not state.get("current_sql_query"):
             state["error_message"] = "No SQL query to execute"
@@ -436,6 +576,9 @@ def execute_sql_tool(state: AgentState) -> AgentState:
         logger.debug(f"Connection host: {connection_info.get('host')}")
         logger.debug(f"About to execute SQL: {state['current_sql_query'][:100]}...")
         
+        # The agent only summarizes results, so it runs under the user's row/byte budget
+        connection_info = apply_user_result_limits(connection_info, state.get("user_object"))
+        emit("execution_started", {"iteration": state["current_iteration"], "sql": state["current_sql_query"]})
         success, result = execute_query_with_fallback(connection_info, state["current_sql_query"])
         
         logger.debug(f"SQL execution result - Success: {success}, Type: {type(result)}")
@@ -490,6 +633,9 @@ def execute_sql_tool(state: AgentState) -> AgentState:
                 else:
                     result_summary = "Query executed successfully but returned unexpected data format."
                     logger.warning(f"Unexpected result format: {result}")
+                
+                if result.get('truncated'):
+                    result_summary += f"\n\nNote: the result was truncated after {result.get('rows_fetched', 0)} rows; the full result is larger."
             else:
                 result_summary = f"Query executed successfully. Result: {str(result)}"
                 
@@ -512,6 +658,8 @@ def execute_sql_tool(state: AgentState) -> AgentState:
             
             logger.warning(f"SQL execution failed: {result}")
             
+        emit("execution_finished", {"iteration": state["current_iteration"], "success": success,
+                                    "summary": state["messages"][-1]["content"]})
         logger.info(f"SQL execution completed for iteration {state['current_iteration']}")
         
         # Advance iteration counter once per execute cycle
@@ -526,6 +674,7 @@ def execute_sql_tool(state: AgentState) -> AgentState:
             "content": error_msg,
             "timestamp": None
         })
+        emit("execution_finished", {"iteration": state["current_iteration"], "success": False, "summary": error_msg})
         
     return state
 
@@ -554,6 +703,13 @@ def decide_next_step(state: AgentState) -> str:
                 logger.warning("Workflow timeout with no successful SQL to fall back to")
             return END
     
+    # Stop as soon as the user cancelled the run
+    owner = get_query_owner()
+    if owner is not None and running_queries.is_cancelled(owner):
+        logger.info("Agent run cancelled by user")
+        state["error_message"] = "Agent run cancelled"
+        return END
+    
     # Check iteration limits - if exceeded, use last successful SQL as final
     if state["current_iteration"] >= ITERATION_LIMIT:
         logger.info(f"Max iterations ({ITERATION_LIMIT}) reached")
@@ -570,6 +726,11 @@ def decide_next_step(state: AgentState) -> str:
         logger.info(f"Stopping due to error: {state['error_message']}")
         return END
     
+    # Tables were added at the agent's request, generate SQL against the extended schema
+    if state["messages"] and is_schema_extension(state["messages"][-1]):
+        logger.debug("Schema extended, continuing SQL generation")
+        return "generate_sql"
+    
     # If we have final SQL, we should stop after this execution attempt
     if state.get("final_sql"):
         last_message = state["messages"][-1] if state["messages"] else {}
@@ -633,6 +794,8 @@ def decide_next_step(state: AgentState) -> str:
         consecutive_failures = 0
         for msg in reversed(state["messages"]):
             if msg["role"] == "tool_result":
+                if is_schema_extension(msg):
+                    continue
                 if "failed" in msg["content"].lower() or "error" in msg["content"].lower():
                     consecutive_failures += 1
                 else:
@@ -749,18 +912,19 @@ def create_agent_graph() -> StateGraph:
     return agent
 
 
-def create_fresh_agent_for_user(user_id: int):
-    """Create a fresh agent instance for a user to avoid state persistence issues
-    
-    LangGraph agents maintain internal state between invocations, which can cause:
-    - Iteration counts to carry over from previous queries
-    - State variables to persist across different conversations  
-    - Unexpected behavior in multi-query sessions
-    
-    Creating a fresh agent for each request ensures clean state and proper iteration tracking.
-    """
-    logger.debug(f"Creating fresh agent instance for user {user_id}")
-    return create_agent_graph()
+_agent_graph = None
+_agent_graph_lock = Lock()
+
+
+def get_agent_graph():
+    """The process-wide compiled agent workflow, compiled on first use"""
+    global _agent_graph
+    if _agent_graph is None:
+        with _agent_graph_lock:
+            if _agent_graph is None:
+                _agent_graph = create_agent_graph()
+                logger.info("Compiled agent workflow")
+    return _agent_graph
 
 
 def create_and_execute_sql_cell(notebook: SQLNotebook, sql_query: str, 
@@ -792,6 +956,7 @@ def create_and_execute_sql_cell(notebook: SQLNotebook, sql_query: str,
             cell.result = result
             cell.is_executed = True
             cell.save()
+            cell_results.save(notebook.id, cell.id, result)
             
             logger.info(f"SQL cell {cell.id} created and executed successfully")
             return True, result
@@ -0,0 +1,212 @@
+"""
+Process-wide LLM client for the agent
+
+One backend client is kept per worker process instead of one per LLM call, so
+calls reuse its keep-alive HTTP connections instead of paying client setup and a
+TLS handshake each time. Calls go through a semaphore that bounds how many run
+at once in the worker (agent_llm_max_concurrency); callers wait up to
+agent_llm_acquire_timeout seconds for a slot.
+
+Backends implement LLMBackend.create_message, and stream_message when they can
+deliver text deltas as they arrive. agent_llm_backend selects one:
+'anthropic' or the dotted path of an LLMBackend subclass, so a local stub can
+stand in for the provider in tests and benchmarks. agent_llm_base_url points the
+Anthropic backend at another server, such as a local stub server. Latency and
+token counts are recorded for every call.
+"""
+import logging
+import os
+import time
+from collections import deque
+from threading import BoundedSemaphore, Lock
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.db_config import get_config
+
+logger = logging.getLogger(__name__)
+
+# Latencies kept for percentiles
+LATENCY_WINDOW = 1000
+
+
+class LLMBusyError(Exception):
+    """No LLM call slot became free within agent_llm_acquire_timeout"""
+
+
+class LLMBackend:
+    """Interface of an LLM provider client"""
+
+    name = 'base'
+
+    def __init__(self, config):
+        self.config = config
+
+    def create_message(self, **kwargs):
+        """Send one Messages API request and return the response (with .content and .usage)"""
+        raise NotImplementedError
+
+    def stream_message(self, on_text, **kwargs):
+        """
+        Send one Messages API request, passing text deltas to on_text as they arrive,
+        and return the complete response. Backends without streaming send the whole text once
+        """
+        response = self.create_message(**kwargs)
+        on_text(''.join(getattr(block, 'text', '') for block in response.content))
+        return response
+
+    def close(self):
+        """Release the backend's connections"""
+
+
+class AnthropicBackend(LLMBackend):
+    """Anthropic client on a pooled keep-alive httpx client"""
+
+    name = 'anthropic'
+
+    def __init__(self, config):
+        super().__init__(config)
+        import httpx
+        from anthropic import Anthropic, DefaultHttpxClient
+
+        self._http_client = DefaultHttpxClient(limits=httpx.Limits(
+            max_connections=config['agent_llm_max_connections'],
+            max_keepalive_connections=config['agent_llm_max_connections'],
+            keepalive_expiry=config['agent_llm_keepalive_expiry'],
+        ))
+        self._client = Anthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            base_url=config['agent_llm_base_url'] or None,
+            http_client=self._http_client,
+        )
+
+    def create_message(self, **kwargs):
+        return self._client.messages.create(**kwargs)
+
+    def stream_message(self, on_text, **kwargs):
+        with self._client.messages.stream(**kwargs) as stream:
+            for text in stream.text_stream:
+                on_text(text)
+            return stream.get_final_message()
+
+    def close(self):
+        self._http_client.close()
+
+
+BACKENDS = {
+    'anthropic': AnthropicBackend,
+}
+
+
+class LLMClientManager:
+    """The worker's LLM backend, its concurrency limit and call metrics"""
+
+    def __init__(self):
+        self._backend = None
+        self._semaphore = None
+        self._lock = Lock()
+        self._pid = os.getpid()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {
+            'calls': 0,
+            'errors': 0,
+            'busy': 0,
+            'in_flight': 0,
+            'wait_seconds': 0.0,
+            'latency_seconds': 0.0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'cache_read_input_tokens': 0,
+            'cache_creation_input_tokens': 0,
+        }
+
+    def _get_backend(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Connections inherited across fork must not be shared with the parent
+                self._backend = None
+                self._pid = os.getpid()
+            if self._backend is None:
+                config = get_config()
+                name = config['agent_llm_backend']
+                backend_class = BACKENDS.get(name) or import_string(name)
+                self._backend = backend_class(config)
+                self._semaphore = BoundedSemaphore(config['agent_llm_max_concurrency'])
+                logger.info(f"Created {backend_class.name} LLM backend for worker {self._pid}")
+            return self._backend, self._semaphore
+
+    def set_backend(self, backend, max_concurrency=None):
+        """Use the given backend instance in this worker, e.g. a fake in tests"""
+        self.close()
+        with self._lock:
+            self._backend = backend
+            self._semaphore = BoundedSemaphore(max_concurrency or get_config()['agent_llm_max_concurrency'])
+            self._pid = os.getpid()
+
+    def create_message(self, **kwargs):
+        """Send a Messages API request through the shared backend within the concurrency limit"""
+        return self._call(lambda backend: backend.create_message(**kwargs))
+
+    def stream_message(self, on_text, **kwargs):
+        """Like create_message, passing the response's text deltas to on_text as they arrive"""
+        return self._call(lambda backend: backend.stream_message(on_text, **kwargs))
+
+    def _call(self, send):
+        backend, semaphore = self._get_backend()
+        queued = time.monotonic()
+        if not semaphore.acquire(timeout=get_config()['agent_llm_acquire_timeout']):
+            with self._lock:
+                self.stats['busy'] += 1
+            raise LLMBusyError("Too many concurrent LLM calls in this worker")
+        started = time.monotonic()
+        with self._lock:
+            self.stats['in_flight'] += 1
+            self.stats['wait_seconds'] += started - queued
+        try:
+            response = send(backend)
+        except Exception:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            semaphore.release()
+            latency = time.monotonic() - started
+            with self._lock:
+                self.stats['in_flight'] -= 1
+                self.stats['calls'] += 1
+                self.stats['latency_seconds'] += latency
+                self._latencies.append(latency)
+
+        usage = getattr(response, 'usage', None)
+        with self._lock:
+            for field in ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens'):
+                self.stats[field] += getattr(usage, field, None) or 0
+        return response
+
+    def close(self):
+        """Close the backend's connections; the next call creates a new backend"""
+        with self._lock:
+            backend, self._backend = self._backend, None
+        if backend is not None:
+            backend.close()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            latencies = sorted(self._latencies)
+            stats['backend'] = self._backend.name if self._backend is not None else None
+        if latencies:
+            stats['latency_p50'] = round(latencies[len(latencies) // 2], 4)
+            stats['latency_p95'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4)
+        stats['latency_seconds'] = round(stats['latency_seconds'], 4)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 4)
+        return stats
+
+
+llm_client = LLMClientManager()
+
+
+def close_llm_client():
+    """Close this worker's LLM client connections"""
+    llm_client.close()
@@ -0,0 +1,48 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from mcp_agent.agent_logic import create_agent_graph, get_agent_graph
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request cost of compiling the agent workflow against reusing the compiled graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Requests to simulate (default: 200)',
+        )
+
+    def _time(self, get_graph, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            get_graph()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _report(self, label, timings):
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f"{label}: mean {statistics.mean(timings):.3f} ms, median {statistics.median(timings):.3f} ms, p95 {p95:.3f} ms"
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        # Warm up imports and the shared graph so neither side pays one-time costs
+        create_agent_graph()
+        get_agent_graph()
+
+        compiled_per_request = self._time(create_agent_graph, iterations)
+        shared = self._time(get_agent_graph, iterations)
+
+        self._report('Compile per request', compiled_per_request)
+        self._report('Shared compiled graph', shared)
+        saved = statistics.mean(compiled_per_request) - statistics.mean(shared)
+        self.stdout.write(self.style.SUCCESS(f"Saved per request: {saved:.3f} ms over {iterations} requests"))
@@ -0,0 +1,95 @@
+"""
+Provider-side prompt caching for the agent's LLM calls
+
+The agent's prompt is assembled from the most stable part to the least stable:
+instructions and dialect notes (per database type), the schema (per connection
+and request), the request, then the conversation. Cache breakpoints are put on
+the instructions, the schema and the conversation's last turn, so iterations
+2..N of a run re-read everything before their new turn from the provider's cache.
+
+Each call's prefixes are also hashed locally, up to every breakpoint. A prefix
+seen within the provider's cache lifetime is expected to be a cache hit; those
+expectations are counted next to the cached token counts the provider reports,
+so hit rates can be measured per worker.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# Lifetime of an ephemeral cache entry at the provider, refreshed on every hit
+CACHE_TTL = 300
+
+# Prefix hashes remembered per worker
+MAX_TRACKED_PREFIXES = 4096
+
+
+def cache_breakpoint(block):
+    """Mark a content block as the end of a cached prefix"""
+    block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def _canonical(block):
+    return json.dumps({key: value for key, value in block.items() if key != 'cache_control'}, sort_keys=True)
+
+
+def prefix_hashes(model, system, messages):
+    """SHA-256 of the request prefix ending at each cache breakpoint, in order"""
+    digest = hashlib.sha256(model.encode())
+    hashes = []
+    blocks = list(system)
+    for message in messages:
+        blocks.append({"type": "role", "role": message["role"]})
+        blocks.extend(message["content"])
+    for block in blocks:
+        digest.update(_canonical(block).encode())
+        if 'cache_control' in block:
+            hashes.append(digest.copy().hexdigest())
+    return hashes
+
+
+class PromptCacheStats:
+    """Expected (locally hashed) and reported prompt cache hits in this worker"""
+
+    def __init__(self, ttl=CACHE_TTL, max_prefixes=MAX_TRACKED_PREFIXES):
+        self._ttl = ttl
+        self._max_prefixes = max_prefixes
+        self._seen = OrderedDict()  # prefix hash -> last use
+        self._lock = Lock()
+        self.stats = {
+            'calls': 0,
+            'breakpoints': 0,
+            'expected_hits': 0,
+            'input_tokens': 0,
+            'cache_read_input_tokens': 0,
+            'cache_creation_input_tokens': 0,
+        }
+
+    def record(self, hashes, usage):
+        """Count one call's breakpoints against recent prefixes and its reported token usage"""
+        now = time.time()
+        with self._lock:
+            self.stats['calls'] += 1
+            for prefix in hashes:
+                self.stats['breakpoints'] += 1
+                last_use = self._seen.pop(prefix, None)
+                if last_use is not None and now - last_use <= self._ttl:
+                    self.stats['expected_hits'] += 1
+                self._seen[prefix] = now
+            while len(self._seen) > self._max_prefixes:
+                self._seen.popitem(last=False)
+            for field in ('input_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens'):
+                self.stats[field] += getattr(usage, field, None) or 0
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        prompt_tokens = stats['input_tokens'] + stats['cache_read_input_tokens'] + stats['cache_creation_input_tokens']
+        stats['expected_hit_rate'] = round(stats['expected_hits'] / stats['breakpoints'], 4) if stats['breakpoints'] else 0.0
+        stats['cached_token_rate'] = round(stats['cache_read_input_tokens'] / prompt_tokens, 4) if prompt_tokens else 0.0
+        return stats
+
+
+prompt_cache_stats = PromptCacheStats()
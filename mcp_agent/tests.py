@@ -1,3 +1,83 @@
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import SQLNotebook
+from .agent_logic import AgentState, get_agent_graph
+from .llm_client import LLMBackend, llm_client
+
+
+class RepeatingBackend(LLMBackend):
+    """Answers every call with the same SQL, which the agent takes as final on its second answer"""
+
+    name = 'repeating'
+
+    def __init__(self):
+        super().__init__({})
+        self.calls = 0
+
+    def create_message(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            content=[SimpleNamespace(text="Counting the rows.\n```sql\nSELECT COUNT(*) AS total FROM orders\n```")],
+            usage=SimpleNamespace(input_tokens=100, output_tokens=20),
+        )
+
+
+class CompiledAgentGraphTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='agent-user', password='secret')
+        self.notebook = SQLNotebook.objects.create(
+            title='Agent notebook',
+            user=self.user,
+            connection_info={'type': 'postgresql', 'host': 'localhost', 'database': 'shop'},
+        )
+        self.backend = RepeatingBackend()
+        llm_client.set_backend(self.backend)
+        self.addCleanup(llm_client.close)
+
+        patches = [
+            mock.patch('mcp_agent.agent_logic.execute_query_with_fallback',
+                       return_value=(True, {'columns': ['total'], 'rows': [{'total': 3}]})),
+            mock.patch('mcp_agent.agent_logic.apply_user_result_limits', side_effect=lambda info, user: info),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def initial_state(self):
+        return AgentState(
+            messages=[{'role': 'user', 'content': 'How many orders are there?', 'timestamp': '2026-01-01T00:00:00'}],
+            current_sql_query=None,
+            database_schema='orders: id int PK',
+            user_nl_query='How many orders are there?',
+            max_iterations=5,
+            current_iteration=0,
+            active_connection_id='temp_postgresql',
+            current_notebook_id=str(self.notebook.uuid),
+            user_object=self.user,
+            final_sql=None,
+            should_continue=True,
+            error_message=None,
+            selected_schemas=[],
+            start_time=time.time(),
+            schema_pool=None,
+            schema_tables=[],
+            schema_fingerprint=None,
+        )
+
+    def test_graph_is_compiled_once(self):
+        self.assertIs(get_agent_graph(), get_agent_graph())
+
+    def test_iterations_do_not_leak_between_runs(self):
+        first = get_agent_graph().invoke(self.initial_state())
+        second = get_agent_graph().invoke(self.initial_state())
+
+        self.assertEqual(first['final_sql'], 'SELECT COUNT(*) AS total FROM orders')
+        self.assertEqual(second['final_sql'], first['final_sql'])
+        self.assertEqual(second['current_iteration'], first['current_iteration'])
+        self.assertEqual(len(second['messages']), len(first['messages']))
+        self.assertEqual(self.backend.calls, 4)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -5,7 +6,11 @@ app_name = 'mcp_agent'
 
 urlpatterns = [
     # Main text-to-SQL agent endpoint
-    path('text-to-sql/', views.text_to_sql_agent_view, name='text_to_sql_agent'),
+    path('text-to-sql/', views.text_to_sql_agent_view_async if settings.USE_ASYNC_VIEWS else views.text_to_sql_agent_view, name='text_to_sql_agent'),
+    path('text-to-sql/stream/', views.text_to_sql_stream_view, name='text_to_sql_stream'),
+    path('text-to-sql/cancel/', views.text_to_sql_cancel_view, name='text_to_sql_cancel'),
+    path('prompt-cache/stats/', views.prompt_cache_stats_view, name='prompt_cache_stats'),
+    path('llm/stats/', views.llm_client_stats_view, name='llm_client_stats'),
     
     # Conversation management endpoints
     path('conversations/', views.list_conversations, name='list_conversations'),
@@ -1,20 +1,298 @@
+import asyncio
 import json
 import logging
+import time
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.core.serializers.json import DjangoJSONEncoder
 from core.models import DatabaseConnection, SQLNotebook, SQLCell
-from core.db_handlers import get_schema_for_connection, execute_query, get_mysql_schema_info, format_schema_for_llm
+from core.db_handlers import get_schema_for_connection, execute_query, get_mysql_schema_info, format_schema_for_llm, cancel_running_queries
+from core.running_queries import query_owner
+from core.schema_cache import get_connection_schemas_with_fingerprint
+from core.schema_retrieval import select_relevant_tables
 from .models import AgentConversation, ChatMessage
-from .agent_logic import create_fresh_agent_for_user, AgentState
+from .agent_logic import get_agent_graph, AgentState, render_retrieved_tables
+from .llm_client import llm_client
+from .prompt_cache import prompt_cache_stats
 from core.views import get_database_schema
 
 logger = logging.getLogger(__name__)
 
+# Seconds between keep-alive comments on an idle agent event stream
+SSE_KEEPALIVE_INTERVAL = 15
+
+
+def agent_query_owner(user, notebook):
+    """Owner key under which an agent run's SQL is tracked for cancellation"""
+    return (user.id, 'agent', str(notebook.uuid))
+
+
+class AgentRequestError(Exception):
+    """A text-to-SQL request that cannot be run, with the HTTP status to report"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def prepare_agent_run(user, data):
+    """
+    Resolve a text-to-SQL request to its notebook, conversation and initial agent state
+    
+    Saves the user's message to the conversation. Returns a dict with notebook,
+    conversation, message_history and agent_state; raises AgentRequestError when the
+    request cannot be run.
+    """
+    # Extract required fields
+    user_nl_query = data.get('query', '').strip()
+    connection_id = data.get('connection_id')
+    notebook_id = data.get('notebook_id')
+    conversation_id = data.get('conversation_id')
+    selected_schemas = data.get('selected_schemas', [])
+    
+    # Validate required fields
+    if not user_nl_query:
+        raise AgentRequestError("Query field is required")
+        
+    if not notebook_id:
+        raise AgentRequestError("notebook_id is required")
+    
+    # Get notebook first - support both UUID and ID
+    try:
+        # First try to find by UUID (new approach)
+        try:
+            notebook = SQLNotebook.objects.get(
+                uuid=notebook_id,
+                user=user
+            )
+        except (SQLNotebook.DoesNotExist, ValueError):
+            # Fallback to ID lookup (for backwards compatibility)
+            notebook = SQLNotebook.objects.get(
+                id=notebook_id,
+                user=user
+            )
+    except SQLNotebook.DoesNotExist:
+        raise AgentRequestError("Notebook not found or access denied", 404)
+    except Exception as e:
+        raise AgentRequestError(f"Error finding notebook: {str(e)}")
+    
+    # Handle connection_id - use notebook's actual connection instead of session/frontend connection
+    # This ensures consistency between schema retrieval and SQL execution
+    if notebook.database_connection:
+        # Use the notebook's assigned database connection
+        db_connection = notebook.database_connection
+        connection_id = db_connection.id
+        logger.info(f"Agent using notebook's assigned connection: {db_connection.name} (ID: {connection_id}, type: {db_connection.connection_type})")
+    else:
+        # Get connection info from notebook's connection_info field
+        connection_info = notebook.get_connection_info()
+        if not connection_info:
+            raise AgentRequestError("No database connection found for this notebook")
+        
+        # Try to find a matching DatabaseConnection object based on connection info
+        connection_type = connection_info.get('type', 'mysql').lower()
+        host = connection_info.get('host')
+        database = connection_info.get('database')
+        
+        # Look for existing connection that matches the notebook's connection info
+        matching_connections = DatabaseConnection.objects.filter(
+            user=user,
+            connection_type=connection_type,
+            host=host,
+            database=database
+        )
+        
+        if matching_connections.exists():
+            db_connection = matching_connections.first()
+            connection_id = db_connection.id
+            logger.info(f"Agent found matching connection: {db_connection.name} (ID: {connection_id}, type: {db_connection.connection_type})")
+        else:
+            # Create a temporary connection object for consistent interface
+            class TempConnection:
+                def __init__(self, connection_info):
+                    self.connection_type = connection_info.get('type', 'mysql').lower()
+                    self.name = f"Temp {self.connection_type} connection"
+                    self.id = f"temp_{self.connection_type}"
+            
+            db_connection = TempConnection(connection_info)
+            connection_id = db_connection.id
+            logger.info(f"Agent using temporary connection: {db_connection.name} (type: {db_connection.connection_type})")
+    
+    # Get or create conversation
+    if conversation_id:
+        try:
+            conversation = AgentConversation.objects.get(
+                id=conversation_id,
+                user=user
+            )
+        except AgentConversation.DoesNotExist:
+            raise AgentRequestError("Conversation not found or access denied", 404)
+    else:
+        # Create new conversation
+        conversation = AgentConversation.objects.create(
+            user=user,
+            notebook=notebook,
+            title=f"Query: {user_nl_query[:50]}..."
+        )
+    
+    # Get database schema using the notebook's connection info (ensures consistency)
+    try:
+        connection_info = notebook.get_connection_info()
+        if not connection_info:
+            raise AgentRequestError("No connection information available for this notebook")
+            
+        # Log the connection info being used for schema retrieval
+        logger.info(f"Agent retrieving schema using connection: host={connection_info.get('host')}, type={connection_info.get('type')}")
+            
+        # Saved connections are read from their schema snapshot, whose fingerprint keys
+        # the memoized renderings; live schemas are fingerprinted when rendered
+        schema_fingerprint = None
+        if notebook.database_connection:
+            schemas, schema_fingerprint = get_connection_schemas_with_fingerprint(notebook.database_connection)
+        else:
+            schemas = get_database_schema(connection_info)
+        
+        # Filter schemas based on user selection to reduce token cost
+        if selected_schemas and len(selected_schemas) > 0:
+            selected_schema_names = [s.get('name') for s in selected_schemas if s.get('name')]
+            filtered_schemas = []
+            
+            for schema in schemas:
+                schema_name = schema.get('name') or 'default'
+                if schema_name in selected_schema_names:
+                    filtered_schemas.append(schema)
+                    logger.info(f"Agent including schema: {schema_name} with {len(schema.get('tables', {}))} tables")
+            
+            if filtered_schemas:
+                schemas = filtered_schemas
+                if schema_fingerprint:
+                    schema_fingerprint += ':' + ','.join(sorted(schema['name'] for schema in schemas))
+                logger.info(f"Agent filtered to {len(schemas)} selected schema(s) to reduce token cost")
+            else:
+                logger.warning("No schemas matched user selection, using all available schemas")
+        
+        # Large schemas are pruned to the tables relevant to the request; the agent can ask for more
+        schema_pool = None
+        schema_tables = []
+        retrieved = select_relevant_tables(schemas, user_nl_query, fingerprint=schema_fingerprint)
+        if retrieved:
+            schema_pool = schemas
+            schema_tables = retrieved
+            database_schema = render_retrieved_tables(schemas, retrieved, connection_info.get('type'), schema_fingerprint)
+            logger.info(f"Agent retrieved {len(retrieved)} relevant table(s) for the request")
+        else:
+            # Format the schema for the LLM (convert from list of dicts to string)
+            database_schema = format_schema_for_llm(schemas, connection_info.get('type'), fingerprint=schema_fingerprint)
+        
+        if not database_schema:
+            raise AgentRequestError("Could not retrieve database schema", 500)
+            
+        logger.info(f"Agent using schema context ({len(database_schema)} chars) for {len(schemas)} schema(s)")
+        
+    except AgentRequestError:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting schema for notebook connection: {str(e)}")
+        raise AgentRequestError(f"Error retrieving database schema: {str(e)}", 500)
+    
+    # Load conversation history
+    chat_messages = conversation.get_messages()
+    message_history = [
+        {
+            "role": msg.role.lower(),
+            "content": msg.content,
+            "timestamp": msg.timestamp.isoformat() if msg.timestamp else None
+        }
+        for msg in chat_messages
+    ]
+    
+    # Add user's new query to conversation
+    user_message = ChatMessage.objects.create(
+        conversation=conversation,
+        role=ChatMessage.MessageRole.USER,
+        content=user_nl_query
+    )
+    
+    message_history.append({
+        "role": "user", 
+        "content": user_nl_query,
+        "timestamp": user_message.timestamp.isoformat()
+    })
+    
+    # Initialize agent state
+    agent_state = AgentState(
+        messages=message_history,
+        current_sql_query=None,
+        database_schema=database_schema,
+        user_nl_query=user_nl_query,
+        max_iterations=5,  # Configurable limit
+        current_iteration=0,
+        active_connection_id=connection_id,
+        current_notebook_id=notebook_id,
+        user_object=user,
+        final_sql=None,
+        should_continue=True,
+        error_message=None,
+        selected_schemas=selected_schemas,
+        start_time=time.time(),  # Track workflow start time for timeout
+        schema_pool=schema_pool,
+        schema_tables=schema_tables,
+        schema_fingerprint=schema_fingerprint
+    )
+    
+    logger.debug(f"Initialized fresh agent state: iteration={agent_state['current_iteration']}, messages={len(agent_state['messages'])}")
+    
+    return {
+        "notebook": notebook,
+        "conversation": conversation,
+        "message_history": message_history,
+        "agent_state": agent_state,
+    }
+
+
+def save_agent_run(conversation, final_state, message_history):
+    """Save the messages an agent run added and return the response payload"""
+    # Save new messages to database
+    for msg in final_state["messages"][len(message_history):]:
+        if msg.get("timestamp") is None:  # Only save new messages
+            role_mapping = {
+                "assistant": ChatMessage.MessageRole.ASSISTANT,
+                "tool_result": ChatMessage.MessageRole.TOOL_RESULT,
+                "system": ChatMessage.MessageRole.SYSTEM,
+                "user": ChatMessage.MessageRole.USER
+            }
+            
+            ChatMessage.objects.create(
+                conversation=conversation,
+                role=role_mapping.get(msg["role"], ChatMessage.MessageRole.ASSISTANT),
+                content=msg["content"],
+                metadata=msg.get("metadata")
+            )
+    
+    # Update conversation timestamp
+    conversation.save()  # This will update the updated_at field
+    
+    # Prepare response
+    response_data = {
+        "success": True,
+        "conversation_id": conversation.id,
+        "messages": [msg.to_dict() for msg in conversation.get_messages()],
+        "final_sql": final_state.get("final_sql"),
+        "iterations": final_state.get("current_iteration", 0)
+    }
+    
+    if final_state.get("error_message"):
+        response_data["warning"] = final_state["error_message"]
+    
+    return response_data
+
 
 @login_required
 @require_http_methods(["POST"])
@@ -50,255 +328,27 @@ def text_to_sql_agent_view(request):
                 "error": "Invalid JSON input"
             }, status=400)
         
-        # Extract required fields
-        user_nl_query = data.get('query', '').strip()
-        connection_id = data.get('connection_id')
-        notebook_id = data.get('notebook_id')
-        conversation_id = data.get('conversation_id')
-        selected_schemas = data.get('selected_schemas', [])
-        
-        # Validate required fields
-        if not user_nl_query:
-            return JsonResponse({
-                "success": False,
-                "error": "Query field is required"
-            }, status=400)
-            
-        if not notebook_id:
-            return JsonResponse({
-                "success": False,
-                "error": "notebook_id is required"
-            }, status=400)
-        
-        # Get notebook first - support both UUID and ID
-        try:
-            # First try to find by UUID (new approach)
-            try:
-                notebook = SQLNotebook.objects.get(
-                    uuid=notebook_id,
-                    user=request.user
-                )
-            except (SQLNotebook.DoesNotExist, ValueError):
-                # Fallback to ID lookup (for backwards compatibility)
-                notebook = SQLNotebook.objects.get(
-                    id=notebook_id,
-                    user=request.user
-                )
-        except SQLNotebook.DoesNotExist:
-            return JsonResponse({
-                "success": False,
-                "error": "Notebook not found or access denied"
-            }, status=404)
-        except Exception as e:
-            return JsonResponse({
-                "success": False,
-                "error": f"Error finding notebook: {str(e)}"
-            }, status=400)
-        
-        # Handle connection_id - use notebook's actual connection instead of session/frontend connection
-        # This ensures consistency between schema retrieval and SQL execution
-        if notebook.database_connection:
-            # Use the notebook's assigned database connection
-            db_connection = notebook.database_connection
-            connection_id = db_connection.id
-            logger.info(f"Agent using notebook's assigned connection: {db_connection.name} (ID: {connection_id}, type: {db_connection.connection_type})")
-        else:
-            # Get connection info from notebook's connection_info field
-            connection_info = notebook.get_connection_info()
-            if not connection_info:
-                return JsonResponse({
-                    "success": False,
-                    "error": "No database connection found for this notebook"
-                }, status=400)
-            
-            # Try to find a matching DatabaseConnection object based on connection info
-            connection_type = connection_info.get('type', 'mysql').lower()
-            host = connection_info.get('host')
-            database = connection_info.get('database')
-            
-            # Look for existing connection that matches the notebook's connection info
-            matching_connections = DatabaseConnection.objects.filter(
-                user=request.user,
-                connection_type=connection_type,
-                host=host,
-                database=database
-            )
-            
-            if matching_connections.exists():
-                db_connection = matching_connections.first()
-                connection_id = db_connection.id
-                logger.info(f"Agent found matching connection: {db_connection.name} (ID: {connection_id}, type: {db_connection.connection_type})")
-            else:
-                # Create a temporary connection object for consistent interface
-                class TempConnection:
-                    def __init__(self, connection_info):
-                        self.connection_type = connection_info.get('type', 'mysql').lower()
-                        self.name = f"Temp {self.connection_type} connection"
-                        self.id = f"temp_{self.connection_type}"
-                
-                db_connection = TempConnection(connection_info)
-                connection_id = db_connection.id
-                logger.info(f"Agent using temporary connection: {db_connection.name} (type: {db_connection.connection_type})")
-        
-        # Get or create conversation
-        if conversation_id:
-            try:
-                conversation = AgentConversation.objects.get(
-                    id=conversation_id,
-                    user=request.user
-                )
-            except AgentConversation.DoesNotExist:
-                return JsonResponse({
-                    "success": False,
-                    "error": "Conversation not found or access denied"
-                }, status=404)
-        else:
-            # Create new conversation
-            conversation = AgentConversation.objects.create(
-                user=request.user,
-                notebook=notebook,
-                title=f"Query: {user_nl_query[:50]}..."
-            )
-        
-        # Get database schema using the notebook's connection info (ensures consistency)
         try:
-            connection_info = notebook.get_connection_info()
-            if not connection_info:
-                return JsonResponse({
-                    "success": False,
-                    "error": "No connection information available for this notebook"
-                }, status=400)
-                
-            # Log the connection info being used for schema retrieval
-            logger.info(f"Agent retrieving schema using connection: host={connection_info.get('host')}, type={connection_info.get('type')}")
-                
-            schemas = get_database_schema(connection_info)
-            
-            # Filter schemas based on user selection to reduce token cost
-            if selected_schemas and len(selected_schemas) > 0:
-                selected_schema_names = [s.get('name') for s in selected_schemas if s.get('name')]
-                filtered_schemas = []
-                
-                for schema in schemas:
-                    schema_name = schema.get('schema_name') or schema.get('database_name') or 'default'
-                    if schema_name in selected_schema_names:
-                        filtered_schemas.append(schema)
-                        logger.info(f"Agent including schema: {schema_name} with {len(schema.get('tables', {}))} tables")
-                
-                if filtered_schemas:
-                    schemas = filtered_schemas
-                    logger.info(f"Agent filtered to {len(schemas)} selected schema(s) to reduce token cost")
-                else:
-                    logger.warning("No schemas matched user selection, using all available schemas")
-            
-            # Format the schema for the LLM (convert from list of dicts to string)
-            database_schema = format_schema_for_llm(schemas)
-            
-            if not database_schema:
-                return JsonResponse({
-                    "success": False,
-                    "error": "Could not retrieve database schema"
-                }, status=500)
-                
-            logger.info(f"Agent using schema context ({len(database_schema)} chars) for {len(schemas)} schema(s)")
-            
-        except Exception as e:
-            logger.error(f"Error getting schema for notebook connection: {str(e)}")
+            run = prepare_agent_run(request.user, data)
+        except AgentRequestError as e:
             return JsonResponse({
                 "success": False,
-                "error": f"Error retrieving database schema: {str(e)}"
-            }, status=500)
+                "error": str(e)
+            }, status=e.status)
+        conversation = run["conversation"]
         
-        # Load conversation history
-        chat_messages = conversation.get_messages()
-        message_history = [
-            {
-                "role": msg.role.lower(),
-                "content": msg.content,
-                "timestamp": msg.timestamp.isoformat() if msg.timestamp else None
-            }
-            for msg in chat_messages
-        ]
-        
-        # Add user's new query to conversation
-        user_message = ChatMessage.objects.create(
-            conversation=conversation,
-            role=ChatMessage.MessageRole.USER,
-            content=user_nl_query
-        )
-        
-        message_history.append({
-            "role": "user", 
-            "content": user_nl_query,
-            "timestamp": user_message.timestamp.isoformat()
-        })
-        
-        # Initialize agent state
-        import time
-        agent_state = AgentState(
-            messages=message_history,
-            current_sql_query=None,
-            database_schema=database_schema,
-            user_nl_query=user_nl_query,
-            max_iterations=5,  # Configurable limit
-            current_iteration=0,
-            active_connection_id=connection_id,
-            current_notebook_id=notebook_id,
-            user_object=request.user,
-            final_sql=None,
-            should_continue=True,
-            error_message=None,
-            selected_schemas=selected_schemas,
-            start_time=time.time()  # Track workflow start time for timeout
-        )
-        
-        logger.debug(f"Initialized fresh agent state: iteration={agent_state['current_iteration']}, messages={len(agent_state['messages'])}")
-        
-        # Get fresh agent and invoke
-        agent = create_fresh_agent_for_user(request.user.id)
+        # The compiled workflow is shared; this run's state is its own
+        agent = get_agent_graph()
         
         try:
-            # Run the agent with fresh state
+            # Run the agent from its initial state
             logger.info(f"Starting agent workflow for user {request.user.id}, conversation {conversation.id}")
-            final_state = agent.invoke(agent_state)
+            # SQL run by the agent is tracked under the notebook so text_to_sql_cancel_view can stop it
+            with query_owner(agent_query_owner(request.user, run["notebook"])):
+                final_state = agent.invoke(run["agent_state"])
             logger.info(f"Agent workflow completed for user {request.user.id}, final iteration: {final_state.get('current_iteration', 0)}")
             
-            # Save new messages to database
-            new_messages = []
-            for msg in final_state["messages"][len(message_history):]:
-                if msg.get("timestamp") is None:  # Only save new messages
-                    role_mapping = {
-                        "assistant": ChatMessage.MessageRole.ASSISTANT,
-                        "tool_result": ChatMessage.MessageRole.TOOL_RESULT,
-                        "system": ChatMessage.MessageRole.SYSTEM,
-                        "user": ChatMessage.MessageRole.USER
-                    }
-                    
-                    chat_msg = ChatMessage.objects.create(
-                        conversation=conversation,
-                        role=role_mapping.get(msg["role"], ChatMessage.MessageRole.ASSISTANT),
-                        content=msg["content"],
-                        metadata=msg.get("metadata")
-                    )
-                    
-                    new_messages.append(chat_msg.to_dict())
-            
-            # Update conversation timestamp
-            conversation.save()  # This will update the updated_at field
-            
-            # Prepare response
-            response_data = {
-                "success": True,
-                "conversation_id": conversation.id,
-                "messages": [msg.to_dict() for msg in conversation.get_messages()],
-                "final_sql": final_state.get("final_sql"),
-                "iterations": final_state.get("current_iteration", 0)
-            }
-            
-            if final_state.get("error_message"):
-                response_data["warning"] = final_state["error_message"]
-            
-            return JsonResponse(response_data)
+            return JsonResponse(save_agent_run(conversation, final_state, run["message_history"]))
             
         except Exception as e:
             logger.error(f"Error invoking agent for user {request.user.id}: {str(e)}")
@@ -315,6 +365,205 @@ def text_to_sql_agent_view(request):
         }, status=500)
 
 
+def _run_text_to_sql_agent(request):
+    """Run the sync agent view in a worker thread and release that thread's DB connections"""
+    try:
+        return text_to_sql_agent_view(request)
+    finally:
+        close_old_connections()
+
+
+@login_required
+@require_http_methods(["POST"])
+@csrf_exempt  # We'll handle CSRF manually in the frontend
+async def text_to_sql_agent_view_async(request):
+    """
+    Async entry point for the text-to-SQL agent under ASGI
+    
+    The LangGraph agent and LLM client are synchronous, so the run is moved off the
+    event loop to its own thread instead of queueing behind other sync views.
+    """
+    return await sync_to_async(_run_text_to_sql_agent, thread_sensitive=False)(request)
+
+
+def sse_event(event, data):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def _run_streamed_agent(user, data, emit, run_context):
+    """
+    Prepare and run an agent request in a worker thread, reporting its progress
+    through emit(event, data); ends with a done or error event, then None
+    """
+    try:
+        run = prepare_agent_run(user, data)
+        run_context["notebook"] = run["notebook"]
+        conversation = run["conversation"]
+        emit("start", {"conversation_id": conversation.id})
+        
+        agent = get_agent_graph()
+        logger.info(f"Starting streamed agent workflow for user {user.id}, conversation {conversation.id}")
+        final_state = run["agent_state"]
+        # SQL run by the agent is tracked under the notebook so text_to_sql_cancel_view can stop it
+        with query_owner(agent_query_owner(user, run["notebook"])):
+            for final_state in agent.stream(run["agent_state"], config={"configurable": {"emit": emit}}, stream_mode="values"):
+                pass
+        logger.info(f"Streamed agent workflow completed for user {user.id}, final iteration: {final_state.get('current_iteration', 0)}")
+        
+        emit("done", save_agent_run(conversation, final_state, run["message_history"]))
+    except AgentRequestError as e:
+        emit("error", {"success": False, "error": str(e), "status": e.status})
+    except Exception as e:
+        logger.error(f"Error in streamed agent run for user {user.id}: {str(e)}")
+        emit("error", {"success": False, "error": f"Agent execution failed: {str(e)}"})
+    finally:
+        emit(None, None)
+        close_old_connections()
+
+
+def _cancel_streamed_agent(user, notebook):
+    try:
+        cancel_running_queries(notebook.get_connection_info(), agent_query_owner(user, notebook))
+    finally:
+        close_old_connections()
+
+
+@login_required
+@require_http_methods(["POST"])
+@csrf_exempt  # We'll handle CSRF manually in the frontend
+async def text_to_sql_stream_view(request):
+    """
+    Text-to-SQL agent run streamed as Server-Sent Events
+    
+    Takes the same JSON input as text_to_sql_agent_view. Events, each with a JSON payload:
+    status, start (conversation_id), token (model text deltas), sql (SQL extracted from
+    a response), tables_added, execution_started, execution_finished (success, summary),
+    final_sql, then done (the text_to_sql_agent_view response) or error.
+    
+    The run happens in a worker thread while the event loop relays its events, so
+    serve this view under ASGI; the workbench only uses it with USE_ASYNC_VIEWS and
+    calls text_to_sql_agent_view otherwise. A client that disconnects cancels the run's SQL.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            "success": False,
+            "error": "Invalid JSON input"
+        }, status=400)
+    
+    user = await request.auser()
+    run_context = {}
+    
+    async def events():
+        # The response may be consumed on another event loop than the view's (WSGI
+        # runs it with async_to_sync), so the queue belongs to the loop iterating it
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        
+        def emit(event, payload):
+            loop.call_soon_threadsafe(queue.put_nowait, (event, payload))
+        
+        yield sse_event("status", {"message": "Preparing schema context"})
+        task = asyncio.ensure_future(
+            sync_to_async(_run_streamed_agent, thread_sensitive=False)(user, data, emit, run_context)
+        )
+        finished = False
+        try:
+            while True:
+                try:
+                    event, payload = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield sse_event(event, payload)
+            finished = True
+            await task
+        finally:
+            if not finished and run_context.get("notebook") is not None:
+                logger.info(f"Client left streamed agent run for user {user.id}, cancelling it")
+                await sync_to_async(_cancel_streamed_agent, thread_sensitive=False)(user, run_context["notebook"])
+    
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Don't let nginx buffer the stream
+    return response
+
+
+@login_required
+@require_http_methods(["POST"])
+@csrf_exempt  # We'll handle CSRF manually in the frontend
+def text_to_sql_cancel_view(request):
+    """
+    Cancel the agent run for a notebook, stopping any SQL it has running
+    
+    Expects JSON input: {"notebook_id": uuid or int}
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            "success": False,
+            "error": "Invalid JSON input"
+        }, status=400)
+    
+    notebook_id = data.get('notebook_id')
+    if not notebook_id:
+        return JsonResponse({
+            "success": False,
+            "error": "notebook_id is required"
+        }, status=400)
+    
+    try:
+        try:
+            notebook = SQLNotebook.objects.get(uuid=notebook_id, user=request.user)
+        except (SQLNotebook.DoesNotExist, ValueError, ValidationError):
+            notebook = SQLNotebook.objects.get(id=notebook_id, user=request.user)
+    except (SQLNotebook.DoesNotExist, ValueError):
+        return JsonResponse({
+            "success": False,
+            "error": "Notebook not found or access denied"
+        }, status=404)
+    
+    connection_info = notebook.get_connection_info()
+    if not connection_info:
+        return JsonResponse({
+            "success": False,
+            "error": "No connection information available for this notebook"
+        }, status=400)
+    
+    try:
+        cancelled = cancel_running_queries(connection_info, agent_query_owner(request.user, notebook))
+        logger.info(f"Cancelled agent run for user {request.user.id}, notebook {notebook.uuid} ({cancelled} queries stopped)")
+        return JsonResponse({"success": True, "cancelled": cancelled})
+    except Exception as e:
+        logger.error(f"Error cancelling agent run: {str(e)}")
+        return JsonResponse({
+            "success": False,
+            "error": f"Error cancelling agent run: {str(e)}"
+        }, status=500)
+
+
+@login_required
+def prompt_cache_stats_view(request):
+    """Expected and reported prompt cache hits of the agent in this worker (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({"success": False, "error": "Permission denied"}, status=403)
+    return JsonResponse({"success": True, "stats": prompt_cache_stats.get_stats()})
+
+
+@login_required
+def llm_client_stats_view(request):
+    """Call, latency and token metrics of the agent's LLM client in this worker (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({"success": False, "error": "Permission denied"}, status=403)
+    return JsonResponse({"success": True, "stats": llm_client.get_stats()})
+
+
 @login_required
 def get_conversation_history(request, conversation_id):
     """Get conversation history for a specific conversation"""
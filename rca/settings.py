@@ -86,6 +86,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'rca.wsgi.application'
+ASGI_APPLICATION = 'rca.asgi.application'
+
+# Route cell execution, schema retrieval and the agent to async views (serve rca.asgi under an ASGI worker)
+USE_ASYNC_VIEWS = os.environ.get('USE_ASYNC_VIEWS', 'False') == 'True'
 
 
 # Database
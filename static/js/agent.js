@@ -964,23 +964,13 @@ class TextToSQLAgent {
                 selected_schemas: selectedSchemas
             };
 
-            // Send to agent endpoint
-            const response = await fetch('/mcp_agent/text-to-sql/', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': this.getCsrfToken()
-                },
-                body: JSON.stringify(requestData)
-            });
-            
-            if (!response.ok) {
-                const errorText = await response.text();
-                console.error('Agent response error:', response.status, errorText);
-                throw new Error(`Server error ${response.status}: ${errorText}`);
-            }
-
-            const result = await response.json();
+            // Stream the run when the server runs under ASGI; progress is shown as events arrive.
+            // Sync workers would hold a worker for the whole run, so they get the JSON endpoint
+            const result = window.agentStreamingEnabled
+                ? await this.streamAgentRequest(requestData, (event, data) => {
+                    this.handleAgentStreamEvent(cellId, event, data);
+                })
+                : await this.sendAgentRequest(requestData);
 
             if (result.success) {
                 // Update conversation ID
@@ -1073,6 +1063,138 @@ class TextToSQLAgent {
         }
     }
 
+    async sendAgentRequest(requestData) {
+        const response = await fetch('/mcp_agent/text-to-sql/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCsrfToken()
+            },
+            body: JSON.stringify(requestData)
+        });
+
+        if (!response.ok) {
+            const errorText = await response.text();
+            console.error('Agent response error:', response.status, errorText);
+            throw new Error(`Server error ${response.status}: ${errorText}`);
+        }
+
+        return await response.json();
+    }
+
+    async streamAgentRequest(requestData, onEvent) {
+        const response = await fetch('/mcp_agent/text-to-sql/stream/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+                'X-CSRFToken': this.getCsrfToken()
+            },
+            body: JSON.stringify(requestData)
+        });
+
+        // Requests rejected before the run starts are answered with plain JSON
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream')) {
+            if (contentType.includes('application/json')) {
+                return await response.json();
+            }
+            const errorText = await response.text();
+            console.error('Agent response error:', response.status, errorText);
+            throw new Error(`Server error ${response.status}: ${errorText}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                const dataLines = [];
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) {
+                        event = line.slice(7);
+                    } else if (line.startsWith('data: ')) {
+                        dataLines.push(line.slice(6));
+                    }
+                });
+                if (dataLines.length === 0) continue;  // keep-alive comment
+
+                const data = JSON.parse(dataLines.join('\n'));
+                if (event === 'done' || event === 'error') {
+                    result = data;
+                } else {
+                    onEvent(event, data);
+                }
+            }
+        }
+
+        if (!result) {
+            throw new Error('Agent stream ended unexpectedly');
+        }
+        return result;
+    }
+
+    handleAgentStreamEvent(cellId, event, data) {
+        switch (event) {
+            case 'status':
+                this.showProcessingStatus(data.message);
+                break;
+            case 'start':
+                this.currentConversationId = data.conversation_id;
+                this.showProcessingStatus('Generating SQL...');
+                break;
+            case 'token':
+                this.appendStreamingText(data.iteration, data.text);
+                break;
+            case 'sql':
+                this.updateCellContent(cellId, data.sql);
+                break;
+            case 'tables_added':
+                this.showProcessingStatus(data.message);
+                break;
+            case 'execution_started':
+                this.showProcessingStatus('Running query...');
+                break;
+            case 'execution_finished':
+                this.showProcessingStatus(data.success ? 'Query finished, reviewing results...' : 'Query failed, revising SQL...');
+                break;
+        }
+    }
+
+    appendStreamingText(iteration, text) {
+        const conversationHistory = document.getElementById('conversationHistory');
+        if (!conversationHistory) return;
+
+        // One live message per iteration; the saved conversation replaces them when the run ends
+        let element = conversationHistory.querySelector(`.message-streaming[data-iteration="${iteration}"]`);
+        if (!element) {
+            element = this.createMessageElement({ role: 'assistant', content: '', timestamp: new Date().toISOString() });
+            element.classList.add('message-streaming');
+            element.dataset.iteration = iteration;
+            element.dataset.text = '';
+            conversationHistory.appendChild(element);
+        }
+        element.dataset.text += text;
+        const body = element.querySelector('.mt-1');
+        if (body) {
+            body.textContent = element.dataset.text;
+            body.style.whiteSpace = 'pre-wrap';
+        }
+        conversationHistory.scrollTop = conversationHistory.scrollHeight;
+    }
+
     showConversationArea() {
         const agentArea = document.getElementById('agentResponseArea');
         if (agentArea) {
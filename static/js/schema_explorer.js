@@ -2,48 +2,61 @@
  * Schema Explorer - Functions to fetch and display database schema information
  */
 
-// Global variable to store schema data
+// Schema summaries (name, table_count, view_count) from the last load
 let databaseSchemas = [];
 
+// Tables fetched per page when a schema is expanded
+const SCHEMA_TABLE_PAGE_SIZE = 200;
+
 /**
- * Fetch database schema information from the server
+ * Base URL of the lazy schema API for the current notebook or session connection
  */
-function fetchDatabaseSchema() {
-    // Get the notebook ID from the page URL
+function getSchemaApiBase() {
     const notebookUUID = getNotebookUUID();
-    let url = '/api/database-schema/';
-    
     if (notebookUUID) {
-        url = `/api/notebooks/${notebookUUID}/schema/`;
+        return `/api/notebooks/${notebookUUID}/schema/schemas/`;
     }
-    
-    // Show loading indicator
-    const dbSchemasSection = document.getElementById('database-schemas');
-    if (dbSchemasSection) {
-        dbSchemasSection.innerHTML = '<div class="loading-indicator">Loading schemas...</div>';
-    }
-    
-    // Make API request
-    fetch(url, {
+    return '/api/database-schema/schemas/';
+}
+
+/**
+ * GET a schema API URL; responses are revalidated with their ETag by the browser
+ */
+function fetchSchemaJson(url) {
+    return fetch(url, {
         method: 'GET',
         headers: {
             'X-CSRFToken': getCsrfToken(),
         }
     })
     .then(response => {
-        if (!response.ok) {
+        if (!response.ok && response.status !== 404) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         return response.json();
     })
     .then(data => {
-        if (data.success) {
-            databaseSchemas = data.schemas || [];
-            renderDatabaseSchemas();
-        } else {
-            console.error('Error fetching database schema:', data.error);
-            showSchemaError(data.error);
+        if (!data.success) {
+            throw new Error(data.error || 'Unknown error');
         }
+        return data;
+    });
+}
+
+/**
+ * Fetch the list of schemas; tables and columns are loaded when expanded
+ */
+function fetchDatabaseSchema() {
+    // Show loading indicator
+    const dbSchemasSection = document.getElementById('database-schemas');
+    if (dbSchemasSection) {
+        dbSchemasSection.innerHTML = '<div class="loading-indicator">Loading schemas...</div>';
+    }
+    
+    fetchSchemaJson(getSchemaApiBase())
+    .then(data => {
+        databaseSchemas = data.schemas || [];
+        renderDatabaseSchemas();
     })
     .catch(error => {
         console.error('Error fetching database schema:', error);
@@ -52,7 +65,7 @@ function fetchDatabaseSchema() {
 }
 
 /**
- * Render database schemas in the sidebar
+ * Render database schemas in the sidebar, collapsed until expanded
  */
 function renderDatabaseSchemas() {
     const dbSchemasSection = document.getElementById('database-schemas');
@@ -69,7 +82,8 @@ function renderDatabaseSchemas() {
     // Render each schema
     databaseSchemas.forEach(schema => {
         const schemaElement = document.createElement('div');
-        schemaElement.className = 'schema expanded';
+        schemaElement.className = 'schema';
+        schemaElement.dataset.schemaName = schema.name;
         
         // Create schema header
         const schemaHeader = document.createElement('div');
@@ -77,42 +91,13 @@ function renderDatabaseSchemas() {
         schemaHeader.innerHTML = `
             <i class="fas fa-database"></i>
             <span>${schema.name}</span>
-            <i class="fas fa-chevron-down"></i>
+            <span class="row-count">(${schema.table_count + schema.view_count})</span>
+            <i class="fas fa-chevron-right"></i>
         `;
         
-        // Create tables container
+        // Create tables container, filled on first expand
         const tablesContainer = document.createElement('div');
-        tablesContainer.className = 'schema-tables visible';
-        
-        // Add tables to the container
-        if (schema.tables && schema.tables.length > 0) {
-            schema.tables.forEach(table => {
-                const tableElement = document.createElement('div');
-                tableElement.className = 'table-item';
-                tableElement.dataset.tableName = table.name;
-                
-                // Set icon based on table type
-                let icon = 'fa-table';
-                if (table.type === 'view') {
-                    icon = 'fa-eye';
-                }
-                
-                tableElement.innerHTML = `
-                    <i class="fas ${icon}"></i>
-                    <span>${table.name}</span>
-                    ${table.rows ? `<span class="row-count">(${table.rows} rows)</span>` : ''}
-                `;
-                
-                // Add click handler to show table columns
-                tableElement.addEventListener('click', () => {
-                    showTableColumns(tableElement, table);
-                });
-                
-                tablesContainer.appendChild(tableElement);
-            });
-        } else {
-            tablesContainer.innerHTML = '<div class="no-tables">No tables available</div>';
-        }
+        tablesContainer.className = 'schema-tables';
         
         // Add toggle functionality to schema header
         schemaHeader.addEventListener('click', () => {
@@ -123,6 +108,10 @@ function renderDatabaseSchemas() {
                 chevron.classList.toggle('fa-chevron-down');
                 chevron.classList.toggle('fa-chevron-right');
             }
+            if (!tablesContainer.dataset.loaded) {
+                tablesContainer.dataset.loaded = 'true';
+                renderSchemaTables(schema, tablesContainer);
+            }
         });
         
         // Append all elements
@@ -133,9 +122,117 @@ function renderDatabaseSchemas() {
 }
 
 /**
- * Display table columns when a table is clicked
+ * Render a schema's name filter and its first page of tables
+ */
+function renderSchemaTables(schema, tablesContainer) {
+    const filterInput = document.createElement('input');
+    filterInput.type = 'search';
+    filterInput.className = 'table-filter';
+    filterInput.placeholder = 'Filter tables...';
+    
+    const tableList = document.createElement('div');
+    tableList.className = 'table-list';
+    
+    let filterTimer = null;
+    filterInput.addEventListener('input', () => {
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(() => {
+            tableList.innerHTML = '';
+            loadSchemaTables(schema.name, tableList, filterInput.value.trim(), 0);
+        }, 250);
+    });
+    
+    tablesContainer.appendChild(filterInput);
+    tablesContainer.appendChild(tableList);
+    loadSchemaTables(schema.name, tableList, '', 0);
+}
+
+/**
+ * Append one page of a schema's tables, with a "load more" item when there are more
  */
-function showTableColumns(tableElement, tableData) {
+function loadSchemaTables(schemaName, tableList, nameFilter, offset) {
+    const loading = document.createElement('div');
+    loading.className = 'loading-indicator';
+    loading.textContent = 'Loading tables...';
+    tableList.appendChild(loading);
+    
+    const params = new URLSearchParams({offset: offset, limit: SCHEMA_TABLE_PAGE_SIZE});
+    if (nameFilter) {
+        params.set('q', nameFilter);
+    }
+    fetchSchemaJson(`${getSchemaApiBase()}${encodeURIComponent(schemaName)}/tables/?${params}`)
+    .then(data => {
+        loading.remove();
+        if (data.total === 0) {
+            tableList.innerHTML = '<div class="no-tables">No tables available</div>';
+            return;
+        }
+        
+        data.tables.forEach(table => {
+            const tableElement = document.createElement('div');
+            tableElement.className = 'table-item';
+            tableElement.dataset.tableName = table.name;
+            
+            // Set icon based on table type
+            let icon = 'fa-table';
+            if (table.type === 'view') {
+                icon = 'fa-eye';
+            }
+            
+            tableElement.innerHTML = `
+                <i class="fas ${icon}"></i>
+                <span>${table.name}</span>
+                ${table.rows ? `<span class="row-count">(${table.rows} rows)</span>` : ''}
+            `;
+            
+            // Add click handler to show table columns
+            tableElement.addEventListener('click', () => {
+                showTableColumns(tableElement, schemaName, table);
+            });
+            
+            tableList.appendChild(tableElement);
+        });
+        
+        if (data.has_more) {
+            const moreElement = document.createElement('div');
+            moreElement.className = 'load-more-tables';
+            moreElement.textContent = `Show more (${data.total - data.offset - data.tables.length} remaining)`;
+            moreElement.addEventListener('click', () => {
+                moreElement.remove();
+                loadSchemaTables(schemaName, tableList, nameFilter, data.offset + data.tables.length);
+            });
+            tableList.appendChild(moreElement);
+        }
+    })
+    .catch(error => {
+        loading.remove();
+        console.error('Error fetching schema tables:', error);
+        tableList.insertAdjacentHTML('beforeend', `<div class="schema-error">Error loading tables: ${error.message}</div>`);
+    });
+}
+
+/**
+ * Tooltip text for a column's sampled statistics
+ */
+function describeColumnProfile(profile) {
+    const lines = [
+        `Nulls: ${(profile.null_rate * 100).toFixed(1)}%`,
+        `Distinct: ${profile.distinct_exact ? '' : '~'}${profile.distinct}`
+    ];
+    if (profile.min !== undefined) {
+        lines.push(`Range: ${profile.min} .. ${profile.max}`);
+    }
+    if (profile.top_values && profile.top_values.length > 0) {
+        const values = profile.top_values.map(entry => `${entry.value} (${(entry.share * 100).toFixed(1)}%)`);
+        lines.push(`Most frequent: ${values.join(', ')}`);
+    }
+    return lines.join('\n');
+}
+
+/**
+ * Display table columns when a table is clicked, fetching them on first expand
+ */
+function showTableColumns(tableElement, schemaName, tableData) {
     // Check if columns are already displayed
     const existingColumnsElement = tableElement.nextElementSibling;
     if (existingColumnsElement && existingColumnsElement.classList.contains('table-columns')) {
@@ -146,37 +243,51 @@ function showTableColumns(tableElement, tableData) {
     // Create columns container
     const columnsElement = document.createElement('div');
     columnsElement.className = 'table-columns';
-    
-    // Add columns to the container
-    if (tableData.columns && tableData.columns.length > 0) {
-        tableData.columns.forEach(column => {
-            const columnElement = document.createElement('div');
-            columnElement.className = 'column-item';
-            
-            // Set icon based on column type
-            let keyIcon = '';
-            if (column.key === 'PRI') {
-                keyIcon = '<i class="fas fa-key primary-key"></i>';
-            } else if (column.key === 'UNI') {
-                keyIcon = '<i class="fas fa-key unique-key"></i>';
-            } else if (column.key === 'MUL') {
-                keyIcon = '<i class="fas fa-link foreign-key"></i>';
-            }
-            
-            columnElement.innerHTML = `
-                ${keyIcon}
-                <span class="column-name">${column.name}</span>
-                <span class="column-type">${column.type}</span>
-            `;
-            
-            columnsElement.appendChild(columnElement);
-        });
-    } else {
-        columnsElement.innerHTML = '<div class="no-columns">No column information available</div>';
-    }
+    columnsElement.innerHTML = '<div class="loading-indicator">Loading columns...</div>';
     
     // Insert after the table element
     tableElement.parentNode.insertBefore(columnsElement, tableElement.nextSibling);
+    
+    const url = `${getSchemaApiBase()}${encodeURIComponent(schemaName)}/tables/${encodeURIComponent(tableData.name)}/columns/`;
+    fetchSchemaJson(url)
+    .then(data => {
+        columnsElement.innerHTML = '';
+        
+        // Add columns to the container
+        if (data.columns && data.columns.length > 0) {
+            data.columns.forEach(column => {
+                const columnElement = document.createElement('div');
+                columnElement.className = 'column-item';
+                
+                // Set icon based on column type
+                let keyIcon = '';
+                if (column.key === 'PRI') {
+                    keyIcon = '<i class="fas fa-key primary-key"></i>';
+                } else if (column.key === 'UNI') {
+                    keyIcon = '<i class="fas fa-key unique-key"></i>';
+                } else if (column.key === 'MUL') {
+                    keyIcon = '<i class="fas fa-link foreign-key"></i>';
+                }
+                
+                columnElement.innerHTML = `
+                    ${keyIcon}
+                    <span class="column-name">${column.name}</span>
+                    <span class="column-type">${column.type}</span>
+                `;
+                if (column.profile) {
+                    columnElement.title = describeColumnProfile(column.profile);
+                }
+                
+                columnsElement.appendChild(columnElement);
+            });
+        } else {
+            columnsElement.innerHTML = '<div class="no-columns">No column information available</div>';
+        }
+    })
+    .catch(error => {
+        console.error('Error fetching table columns:', error);
+        columnsElement.innerHTML = `<div class="schema-error">Error loading columns: ${error.message}</div>`;
+    });
 }
 
 /**